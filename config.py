@@ -3,4 +3,82 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-BOT_TOKEN = os.getenv('BOT_TOKEN') 
\ No newline at end of file
+BOT_TOKEN = os.getenv('BOT_TOKEN')
+
+# База данных
+DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///./kbju_bot.db')
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 30))
+
+# Профиль SQLite: 'performance' (WAL, synchronous=NORMAL, mmap, кэш) или 'default' (настройки SQLite как есть)
+SQLITE_PROFILE = os.getenv('SQLITE_PROFILE', 'performance')
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 64 * 1024 * 1024))
+SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', 16 * 1024))
+
+# Повторы записи при "database is locked"
+DB_LOCK_RETRIES = int(os.getenv('DB_LOCK_RETRIES', 5))
+DB_LOCK_RETRY_DELAY_MS = int(os.getenv('DB_LOCK_RETRY_DELAY_MS', 20))
+
+# Group commit: записи из обработчиков копятся и фиксируются одной транзакцией
+GROUP_COMMIT_ENABLED = os.getenv('GROUP_COMMIT_ENABLED', '0') == '1'
+GROUP_COMMIT_MAX_BATCH = int(os.getenv('GROUP_COMMIT_MAX_BATCH', 64))
+GROUP_COMMIT_MAX_DELAY_MS = int(os.getenv('GROUP_COMMIT_MAX_DELAY_MS', 5))
+
+# Архив: замеры старше горизонта сворачиваются в недельные сводки (последний замер пользователя остается)
+ARCHIVE_HORIZON_DAYS = int(os.getenv('ARCHIVE_HORIZON_DAYS', 180))
+# Как часто бот сам запускает архивацию; 0 (по умолчанию) - только вручную через scripts/archive_records.py.
+# Архивация необратима: рост, цель и активность старых замеров в сводки не попадают
+ARCHIVE_INTERVAL_HOURS = int(os.getenv('ARCHIVE_INTERVAL_HOURS', 0))
+
+# Рабочие процессы: больше 1 - родитель опрашивает Telegram и раздает обновления процессам по telegram_id
+BOT_WORKERS = int(os.getenv('BOT_WORKERS', 1))
+
+# Сколько обновлений разных пользователей обрабатываются одновременно (в одном процессе)
+MAX_CONCURRENT_UPDATES = int(os.getenv('MAX_CONCURRENT_UPDATES', 64))
+
+# Антифлуд: ведро на THROTTLE_BURST токенов, пополняется на THROTTLE_RATE токенов в секунду
+THROTTLE_RATE = float(os.getenv('THROTTLE_RATE', 1))
+THROTTLE_BURST = float(os.getenv('THROTTLE_BURST', 10))
+
+# Профилирование медленных обновлений (по умолчанию выключено)
+PROFILE_UPDATES = os.getenv('PROFILE_UPDATES', '0') == '1'
+PROFILE_SLOW_MS = int(os.getenv('PROFILE_SLOW_MS', 1000))
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+# Сколько последних профилей хранить на диске
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', 50))
+
+# Бюджет SQL-запросов на одно обновление: сверх него запросы пишутся в лог
+QUERY_BUDGET = int(os.getenv('QUERY_BUDGET', 10))
+QUERY_TIME_BUDGET_MS = int(os.getenv('QUERY_TIME_BUDGET_MS', 200))
+# Столько одинаковых запросов за обновление - предупреждение о N+1
+QUERY_REPEAT_WARNING = int(os.getenv('QUERY_REPEAT_WARNING', 3))
+
+# Администраторы (telegram_id через запятую): им доступна /stats
+ADMIN_IDS = {int(user_id) for user_id in os.getenv('ADMIN_IDS', '').split(',') if user_id.strip()}
+# Сколько секунд отчет /stats берется из кэша
+ANALYTICS_CACHE_TTL = int(os.getenv('ANALYTICS_CACHE_TTL', 300))
+# Строк за одно чтение из курсора при подсчете
+ANALYTICS_CHUNK_SIZE = int(os.getenv('ANALYTICS_CHUNK_SIZE', 1000))
+
+# Журнал событий воронок: буфер в памяти сбрасывается в базу раз в EVENTS_FLUSH_SECONDS
+EVENTS_ENABLED = os.getenv('EVENTS_ENABLED', '1') == '1'
+EVENTS_FLUSH_SECONDS = float(os.getenv('EVENTS_FLUSH_SECONDS', 5))
+# Больше событий в буфере не держим (база недоступна) - старые отбрасываются
+EVENTS_BUFFER_LIMIT = int(os.getenv('EVENTS_BUFFER_LIMIT', 10000))
+
+# Меню на день: сколько миллисекунд искать сочетание продуктов под КБЖУ
+MEAL_PLAN_TIME_BUDGET_MS = float(os.getenv('MEAL_PLAN_TIME_BUDGET_MS', 30))
+
+# Напоминания о замерах: один планировщик на весь бот
+REMINDERS_ENABLED = os.getenv('REMINDERS_ENABLED', '1') == '1'
+# Время в напоминаниях - по этому часовому поясу (по умолчанию Москва)
+REMINDERS_UTC_OFFSET_HOURS = int(os.getenv('REMINDERS_UTC_OFFSET_HOURS', 3))
+# Как часто планировщик перечитывает ближайшие напоминания из базы
+REMINDERS_POLL_SECONDS = int(os.getenv('REMINDERS_POLL_SECONDS', 60))
+# Сообщений в секунду (лимит Telegram - около 30) и напоминаний за одно чтение из базы
+REMINDERS_RATE = int(os.getenv('REMINDERS_RATE', 25))
+REMINDERS_BATCH_SIZE = int(os.getenv('REMINDERS_BATCH_SIZE', 500))
+# Пропущенные за время простоя напоминания отправляются, если опоздали не больше чем на столько
+REMINDERS_CATCH_UP_HOURS = int(os.getenv('REMINDERS_CATCH_UP_HOURS', 12))
@@ -1,9 +1,20 @@
 from .user_crud import *
 from .record_crud import *
 from .food_crud import *
+from .archive_crud import *
+from .trend_crud import *
+from .diary_crud import *
+from .reminder_crud import *
 
 __all__ = [
     'get_user', 'create_user', 'update_user', 'user_exists',
-    'get_user_records', 'create_or_update_record', 'get_latest_record',
-    'get_food_preferences', 'create_or_update_food_preferences'
+    'get_user_records', 'create_or_update_record', 'get_latest_record', 'get_latest_bodyfat',
+    'get_progress_series', 'iter_user_records', 'bulk_upsert_records', 'read_record_targets', 'update_record_targets',
+    'get_food_preferences', 'create_or_update_food_preferences', 'bulk_upsert_food_preferences',
+    'get_users_by_food_term', 'get_top_food_terms', 'reindex_all_food_terms',
+    'get_archived_series', 'get_archive_cutoff', 'get_users_to_archive', 'archive_user_records',
+    'get_weight_trend', 'update_weight_trend', 'rebuild_weight_trend', 'rebuild_missing_weight_trends',
+    'add_diary_item', 'add_diary_items', 'get_diary_day', 'get_diary_items',
+    'upsert_reminder', 'get_user_reminders', 'disable_reminders', 'get_due_reminders',
+    'get_reminders_by_ids', 'reschedule_reminders'
 ] 
\ No newline at end of file
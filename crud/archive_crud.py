@@ -0,0 +1,134 @@
+from sqlalchemy import func, null
+from sqlalchemy.orm import Session
+from models.tables import UserRecord, UserRecordArchive
+from models.database import retry_on_locked, is_locked_error
+from datetime import date, timedelta
+import logging
+
+# Колонки user_records -> колонки архива; остального (рост, цель, активность) в архиве нет
+ARCHIVE_COLUMNS = {
+    'date': UserRecordArchive.week_start,
+    'weight': UserRecordArchive.weight_mean,
+    'waist': UserRecordArchive.waist,
+    'neck': UserRecordArchive.neck,
+    'hip': UserRecordArchive.hip,
+    'bodyfat': UserRecordArchive.bodyfat,
+    'calories': UserRecordArchive.calories,
+    'protein': UserRecordArchive.protein,
+    'fat': UserRecordArchive.fat,
+    'carbs': UserRecordArchive.carbs,
+    'formula_version': UserRecordArchive.formula_version,
+}
+# Берутся из последнего за неделю замера, где они есть
+ARCHIVE_LAST_VALUES = ('waist', 'neck', 'hip', 'bodyfat')
+# КБЖУ и версия формул - из последнего замера, где КБЖУ посчитаны, все вместе
+ARCHIVE_TARGET_VALUES = ('calories', 'protein', 'fat', 'carbs', 'formula_version')
+# Сколько id удаляемых замеров в одном DELETE ... IN (лимит параметров SQLite)
+ARCHIVE_DELETE_BATCH = 500
+
+def get_week_start(day: date) -> date:
+    """Понедельник недели"""
+    return day - timedelta(days=day.weekday())
+
+def get_archive_cutoff(today: date, horizon_days: int) -> date:
+    """Граница архива по началу недели, чтобы неделя не делилась между архивом и рабочей таблицей"""
+    return get_week_start(today - timedelta(days=horizon_days))
+
+def get_archived_series(db: Session, telegram_id: int, columns: tuple):
+    """Недельные сводки под именами колонок user_records; колонок, которых нет в архиве, - None"""
+    logging.info(f"get_archived_series: telegram_id={telegram_id}, columns={columns}")
+    try:
+        fields = [ARCHIVE_COLUMNS.get(column, null()).label(column) for column in columns]
+        return db.query(*fields).filter(
+            UserRecordArchive.telegram_id == telegram_id
+        ).order_by(UserRecordArchive.week_start).all()
+    except Exception as e:
+        logging.error(f"get_archived_series error: {e}")
+        db.rollback()
+        return []
+
+def get_users_to_archive(db: Session, cutoff: date):
+    """Пользователи, у которых есть замеры старше границы"""
+    logging.info(f"get_users_to_archive: cutoff={cutoff}")
+    try:
+        return [row.telegram_id for row in db.query(UserRecord.telegram_id).filter(
+            UserRecord.date < cutoff
+        ).distinct().all()]
+    except Exception as e:
+        logging.error(f"get_users_to_archive error: {e}")
+        db.rollback()
+        return []
+
+def _summarize_week(rows) -> dict:
+    """Сводка по замерам одной недели (rows отсортированы по дате)"""
+    weights = [row.weight for row in rows if row.weight is not None]
+    summary = {
+        'last_date': rows[-1].date,
+        'records_count': len(rows),
+        'weight_mean': sum(weights) / len(weights) if weights else None,
+        'weight_min': min(weights) if weights else None,
+        'weight_max': max(weights) if weights else None,
+    }
+    for column in ARCHIVE_LAST_VALUES:
+        values = [getattr(row, column) for row in rows if getattr(row, column) is not None]
+        summary[column] = values[-1] if values else None
+    targets = [row for row in rows if row.calories is not None]
+    for column in ARCHIVE_TARGET_VALUES:
+        summary[column] = getattr(targets[-1], column) if targets else None
+    return summary
+
+@retry_on_locked
+def archive_user_records(db: Session, telegram_id: int, cutoff: date):
+    """
+    Сворачивает замеры пользователя старше cutoff в недельные сводки и удаляет их
+    из user_records одной транзакцией; замеры недель, у которых сводка уже есть, остаются.
+    Последний замер пользователя не трогаем: из него берутся рост, цель и активность. Возвращает число заархивированных замеров
+    """
+    logging.info(f"archive_user_records: telegram_id={telegram_id}, cutoff={cutoff}")
+    try:
+        latest_date = db.query(func.max(UserRecord.date)).filter(UserRecord.telegram_id == telegram_id).scalar()
+        if latest_date is None:
+            return 0
+        old_records = (UserRecord.telegram_id == telegram_id, UserRecord.date < cutoff, UserRecord.date < latest_date)
+        rows = db.query(
+            UserRecord.id, UserRecord.date, UserRecord.weight,
+            *[getattr(UserRecord, column) for column in ARCHIVE_LAST_VALUES + ARCHIVE_TARGET_VALUES]
+        ).filter(*old_records).order_by(UserRecord.date).all()
+        if not rows:
+            return 0
+
+        weeks = {}
+        for row in rows:
+            weeks.setdefault(get_week_start(row.date), []).append(row)
+        existing = {
+            row.week_start for row in db.query(UserRecordArchive.week_start).filter(
+                UserRecordArchive.telegram_id == telegram_id,
+                UserRecordArchive.week_start.in_(list(weeks))
+            ).all()
+        }
+        # Уже заархивированная неделя не пересчитывается: пришедшие за нее позже замеры
+        # (импорт) могут быть как копиями учтенных, так и новыми - по сводке этого не понять.
+        # Такие замеры остаются в рабочей таблице, удаляются только свернутые в новые сводки
+        archived_ids = []
+        for week_start, week_rows in weeks.items():
+            if week_start in existing:
+                continue
+            db.add(UserRecordArchive(telegram_id=telegram_id, week_start=week_start, **_summarize_week(week_rows)))
+            archived_ids += [row.id for row in week_rows]
+
+        for start in range(0, len(archived_ids), ARCHIVE_DELETE_BATCH):
+            db.query(UserRecord).filter(
+                UserRecord.id.in_(archived_ids[start:start + ARCHIVE_DELETE_BATCH])
+            ).delete(synchronize_session=False)
+        db.commit()
+        logging.info(
+            f"archive_user_records: telegram_id={telegram_id}, records={len(archived_ids)}, "
+            f"weeks={len(weeks) - len(existing)}, kept_in_archived_weeks={len(rows) - len(archived_ids)}"
+        )
+        return len(archived_ids)
+    except Exception as e:
+        logging.error(f"archive_user_records error: {e}")
+        db.rollback()
+        if is_locked_error(e):
+            raise
+        return 0
@@ -0,0 +1,75 @@
+from sqlalchemy.orm import Session
+from models.tables import FoodDiaryItem, FoodDiaryDay
+from models.database import retry_on_locked, is_locked_error
+from crud.upsert import build_upsert, upsert_params
+from datetime import date, datetime
+import logging
+
+DIARY_TOTALS = ('calories', 'protein', 'fat', 'carbs')
+
+# Итоги дня: первая запись за день вставляет строку, следующие прибавляют к ней
+UPSERT_DIARY_DAY = build_upsert(FoodDiaryDay.__table__, ('telegram_id', 'date'), increment=DIARY_TOTALS + ('items',))
+
+def _add_item(db: Session, telegram_id: int, day: date, food: dict):
+    """Продукт в дневник и его КБЖУ к итогам дня, без commit; возвращает итоги дня"""
+    db.add(FoodDiaryItem(
+        telegram_id=telegram_id, date=day, name=food['name'], grams=food['grams'],
+        created_at=datetime.utcnow(), **{column: food[column] for column in DIARY_TOTALS}
+    ))
+    return db.execute(UPSERT_DIARY_DAY, upsert_params(FoodDiaryDay.__table__, {
+        'telegram_id': telegram_id, 'date': day, 'items': 1,
+        **{column: food[column] for column in DIARY_TOTALS}
+    })).one()
+
+def add_diary_item(db: Session, telegram_id: int, day: date, food: dict, commit: bool = True):
+    """
+    Записать продукт в дневник и прибавить его КБЖУ к итогам дня - одной транзакцией.
+    food - результат utils.nutrition_db.lookup_food. Возвращает итоги дня
+    """
+    return add_diary_items(db, telegram_id, day, [food], commit=commit)
+
+@retry_on_locked
+def add_diary_items(db: Session, telegram_id: int, day: date, foods: list, commit: bool = True):
+    """
+    Несколько продуктов одного сообщения одной транзакцией: записываются все или ни один.
+    Возвращает итоги дня после последнего продукта
+    """
+    logging.info(f"add_diary_items: telegram_id={telegram_id}, day={day}, foods={[(food['name'], food['grams']) for food in foods]}")
+    try:
+        totals = None
+        for food in foods:
+            totals = _add_item(db, telegram_id, day, food)
+        if commit:
+            db.commit()
+        return totals
+    except Exception as e:
+        logging.error(f"add_diary_items error: {e}")
+        if not commit:
+            raise
+        db.rollback()
+        if is_locked_error(e):
+            raise
+        return None
+
+def get_diary_day(db: Session, telegram_id: int, day: date):
+    """Итоги дня одной строкой по уникальному ключу; None, если за день ничего не записано"""
+    logging.info(f"get_diary_day: telegram_id={telegram_id}, day={day}")
+    try:
+        return db.query(FoodDiaryDay).filter(FoodDiaryDay.telegram_id == telegram_id, FoodDiaryDay.date == day).first()
+    except Exception as e:
+        logging.error(f"get_diary_day error: {e}")
+        db.rollback()
+        return None
+
+def get_diary_items(db: Session, telegram_id: int, day: date, limit: int = 20):
+    """Последние продукты дня, новые в конце"""
+    logging.info(f"get_diary_items: telegram_id={telegram_id}, day={day}")
+    try:
+        items = db.query(FoodDiaryItem).filter(
+            FoodDiaryItem.telegram_id == telegram_id, FoodDiaryItem.date == day
+        ).order_by(FoodDiaryItem.id.desc()).limit(limit).all()
+        return items[::-1]
+    except Exception as e:
+        logging.error(f"get_diary_items error: {e}")
+        db.rollback()
+        return []
@@ -1,5 +1,10 @@
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from models.tables import UserFoodPreferences
+from models.tables import UserFoodPreferences, UserFoodTerm
+from models.database import retry_on_locked, is_locked_error
+from crud.upsert import build_upsert, upsert_params
+from utils.food_terms import normalize_food_text, normalize_food_query
+from datetime import datetime
 import logging
 
 def get_food_preferences(db: Session, telegram_id: int):
@@ -11,34 +16,134 @@ def get_food_preferences(db: Session, telegram_id: int):
         db.rollback()
         return None
 
-def create_or_update_food_preferences(db: Session, telegram_id: int, likes_raw: str = None, dislikes_raw: str = None):
+UPSERT_FOOD_PREFERENCES = build_upsert(UserFoodPreferences.__table__, ('telegram_id',), insert_only=('created_at',))
+UPSERT_FOOD_PREFERENCES_MANY = build_upsert(UserFoodPreferences.__table__, ('telegram_id',), insert_only=('created_at',), returning=False)
+
+def _food_preferences_params(telegram_id: int, likes_raw: str = None, dislikes_raw: str = None) -> dict:
+    return upsert_params(UserFoodPreferences.__table__, {
+        'telegram_id': telegram_id,
+        'likes_raw': likes_raw.strip() if likes_raw is not None else None,
+        'dislikes_raw': dislikes_raw.strip() if dislikes_raw is not None else None,
+        'created_at': datetime.utcnow()
+    })
+
+def _reindex_food_terms(db: Session, telegram_id: int, kind: str, text: str):
+    """Привести термины пользователя к тексту: удаляются и добавляются только изменившиеся"""
+    terms = normalize_food_text(text)
+    existing = {row.term for row in db.query(UserFoodTerm.term).filter(
+        UserFoodTerm.telegram_id == telegram_id, UserFoodTerm.kind == kind
+    )}
+    removed = existing - terms
+    if removed:
+        db.query(UserFoodTerm).filter(
+            UserFoodTerm.telegram_id == telegram_id, UserFoodTerm.kind == kind, UserFoodTerm.term.in_(removed)
+        ).delete(synchronize_session=False)
+    added = terms - existing
+    if added:
+        db.execute(UserFoodTerm.__table__.insert(), [
+            {'telegram_id': telegram_id, 'kind': kind, 'term': term} for term in added
+        ])
+
+def _reindex_preferences(db: Session, telegram_id: int, likes_raw: str = None, dislikes_raw: str = None):
+    # None - поле не менялось, его термины не трогаем
+    if likes_raw is not None:
+        _reindex_food_terms(db, telegram_id, 'like', likes_raw)
+    if dislikes_raw is not None:
+        _reindex_food_terms(db, telegram_id, 'dislike', dislikes_raw)
+
+@retry_on_locked
+def create_or_update_food_preferences(db: Session, telegram_id: int, likes_raw: str = None, dislikes_raw: str = None,
+                                      commit: bool = True):
+    """
+    Предпочтения одним запросом INSERT ... ON CONFLICT ... RETURNING; None не затирает сохраненное.
+    Термины измененных полей переиндексируются в той же транзакции
+    """
     logging.info(f"create_or_update_food_preferences: telegram_id={telegram_id}, likes_raw={likes_raw}, dislikes_raw={dislikes_raw}")
     try:
-        existing_prefs = get_food_preferences(db, telegram_id)
-        
-        if existing_prefs:
-            # UPDATE
-            if likes_raw is not None:
-                existing_prefs.likes_raw = likes_raw.strip() if likes_raw else ""
-            if dislikes_raw is not None:
-                existing_prefs.dislikes_raw = dislikes_raw.strip() if dislikes_raw else ""
-            db.commit()
-            db.refresh(existing_prefs)
-            logging.info(f"create_or_update_food_preferences: updated id={existing_prefs.id}")
-            return existing_prefs
-        else:
-            # CREATE
-            new_prefs = UserFoodPreferences(
-                telegram_id=telegram_id,
-                likes_raw=likes_raw.strip() if likes_raw else "",
-                dislikes_raw=dislikes_raw.strip() if dislikes_raw else ""
-            )
-            db.add(new_prefs)
+        prefs = db.execute(UPSERT_FOOD_PREFERENCES, _food_preferences_params(telegram_id, likes_raw, dislikes_raw)).one()
+        _reindex_preferences(db, telegram_id, likes_raw, dislikes_raw)
+        if commit:
             db.commit()
-            db.refresh(new_prefs)
-            logging.info(f"create_or_update_food_preferences: created id={new_prefs.id}")
-            return new_prefs
+        logging.info(f"create_or_update_food_preferences: saved id={prefs.id}")
+        return prefs
     except Exception as e:
         logging.error(f"create_or_update_food_preferences error: {e}")
+        if not commit:
+            raise
+        db.rollback()
+        if is_locked_error(e):
+            raise
+        return None
+
+@retry_on_locked
+def bulk_upsert_food_preferences(db: Session, items: list):
+    """
+    Предпочтения многих пользователей одной транзакцией.
+    items - словари с telegram_id, likes_raw, dislikes_raw. Возвращает число записанных
+    """
+    logging.info(f"bulk_upsert_food_preferences: items={len(items)}")
+    try:
+        db.execute(UPSERT_FOOD_PREFERENCES_MANY, [
+            _food_preferences_params(item['telegram_id'], item.get('likes_raw'), item.get('dislikes_raw')) for item in items
+        ])
+        for item in items:
+            _reindex_preferences(db, item['telegram_id'], item.get('likes_raw'), item.get('dislikes_raw'))
+        db.commit()
+        return len(items)
+    except Exception as e:
+        logging.error(f"bulk_upsert_food_preferences error: {e}")
         db.rollback()
-        return None 
\ No newline at end of file
+        if is_locked_error(e):
+            raise
+        return 0
+
+def get_users_by_food_term(db: Session, kind: str, query: str) -> list:
+    """telegram_id пользователей, у которых в kind ('like'/'dislike') есть продукт или категория query"""
+    term = normalize_food_query(query)
+    logging.info(f"get_users_by_food_term: kind={kind}, query={query}, term={term}")
+    try:
+        return [row.telegram_id for row in db.query(UserFoodTerm.telegram_id).filter(
+            UserFoodTerm.kind == kind, UserFoodTerm.term == term
+        )]
+    except Exception as e:
+        logging.error(f"get_users_by_food_term error: {e}")
+        db.rollback()
+        return []
+
+def get_top_food_terms(db: Session, kind: str, limit: int = 10, categories: bool = False) -> list:
+    """Самые частые термины: [(термин, пользователей)]; categories=True - только категории '#...'"""
+    logging.info(f"get_top_food_terms: kind={kind}, limit={limit}, categories={categories}")
+    try:
+        users = func.count(UserFoodTerm.telegram_id).label('users')
+        query = db.query(UserFoodTerm.term, users).filter(UserFoodTerm.kind == kind)
+        query = query.filter(UserFoodTerm.term.like('#%') if categories else UserFoodTerm.term.notlike('#%'))
+        return [(row.term, row.users) for row in query.group_by(UserFoodTerm.term).order_by(users.desc()).limit(limit)]
+    except Exception as e:
+        logging.error(f"get_top_food_terms error: {e}")
+        db.rollback()
+        return []
+
+def reindex_all_food_terms(db: Session, batch_size: int = 500) -> int:
+    """Переиндексировать предпочтения всех пользователей (после изменения словарей); возвращает число пользователей"""
+    logging.info("reindex_all_food_terms: start")
+    count = 0
+    last_id = 0
+    while True:
+        # Пачками по telegram_id, каждая пачка - своя транзакция
+        batch = db.query(
+            UserFoodPreferences.telegram_id, UserFoodPreferences.likes_raw, UserFoodPreferences.dislikes_raw
+        ).filter(UserFoodPreferences.telegram_id > last_id).order_by(UserFoodPreferences.telegram_id).limit(batch_size).all()
+        if not batch:
+            break
+        try:
+            for prefs in batch:
+                _reindex_preferences(db, prefs.telegram_id, prefs.likes_raw or '', prefs.dislikes_raw or '')
+            db.commit()
+        except Exception as e:
+            logging.error(f"reindex_all_food_terms error: {e}")
+            db.rollback()
+            break
+        count += len(batch)
+        last_id = batch[-1].telegram_id
+    logging.info(f"reindex_all_food_terms: reindexed {count} users")
+    return count
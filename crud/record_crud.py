@@ -1,7 +1,11 @@
 from sqlalchemy.orm import Session
-from models.tables import UserRecord
+from models.tables import UserRecord, UserRecordArchive
+from models.database import retry_on_locked, is_locked_error
+from crud.upsert import build_upsert, upsert_params
+from crud.archive_crud import get_archived_series
+from crud.trend_crud import update_weight_trend, rebuild_weight_trend
+from utils.calculations import FORMULA_VERSION, calculate_record_targets
 from datetime import date
-from sqlalchemy import and_
 import logging
 
 def get_user_records(db: Session, telegram_id: int):
@@ -22,38 +26,150 @@ def get_latest_record(db: Session, telegram_id: int):
         db.rollback()
         return None
 
-def create_or_update_record(db: Session, telegram_id: int, record_date: date, **kwargs):
+def get_latest_bodyfat(db: Session, telegram_id: int):
+    """
+    Последний посчитанный процент жира: у замеров одного веса его нет, тогда берется
+    из более ранней записи с обхватами, а если их уже заархивировали - из архива
+    """
+    logging.info(f"get_latest_bodyfat: telegram_id={telegram_id}")
+    try:
+        bodyfat = db.query(UserRecord.bodyfat).filter(
+            UserRecord.telegram_id == telegram_id, UserRecord.bodyfat.isnot(None)
+        ).order_by(UserRecord.date.desc()).limit(1).scalar()
+        if bodyfat is None:
+            bodyfat = db.query(UserRecordArchive.bodyfat).filter(
+                UserRecordArchive.telegram_id == telegram_id, UserRecordArchive.bodyfat.isnot(None)
+            ).order_by(UserRecordArchive.week_start.desc()).limit(1).scalar()
+        return bodyfat
+    except Exception as e:
+        logging.error(f"get_latest_bodyfat error: {e}")
+        db.rollback()
+        return None
+
+def get_progress_series(db: Session, telegram_id: int, columns: tuple):
+    """
+    Только нужные для графика колонки, отсортированные по дате.
+    Вместе с недельными сводками из архива: они идут под теми же именами колонок
+    """
+    logging.info(f"get_progress_series: telegram_id={telegram_id}, columns={columns}")
+    try:
+        fields = [getattr(UserRecord, column) for column in columns]
+        rows = db.query(UserRecord.date, *fields).filter(
+            UserRecord.telegram_id == telegram_id
+        ).order_by(UserRecord.date).all()
+        archived = get_archived_series(db, telegram_id, ('date',) + tuple(columns))
+        return sorted(archived + rows, key=lambda row: row.date) if archived else rows
+    except Exception as e:
+        logging.error(f"get_progress_series error: {e}")
+        db.rollback()
+        return []
+
+def iter_user_records(db: Session, telegram_id: int, columns: tuple, batch_size: int = 500):
+    """
+    Построчно отдает историю замеров пачками по batch_size, не загружая ее целиком.
+    Сначала недельные сводки из архива (их немного), затем рабочая таблица
+    """
+    logging.info(f"iter_user_records: telegram_id={telegram_id}, columns={columns}")
+    for row in get_archived_series(db, telegram_id, columns):
+        yield row
+    fields = [getattr(UserRecord, column) for column in columns]
+    query = db.query(*fields).filter(
+        UserRecord.telegram_id == telegram_id
+    ).order_by(UserRecord.date).yield_per(batch_size)
+    for row in query:
+        yield row
+
+# Запись за день одним запросом; второй вариант без RETURNING - для executemany
+UPSERT_RECORD = build_upsert(UserRecord.__table__, ('telegram_id', 'date'))
+UPSERT_RECORD_MANY = build_upsert(UserRecord.__table__, ('telegram_id', 'date'), returning=False)
+
+@retry_on_locked
+def create_or_update_record(db: Session, telegram_id: int, record_date: date, commit: bool = True, **kwargs):
+    """
+    Запись за день: INSERT, а если запись на эту дату уже есть - UPDATE переданных полей.
+    Один запрос INSERT ... ON CONFLICT ... RETURNING, возвращает итоговую строку.
+    Заодно обновляет тренд веса (crud.trend_crud)
+    """
     logging.info(f"create_or_update_record: telegram_id={telegram_id}, record_date={record_date}, kwargs={kwargs}")
     try:
-        # Проверяем, есть ли запись на эту дату
-        existing_record = db.query(UserRecord).filter(
-            and_(UserRecord.telegram_id == telegram_id, UserRecord.date == record_date)
-        ).first()
-        
-        if existing_record:
-            # UPDATE если ввод в тот же день
-            for key, value in kwargs.items():
-                if hasattr(existing_record, key) and value is not None:
-                    setattr(existing_record, key, value)
-            db.commit()
-            db.refresh(existing_record)
-            logging.info(f"create_or_update_record: updated record id={existing_record.id}")
-            return existing_record
-        else:
-            # INSERT если ввод в другой день
-            # Фильтруем None значения
-            filtered_kwargs = {k: v for k, v in kwargs.items() if v is not None}
-            new_record = UserRecord(
-                telegram_id=telegram_id,
-                date=record_date,
-                **filtered_kwargs
-            )
-            db.add(new_record)
+        params = upsert_params(UserRecord.__table__, {**kwargs, 'telegram_id': telegram_id, 'date': record_date})
+        record = db.execute(UPSERT_RECORD, params).one()
+        # Тренд веса в той же транзакции, что и сама запись
+        update_weight_trend(db, telegram_id, record.date, record.weight)
+        if commit:
             db.commit()
-            db.refresh(new_record)
-            logging.info(f"create_or_update_record: created record id={new_record.id}")
-            return new_record
+        logging.info(f"create_or_update_record: saved record id={record.id}")
+        return record
     except Exception as e:
         logging.error(f"create_or_update_record error: {e}")
+        if not commit:
+            raise
         db.rollback()
-        return None 
\ No newline at end of file
+        if is_locked_error(e):
+            raise
+        return None
+
+RECORD_TARGET_COLUMNS = ('bodyfat', 'calories', 'protein', 'fat', 'carbs')
+
+def read_record_targets(sex: str, record) -> tuple:
+    """
+    Процент жира и КБЖУ записи: (targets, stale). Обычно просто читаются из записи, stale - None.
+    Если они посчитаны старой версией формул (или не посчитаны), пересчитываются, а stale -
+    все расчетные колонки для update_record_targets. Сама функция в базу не пишет:
+    сохранять пересчитанное - через utils.group_commit (write_later), вне event loop
+    """
+    if record.formula_version == FORMULA_VERSION:
+        return {column: getattr(record, column) for column in RECORD_TARGET_COLUMNS}, None
+
+    logging.info(f"read_record_targets: record id={record.id}, formula_version={record.formula_version}")
+    stale = calculate_record_targets(sex, {column.name: getattr(record, column.name) for column in UserRecord.__table__.columns})
+    if stale['bodyfat'] is None:
+        # Замер одного веса: пересчитать не из чего, остается посчитанное при сохранении
+        return {column: getattr(record, column) for column in RECORD_TARGET_COLUMNS}, None
+    return {column: stale[column] for column in RECORD_TARGET_COLUMNS}, stale
+
+@retry_on_locked
+def update_record_targets(db: Session, record_id: int, targets: dict, commit: bool = True):
+    """Сохранить пересчитанные расчетные колонки записи"""
+    logging.info(f"update_record_targets: record id={record_id}")
+    try:
+        count = db.query(UserRecord).filter(UserRecord.id == record_id).update(targets, synchronize_session=False)
+        if commit:
+            db.commit()
+        return count
+    except Exception as e:
+        logging.error(f"update_record_targets error: {e}")
+        if not commit:
+            raise
+        db.rollback()
+        if is_locked_error(e):
+            raise
+        return None
+
+@retry_on_locked
+def bulk_upsert_records(db: Session, telegram_id: int, rows: list, batch_size: int = 500):
+    """
+    Массовая запись замеров по ключу (telegram_id, date): пачками, одна транзакция на пачку.
+    rows - словари с полем date и колонками UserRecord. Возвращает число записанных строк
+    """
+    logging.info(f"bulk_upsert_records: telegram_id={telegram_id}, rows={len(rows)}")
+    saved = 0
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        try:
+            db.execute(UPSERT_RECORD_MANY, [
+                upsert_params(UserRecord.__table__, {**row, 'telegram_id': telegram_id}) for row in batch
+            ])
+            db.commit()
+            saved += len(batch)
+        except Exception as e:
+            logging.error(f"bulk_upsert_records error: {e}")
+            db.rollback()
+            if is_locked_error(e):
+                raise
+            break
+    if saved:
+        # Импорт обычно задним числом: тренд проще собрать заново, чем сдвигать
+        rebuild_weight_trend(db, telegram_id)
+    logging.info(f"bulk_upsert_records: telegram_id={telegram_id}, saved={saved}")
+    return saved
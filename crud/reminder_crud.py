@@ -0,0 +1,107 @@
+from sqlalchemy import update, bindparam
+from sqlalchemy.orm import Session
+from models.tables import Reminder
+from models.database import retry_on_locked, is_locked_error
+from crud.upsert import build_upsert, upsert_params
+import logging
+
+# Одно напоминание каждого вида на пользователя: ключ для upsert
+UPSERT_REMINDER = build_upsert(Reminder.__table__, ('telegram_id', 'kind'), insert_only=('last_sent',))
+
+@retry_on_locked
+def upsert_reminder(db: Session, telegram_id: int, kind: str, commit: bool = True, **kwargs):
+    """Создать или изменить напоминание вида kind; возвращает итоговую строку"""
+    logging.info(f"upsert_reminder: telegram_id={telegram_id}, kind={kind}, kwargs={kwargs}")
+    try:
+        reminder = db.execute(UPSERT_REMINDER, upsert_params(Reminder.__table__, {
+            **kwargs, 'telegram_id': telegram_id, 'kind': kind, 'enabled': True
+        })).one()
+        if commit:
+            db.commit()
+        return reminder
+    except Exception as e:
+        logging.error(f"upsert_reminder error: {e}")
+        if not commit:
+            raise
+        db.rollback()
+        if is_locked_error(e):
+            raise
+        return None
+
+def get_user_reminders(db: Session, telegram_id: int):
+    logging.info(f"get_user_reminders: telegram_id={telegram_id}")
+    try:
+        return db.query(Reminder).filter(Reminder.telegram_id == telegram_id).order_by(Reminder.kind).all()
+    except Exception as e:
+        logging.error(f"get_user_reminders error: {e}")
+        db.rollback()
+        return []
+
+@retry_on_locked
+def disable_reminders(db: Session, telegram_id: int, kind: str = None, commit: bool = True) -> int:
+    """Выключить напоминания пользователя (все или одного вида); возвращает их число"""
+    logging.info(f"disable_reminders: telegram_id={telegram_id}, kind={kind}")
+    try:
+        query = db.query(Reminder).filter(Reminder.telegram_id == telegram_id, Reminder.enabled.is_(True))
+        if kind:
+            query = query.filter(Reminder.kind == kind)
+        count = query.update({Reminder.enabled: False}, synchronize_session=False)
+        if commit:
+            db.commit()
+        return count
+    except Exception as e:
+        logging.error(f"disable_reminders error: {e}")
+        if not commit:
+            raise
+        db.rollback()
+        if is_locked_error(e):
+            raise
+        return None
+
+def get_due_reminders(db: Session, until: float, limit: int) -> list:
+    """(id, next_due) включенных напоминаний, которые наступят до until, по порядку"""
+    logging.info(f"get_due_reminders: until={until}, limit={limit}")
+    try:
+        return db.query(Reminder.id, Reminder.next_due).filter(
+            Reminder.enabled.is_(True), Reminder.next_due < until
+        ).order_by(Reminder.next_due).limit(limit).all()
+    except Exception as e:
+        logging.error(f"get_due_reminders error: {e}")
+        db.rollback()
+        return []
+
+def get_reminders_by_ids(db: Session, ids: list) -> list:
+    logging.info(f"get_reminders_by_ids: count={len(ids)}")
+    try:
+        return db.query(Reminder).filter(Reminder.id.in_(ids)).all()
+    except Exception as e:
+        logging.error(f"get_reminders_by_ids error: {e}")
+        db.rollback()
+        return []
+
+RESCHEDULE_REMINDER = update(Reminder.__table__).where(
+    Reminder.__table__.c.id == bindparam('reminder_id')
+).values(next_due=bindparam('due'), last_sent=bindparam('sent'))
+
+@retry_on_locked
+def reschedule_reminders(db: Session, updates: list, blocked: list = ()):
+    """
+    Следующие отправки пачки одной транзакцией: updates - [{'id', 'next_due', 'last_sent'}].
+    blocked - id напоминаний пользователей, которые заблокировали бота: выключаются
+    """
+    logging.info(f"reschedule_reminders: updates={len(updates)}, blocked={len(blocked)}")
+    try:
+        if updates:
+            db.execute(RESCHEDULE_REMINDER, [
+                {'reminder_id': item['id'], 'due': item['next_due'], 'sent': item['last_sent']} for item in updates
+            ])
+        if blocked:
+            db.query(Reminder).filter(Reminder.id.in_(blocked)).update({Reminder.enabled: False}, synchronize_session=False)
+        db.commit()
+        return len(updates)
+    except Exception as e:
+        logging.error(f"reschedule_reminders error: {e}")
+        db.rollback()
+        if is_locked_error(e):
+            raise
+        return None
@@ -0,0 +1,89 @@
+from sqlalchemy.orm import Session
+from models.tables import UserRecord, UserWeightTrend
+from models.database import retry_on_locked, is_locked_error
+from crud.archive_crud import get_archived_series
+from utils.trend import reset_trend, add_trend_point
+from datetime import date
+import logging
+
+def update_weight_trend(db: Session, telegram_id: int, record_date: date, weight: float):
+    """
+    Учесть замер в тренде без commit (вызывается в транзакции записи замера).
+    Замер задним числом меняет уже учтенную историю - тогда тренд собирается заново;
+    так же собирается тренд, которого еще нет (замеры до появления трендов)
+    """
+    if weight is None:
+        return
+    trend = db.get(UserWeightTrend, telegram_id)
+    if trend is None:
+        trend = UserWeightTrend(telegram_id=telegram_id)
+        db.add(trend)
+        _rebuild(db, trend)
+    elif trend.last_date is not None and record_date < trend.last_date:
+        logging.info(f"update_weight_trend: telegram_id={telegram_id}, out of order {record_date} < {trend.last_date}, rebuilding")
+        _rebuild(db, trend)
+    else:
+        add_trend_point(trend, record_date, weight)
+    db.flush()
+
+def _rebuild(db: Session, trend):
+    """Собрать тренд по всей истории: архив (средний вес недели) и рабочая таблица"""
+    reset_trend(trend)
+    rows = get_archived_series(db, trend.telegram_id, ('date', 'weight')) + db.query(
+        UserRecord.date, UserRecord.weight
+    ).filter(UserRecord.telegram_id == trend.telegram_id).order_by(UserRecord.date).all()
+    for row in rows:
+        if row.weight is not None:
+            add_trend_point(trend, row.date, row.weight)
+
+@retry_on_locked
+def rebuild_weight_trend(db: Session, telegram_id: int, commit: bool = True):
+    """Пересобрать тренд по истории (после импорта); возвращает тренд или None"""
+    logging.info(f"rebuild_weight_trend: telegram_id={telegram_id}")
+    try:
+        trend = db.get(UserWeightTrend, telegram_id)
+        if trend is None:
+            trend = UserWeightTrend(telegram_id=telegram_id)
+            db.add(trend)
+        _rebuild(db, trend)
+        if commit:
+            db.commit()
+        return trend
+    except Exception as e:
+        logging.error(f"rebuild_weight_trend error: {e}")
+        if not commit:
+            raise
+        db.rollback()
+        if is_locked_error(e):
+            raise
+        return None
+
+def rebuild_missing_weight_trends(db: Session) -> int:
+    """
+    Собрать тренды пользователей, у которых есть замеры, но тренда нет (замеры до
+    появления трендов). Запускается при старте бота и scripts/rebuild_weight_trends.py,
+    чтобы обработчики только читали тренд по ключу. Возвращает число собранных
+    """
+    logging.info("rebuild_missing_weight_trends")
+    try:
+        users = [row.telegram_id for row in db.query(UserRecord.telegram_id).outerjoin(
+            UserWeightTrend, UserWeightTrend.telegram_id == UserRecord.telegram_id
+        ).filter(UserWeightTrend.telegram_id.is_(None)).distinct().all()]
+    except Exception as e:
+        logging.error(f"rebuild_missing_weight_trends error: {e}")
+        db.rollback()
+        return 0
+    return sum(1 for telegram_id in users if rebuild_weight_trend(db, telegram_id) is not None)
+
+def get_weight_trend(db: Session, telegram_id: int):
+    """Тренд веса одним запросом по ключу; None, если тренда нет или в нем нет точек"""
+    logging.info(f"get_weight_trend: telegram_id={telegram_id}")
+    try:
+        trend = db.get(UserWeightTrend, telegram_id)
+    except Exception as e:
+        logging.error(f"get_weight_trend error: {e}")
+        db.rollback()
+        return None
+    if trend is None or not trend.points:
+        return None
+    return trend
@@ -0,0 +1,39 @@
+from sqlalchemy import Table, bindparam, text
+from sqlalchemy.sql.elements import TextClause
+
+def build_upsert(table: Table, key_columns: tuple, insert_only: tuple = (), returning: bool = True,
+                 increment: tuple = ()) -> TextClause:
+    """
+    INSERT ... ON CONFLICT (key) DO UPDATE для одной строки, собранный один раз при импорте.
+    Переданный None не затирает сохраненное значение (COALESCE), колонки insert_only
+    пишутся только при вставке, к колонкам increment переданное значение прибавляется
+    (счетчики и суммы). С returning=True запрос сразу возвращает итоговую строку.
+    Нужен уникальный индекс на key_columns; RETURNING есть в SQLite с 3.35 и в PostgreSQL.
+    SQLAlchemy 1.4 не умеет RETURNING для SQLite, поэтому запрос текстовый, но с типами колонок
+    """
+    columns = [column for column in table.columns if not column.primary_key]
+    names = [column.name for column in columns]
+    updated = [name for name in names if name not in key_columns and name not in insert_only]
+
+    def assignment(name: str) -> str:
+        if name in increment:
+            return f"{name} = {table.name}.{name} + COALESCE(excluded.{name}, 0)"
+        return f"{name} = COALESCE(excluded.{name}, {table.name}.{name})"
+
+    sql = (
+        f"INSERT INTO {table.name} ({', '.join(names)}) "
+        f"VALUES ({', '.join(':' + name for name in names)}) "
+        f"ON CONFLICT ({', '.join(key_columns)}) DO UPDATE SET "
+        + ', '.join(assignment(name) for name in updated)
+    )
+    if returning:
+        sql += f" RETURNING {', '.join(column.name for column in table.columns)}"
+
+    statement = text(sql).bindparams(*[bindparam(column.name, type_=column.type) for column in columns])
+    if returning:
+        statement = statement.columns(*table.columns)
+    return statement
+
+def upsert_params(table: Table, values: dict) -> dict:
+    """Параметры для build_upsert: все колонки таблицы, неизвестные ключи отбрасываются"""
+    return {column.name: values.get(column.name) for column in table.columns if not column.primary_key}
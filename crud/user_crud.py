@@ -1,5 +1,6 @@
 from sqlalchemy.orm import Session
 from models.tables import User
+from models.database import retry_on_locked, is_locked_error
 from datetime import datetime
 import logging
 
@@ -12,8 +13,9 @@ def get_user(db: Session, telegram_id: int):
         db.rollback()
         return None
 
+@retry_on_locked
 def create_user(db: Session, telegram_id: int, username: str = None, 
-                first_name: str = None, last_name: str = None, **kwargs):
+                first_name: str = None, last_name: str = None, commit: bool = True, **kwargs):
     logging.info(f"create_user: telegram_id={telegram_id}, username={username}, first_name={first_name}, last_name={last_name}")
     try:
         db_user = User(
@@ -24,16 +26,24 @@ def create_user(db: Session, telegram_id: int, username: str = None,
             **kwargs
         )
         db.add(db_user)
-        db.commit()
+        if commit:
+            db.commit()
+        else:
+            db.flush()
         db.refresh(db_user)
         logging.info(f"create_user: created user id={db_user.telegram_id}")
         return db_user
     except Exception as e:
         logging.error(f"create_user error: {e}")
+        if not commit:
+            raise
         db.rollback()
+        if is_locked_error(e):
+            raise
         return None
 
-def update_user(db: Session, telegram_id: int, **kwargs):
+@retry_on_locked
+def update_user(db: Session, telegram_id: int, commit: bool = True, **kwargs):
     logging.info(f"update_user: telegram_id={telegram_id}, kwargs={kwargs}")
     try:
         db_user = get_user(db, telegram_id)
@@ -41,13 +51,20 @@ def update_user(db: Session, telegram_id: int, **kwargs):
             for key, value in kwargs.items():
                 if hasattr(db_user, key):
                     setattr(db_user, key, value)
-            db.commit()
+            if commit:
+                db.commit()
+            else:
+                db.flush()
             db.refresh(db_user)
             logging.info(f"update_user: updated user id={db_user.telegram_id}")
         return db_user
     except Exception as e:
         logging.error(f"update_user error: {e}")
+        if not commit:
+            raise
         db.rollback()
+        if is_locked_error(e):
+            raise
         return None
 
 def user_exists(db: Session, telegram_id: int):
@@ -4,10 +4,13 @@ from .measurements_handlers import *
 from .goal_handlers import *
 from .food_handlers import *
 from .menu_handlers import *
+from .export_handlers import *
+from .import_handlers import *
 
 __all__ = [
     'register_start_handlers', 'register_user_info_handlers', 
     'register_measurements_handlers',
     'register_goal_handlers', 
-    'register_food_handlers', 'register_menu_handlers'
+    'register_food_handlers', 'register_menu_handlers',
+    'register_export_handlers', 'register_import_handlers'
 ] 
\ No newline at end of file
@@ -0,0 +1,49 @@
+from aiogram import Dispatcher, types
+from aiogram.dispatcher import FSMContext
+import logging
+
+from config import ADMIN_IDS
+from utils.analytics import get_analytics_report, format_analytics_report, get_funnel_report, format_funnel_report
+from utils.jobs import run_job, JobQueueFullError
+from utils.throttling import throttle_cost, EXPENSIVE_COST
+
+@throttle_cost(EXPENSIVE_COST)
+async def cmd_stats(message: types.Message, state: FSMContext):
+    """Сводка по пользователям для администраторов: /stats, /stats fresh - без кэша"""
+    logging.info(f"cmd_stats: user={message.from_user.id}, args={message.get_args()}")
+    if message.from_user.id not in ADMIN_IDS:
+        return
+
+    try:
+        report = await run_job(get_analytics_report, message.get_args() == 'fresh')
+    except JobQueueFullError:
+        await message.answer("⏳ Очередь задач занята, попробуйте через минуту.")
+        return
+    except Exception as e:
+        logging.error(f"cmd_stats error: {e}")
+        await message.answer("❌ Не удалось посчитать статистику.")
+        return
+    await message.answer(format_analytics_report(report))
+
+@throttle_cost(EXPENSIVE_COST)
+async def cmd_funnel(message: types.Message, state: FSMContext):
+    """Воронка анкеты и консультации для администраторов: /funnel, /funnel fresh - без кэша"""
+    logging.info(f"cmd_funnel: user={message.from_user.id}, args={message.get_args()}")
+    if message.from_user.id not in ADMIN_IDS:
+        return
+
+    try:
+        report = await run_job(get_funnel_report, message.get_args() == 'fresh')
+    except JobQueueFullError:
+        await message.answer("⏳ Очередь задач занята, попробуйте через минуту.")
+        return
+    except Exception as e:
+        logging.error(f"cmd_funnel error: {e}")
+        await message.answer("❌ Не удалось посчитать воронку.")
+        return
+    await message.answer(format_funnel_report(report))
+
+def register_admin_handlers(dp: Dispatcher):
+    """Регистрация команд администратора"""
+    dp.register_message_handler(cmd_stats, commands=['stats'])
+    dp.register_message_handler(cmd_funnel, commands=['funnel'])
@@ -0,0 +1,86 @@
+from aiogram import Dispatcher, types
+from aiogram.dispatcher import FSMContext
+from datetime import date
+import logging
+import re
+
+from utils.texts import get_diary_text, get_diary_added_text
+from utils.nutrition_db import lookup_food
+from utils.group_commit import write, write_later
+from crud.user_crud import get_user
+from crud.record_crud import get_latest_record, read_record_targets, update_record_targets
+from crud.diary_crud import add_diary_items, get_diary_day, get_diary_items
+from models.database import SessionLocal
+
+# Продукты в /eat: через перевод строки, точку с запятой или запятую (но не "1,5 кг")
+ITEM_SEPARATOR_RE = re.compile(r'[;\n]|,(?!\d)')
+# Больше продуктов одним сообщением не записываем
+MAX_ITEMS_PER_MESSAGE = 10
+
+def get_user_targets(db, telegram_id: int):
+    """Пользователь и КБЖУ его последней записи (None, если замеров нет)"""
+    user = get_user(db, telegram_id)
+    latest_record = get_latest_record(db, telegram_id) if user else None
+    if not latest_record:
+        return user, None
+    targets, stale = read_record_targets(user.sex, latest_record)
+    if stale:
+        write_later(update_record_targets, latest_record.id, stale)
+    return user, targets
+
+async def cmd_eat(message: types.Message, state: FSMContext):
+    """Записать съеденное: /eat гречка 150г, курица 200г"""
+    logging.info(f"cmd_eat: user={message.from_user.id}, args={message.get_args()}")
+    parts = [part.strip() for part in ITEM_SEPARATOR_RE.split(message.get_args() or '') if part.strip()]
+    if not parts:
+        await message.answer("🍽 Что вы съели? Например: /eat гречка 150г, курица 200г, яблоко")
+        return
+
+    db = SessionLocal()
+    user, targets = get_user_targets(db, message.from_user.id)
+    db.close()
+    if not user:
+        await message.answer("❌ Сначала пройдите анкету! Используйте /start")
+        return
+
+    foods, not_found = [], []
+    for part in parts[:MAX_ITEMS_PER_MESSAGE]:
+        food = lookup_food(part)
+        if food:
+            foods.append(food)
+        else:
+            not_found.append(re.sub(r'[*_`\[]', '', part))
+
+    # Все продукты сообщения одной транзакцией: либо записаны все, либо ни один
+    totals = await write(add_diary_items, message.from_user.id, date.today(), foods) if foods else None
+    if foods and totals is None:
+        await message.answer("❌ Не удалось сохранить запись, попробуйте еще раз")
+        return
+    if not foods:
+        db = SessionLocal()
+        totals = get_diary_day(db, message.from_user.id, date.today())
+        db.close()
+    await message.answer(get_diary_added_text(foods, not_found, totals, targets), parse_mode='Markdown')
+
+async def cmd_today(message: types.Message, state: FSMContext):
+    """Съедено за сегодня против КБЖУ: /today"""
+    logging.info(f"cmd_today: user={message.from_user.id}")
+    db = SessionLocal()
+    try:
+        user, targets = get_user_targets(db, message.from_user.id)
+        if not user:
+            await message.answer("❌ Сначала пройдите анкету! Используйте /start")
+            return
+        totals = get_diary_day(db, message.from_user.id, date.today())
+        items = get_diary_items(db, message.from_user.id, date.today()) if totals else []
+    finally:
+        db.close()
+    if not totals:
+        await message.answer(get_diary_text(None, targets) + "\n\nЗаписать еду: /eat гречка 150г", parse_mode='Markdown')
+        return
+    await message.answer(get_diary_text(totals, targets, items), parse_mode='Markdown')
+
+def register_diary_handlers(dp: Dispatcher):
+    """Регистрация обработчиков дневника питания"""
+    dp.register_message_handler(cmd_eat, commands=['eat'])
+    dp.register_message_handler(cmd_today, commands=['today'])
@@ -0,0 +1,61 @@
+from aiogram import Dispatcher, types
+from aiogram.dispatcher import FSMContext
+from datetime import date
+import logging
+
+from models.database import SessionLocal
+from crud.user_crud import get_user
+from crud.food_crud import get_food_preferences
+from utils.export import export_records_csv
+from utils.jobs import JobQueueFullError
+from utils.throttling import throttle_cost, EXPENSIVE_COST
+
+# Лимит подписи к документу в Telegram
+CAPTION_LIMIT = 1024
+
+def get_export_caption(prefs) -> str:
+    """Подпись к выгрузке: пищевые предпочтения, чтобы не отправлять второй файл"""
+    text = "📎 История ваших замеров"
+    if prefs and prefs.likes_raw:
+        text += f"\n\n✅ Любимые продукты:\n{prefs.likes_raw}"
+    if prefs and prefs.dislikes_raw:
+        text += f"\n\n❌ Нелюбимые продукты:\n{prefs.dislikes_raw}"
+    if len(text) > CAPTION_LIMIT:
+        text = text[:CAPTION_LIMIT - 1] + "…"
+    return text
+
+@throttle_cost(EXPENSIVE_COST)
+async def cmd_export(message: types.Message, state: FSMContext):
+    """Выгрузить историю замеров в CSV"""
+    logging.info(f"cmd_export: user={message.from_user.id}")
+    db = SessionLocal()
+    user = get_user(db, message.from_user.id)
+    prefs = get_food_preferences(db, message.from_user.id) if user else None
+    db.close()
+
+    if not user:
+        await message.answer("❌ Сначала пройдите анкету! Используйте /start")
+        return
+
+    try:
+        buffer = await export_records_csv(message.from_user.id)
+    except JobQueueFullError:
+        logging.warning(f"cmd_export: user={message.from_user.id}, export queue is full")
+        await message.answer("⏳ Сейчас много выгрузок, попробуйте через минуту.")
+        return
+    except Exception as e:
+        logging.error(f"cmd_export error: {e}")
+        await message.answer("❌ Не удалось подготовить выгрузку. Попробуйте позже.")
+        return
+
+    try:
+        await message.answer_document(
+            types.InputFile(buffer, filename=f"kbju_export_{date.today().isoformat()}.csv"),
+            caption=get_export_caption(prefs)
+        )
+    finally:
+        buffer.close()
+
+def register_export_handlers(dp: Dispatcher):
+    """Регистрация обработчиков выгрузки"""
+    dp.register_message_handler(cmd_export, commands=['export'])
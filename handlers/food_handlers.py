@@ -4,10 +4,11 @@ import logging
 
 from states.fsm_states import FoodStates
 from utils.texts import get_food_preferences_text
-from utils.buttons import get_main_menu_inline_keyboard, get_confirm_keyboard
+from utils.buttons import get_main_menu_inline_keyboard, get_confirm_keyboard, get_edit_preferences_keyboard
 from crud.user_crud import get_user, user_exists
 from models.database import SessionLocal
 from crud.food_crud import create_or_update_food_preferences, get_food_preferences
+from utils.group_commit import write
 
 logging.basicConfig(filename='bot.log', level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
 
@@ -34,13 +35,7 @@ async def start_food_preferences(message: types.Message, state: FSMContext):
             text += f"❌ **Нелюбимые продукты:**\n{prefs.dislikes_raw}\n\n"
         text += "Хотите отредактировать предпочтения?"
         
-        keyboard = types.InlineKeyboardMarkup(row_width=2)
-        keyboard.add(
-            types.InlineKeyboardButton("✏️ Редактировать", callback_data="edit_preferences"),
-            types.InlineKeyboardButton("❌ Отмена", callback_data="cancel_preferences")
-        )
-        
-        await message.answer(text, parse_mode='Markdown', reply_markup=keyboard)
+        await message.answer(text, parse_mode='Markdown', reply_markup=get_edit_preferences_keyboard())
     else:
         # Начинаем создание новых предпочтений
         await message.answer("🍎 **Настройка пищевых предпочтений**\n\nДавайте начнем с ваших любимых продуктов:\n\n✅ **Что вы любите есть?**\n\nРасскажите о продуктах, которые вам нравятся (например: курица, овощи, фрукты, рыба, творог)")
@@ -77,9 +72,7 @@ async def process_dislikes(message: types.Message, state: FSMContext):
         return
     
     # Сохраняем предпочтения
-    db = SessionLocal()
-    create_or_update_food_preferences(db, message.from_user.id, likes_raw=likes, dislikes_raw=dislikes)
-    db.close()
+    await write(create_or_update_food_preferences, message.from_user.id, likes_raw=likes, dislikes_raw=dislikes)
     
     await message.answer("✅ Ваши пищевые предпочтения сохранены!")
     await message.answer("🏠 Главное меню", reply_markup=get_main_menu_inline_keyboard())
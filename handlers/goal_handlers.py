@@ -3,84 +3,129 @@ from aiogram.dispatcher import FSMContext
 import logging
 
 from states.fsm_states import GoalStates
-from utils.texts import get_goal_request, get_kbju_explanation
+from utils.texts import get_goal_request, get_kbju_explanation, get_goal_comparison_text, GOAL_NAMES, GOAL_ECHO_NAMES
 from utils.buttons import get_goal_keyboard, get_main_menu_inline_keyboard
 from crud.user_crud import get_user, user_exists, update_user
 from models.database import SessionLocal
-from utils.calculations import calculate_bodyfat, calculate_kbju
-from crud.record_crud import get_latest_record
+from utils.calculations import get_goal_comparison, calculate_record_targets, get_record_targets
+from crud.record_crud import (
+    get_latest_record, get_latest_bodyfat, read_record_targets, update_record_targets, create_or_update_record
+)
+from models.tables import UserRecord
+from utils.validators import validate_weight
+from utils.group_commit import write, write_later
 
 logging.basicConfig(filename='bot.log', level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
 
+def get_user_goal_comparison(telegram_id: int):
+    """Пользователь, его последняя запись и КБЖУ всех целей по ней (None, если считать не из чего)"""
+    db = SessionLocal()
+    try:
+        user = get_user(db, telegram_id)
+        latest_record = get_latest_record(db, telegram_id) if user else None
+        if not latest_record:
+            return user, None, None
+        targets, stale = read_record_targets(user.sex, latest_record)
+        if stale:
+            write_later(update_record_targets, latest_record.id, stale)
+        # У замера одного веса процента жира нет - берем последний посчитанный
+        bodyfat = targets['bodyfat'] or get_latest_bodyfat(db, telegram_id)
+    finally:
+        db.close()
+    if not bodyfat:
+        return user, latest_record, None
+    return user, latest_record, get_goal_comparison(telegram_id, latest_record, bodyfat)
+
 async def start_goal_change(message: types.Message, state: FSMContext):
-    """Начать изменение цели"""
+    """Начать изменение цели: сразу показываем КБЖУ для всех целей"""
     logging.info(f"start_goal_change: user={message.from_user.id}")
-    db = SessionLocal()
-    user = get_user(db, message.from_user.id)
+    user, latest_record, goals_kbju = get_user_goal_comparison(message.from_user.id)
     if not user:
         await message.answer("❌ Сначала пройдите анкету! Используйте /start")
         return
     
-    await message.answer("🎯 Выберите новую цель:", reply_markup=get_goal_keyboard())
+    if goals_kbju:
+        await message.answer(
+            get_goal_comparison_text(goals_kbju, latest_record.goal),
+            parse_mode='Markdown',
+            reply_markup=get_goal_keyboard()
+        )
+    else:
+        await message.answer("🎯 Выберите новую цель:", reply_markup=get_goal_keyboard())
     await GoalStates.goal.set()
-    db.close()
 
 async def process_goal_change_callback(callback: types.CallbackQuery, state: FSMContext):
     """Обработать изменение цели"""
     await callback.answer()
     
     goal = callback.data.split('_')[1]  # goal_healthy -> healthy
-    goal_names = {
-        'healthy': 'Здоровое тело',
-        'athletic': 'Спортивное тело',
-        'lean': 'Сухое тело'
-    }
-    
-    goal_text = goal_names.get(goal, goal)
+    goal_text = GOAL_ECHO_NAMES.get(goal, goal)
     
     # Обновляем сообщение с выбором
     await callback.message.edit_text(
         f"{callback.message.text}\n\n✅ Выбрано: {goal_text}"
     )
     
-    db = SessionLocal()
-    user = get_user(db, callback.from_user.id)
-    latest_record = get_latest_record(db, callback.from_user.id)
-    db.close()
+    # КБЖУ целей уже посчитаны для сравнения - берем из кэша
+    user, latest_record, goals_kbju = get_user_goal_comparison(callback.from_user.id)
     
-    if latest_record:
-        user_data = {
-            'sex': user.sex,
-            'height': latest_record.height,
-            'weight': latest_record.weight,
-            'waist': latest_record.waist,
-            'neck': latest_record.neck,
-            'hip': latest_record.hip,
-            'steps': latest_record.steps,
-            'sport_type': latest_record.sport_type,
-            'sport_freq': latest_record.sport_freq,
-            'goal': goal
-        }
-        from utils.calculations import calculate_step_multiplier
-        step_multiplier = calculate_step_multiplier(user_data['steps'])
-        user_data['step_multiplier'] = step_multiplier
-        bodyfat = calculate_bodyfat(user_data)
-        kbju = calculate_kbju(user_data, bodyfat)
-        await callback.message.answer(
-            f"✅ Цель изменена на: {goal_text}"
-        )
+    if not latest_record:
+        # Цель хранится в записи замеров: без замеров менять нечего
+        await callback.message.answer("📝 Сначала сделайте замеры - цель сохраняется вместе с ними")
+    elif goals_kbju and goals_kbju.get(goal) is None:
         await callback.message.answer(
-            get_kbju_explanation(goal, kbju),
-            parse_mode='Markdown'
+            f"⛔ При текущем проценте жира сушка не рекомендуется, цель осталась прежней: "
+            f"{GOAL_NAMES.get(latest_record.goal, latest_record.goal)}"
         )
     else:
-        await callback.message.answer(
-            f"✅ Цель изменена на: {goal_text}\n\n📝 Сделайте замеры для расчета новых КБЖУ"
-        )
+        # Цель и КБЖУ под нее - в последнюю запись: их читают /goal, план питания и дневник
+        if goals_kbju and latest_record.bodyfat is None:
+            # Замер одного веса: КБЖУ цели - из сравнения (по последнему проценту жира)
+            targets = get_record_targets(None, goals_kbju.get(goal))
+        else:
+            record_data = {column.name: getattr(latest_record, column.name) for column in UserRecord.__table__.columns}
+            targets = calculate_record_targets(user.sex, dict(record_data, goal=goal))
+        saved = await write(create_or_update_record, callback.from_user.id, latest_record.date, goal=goal, **targets)
+        if not saved:
+            await callback.message.answer("❌ Не удалось сохранить цель, попробуйте еще раз")
+        elif goals_kbju:
+            await callback.message.answer(
+                f"✅ Цель изменена на: {goal_text}\n\n" + get_kbju_explanation(goal, goals_kbju.get(goal)),
+                parse_mode='Markdown'
+            )
+        else:
+            await callback.message.answer(f"✅ Цель изменена на: {goal_text}")
     await callback.message.answer("🏠 Главное меню", reply_markup=get_main_menu_inline_keyboard())
     await state.finish()
 
+async def cmd_target(message: types.Message, state: FSMContext):
+    """Целевой вес для прогноза: /target 75"""
+    logging.info(f"cmd_target: user={message.from_user.id}, args={message.get_args()}")
+    args = message.get_args().replace(',', '.')
+    if not args:
+        db = SessionLocal()
+        user = get_user(db, message.from_user.id)
+        db.close()
+        if user and user.target_weight:
+            await message.answer(f"🎯 Целевой вес: {user.target_weight:.1f} кг\n\nИзменить: /target вес")
+        else:
+            await message.answer("🎯 Укажите целевой вес: /target 75")
+        return
+    if not validate_weight(args):
+        await message.answer("❌ Вес должен быть числом от 30 до 300 кг")
+        return
+    user = await write(update_user, message.from_user.id, target_weight=float(args))
+    if not user:
+        await message.answer("❌ Сначала пройдите анкету! Используйте /start")
+        return
+    await message.answer(
+        f"✅ Целевой вес: {float(args):.1f} кг\n\nПрогноз появится в разделе «📈 Прогресс»",
+        reply_markup=get_main_menu_inline_keyboard()
+    )
+
 def register_goal_handlers(dp: Dispatcher):
     """Регистрация обработчиков целей"""
     dp.register_message_handler(start_goal_change, text="🎯 Цели")
+    dp.register_message_handler(start_goal_change, commands=['goal'])
+    dp.register_message_handler(cmd_target, commands=['target'])
     dp.register_callback_query_handler(process_goal_change_callback, text_startswith='goal_', state=GoalStates.goal) 
\ No newline at end of file
@@ -0,0 +1,67 @@
+from aiogram import Dispatcher, types
+from aiogram.dispatcher import FSMContext
+from io import BytesIO
+import logging
+
+from models.database import SessionLocal
+from crud.user_crud import get_user
+from states.fsm_states import ImportStates
+from utils.texts import get_import_help, get_import_report_text
+from utils.buttons import get_main_menu_inline_keyboard
+from utils.history_import import import_history, IMPORT_MAX_FILE_SIZE
+from utils.jobs import JobQueueFullError
+from utils.throttling import throttle_cost, EXPENSIVE_COST
+
+async def cmd_import(message: types.Message, state: FSMContext):
+    """Начать импорт истории замеров из CSV"""
+    logging.info(f"cmd_import: user={message.from_user.id}")
+    db = SessionLocal()
+    user = get_user(db, message.from_user.id)
+    db.close()
+    if not user:
+        await message.answer("❌ Сначала пройдите анкету! Используйте /start")
+        return
+
+    await message.answer(get_import_help())
+    await ImportStates.file.set()
+
+@throttle_cost(EXPENSIVE_COST)
+async def process_import_file(message: types.Message, state: FSMContext):
+    """Принять CSV-файл и записать историю"""
+    document = message.document
+    logging.info(f"process_import_file: user={message.from_user.id}, file={document.file_name}, size={document.file_size}")
+
+    if not (document.file_name or '').lower().endswith('.csv'):
+        await message.answer("❌ Нужен файл в формате .csv")
+        return
+    if document.file_size and document.file_size > IMPORT_MAX_FILE_SIZE:
+        await message.answer("❌ Файл слишком большой, максимум 2 МБ")
+        return
+
+    await state.finish()
+    buffer = await document.download(destination_file=BytesIO())
+    buffer.seek(0)
+
+    try:
+        report = await import_history(message.from_user.id, buffer)
+    except JobQueueFullError:
+        await message.answer("⏳ Сейчас много задач, попробуйте через минуту.")
+        return
+    except Exception as e:
+        logging.error(f"process_import_file error: {e}")
+        await message.answer("❌ Не удалось прочитать файл. Проверьте, что это CSV в кодировке UTF-8.")
+        return
+
+    await message.answer(get_import_report_text(report), parse_mode='Markdown', reply_markup=get_main_menu_inline_keyboard())
+
+async def cancel_import(message: types.Message, state: FSMContext):
+    """Любое сообщение вместо файла отменяет импорт"""
+    logging.info(f"cancel_import: user={message.from_user.id}")
+    await state.finish()
+    await message.answer("❌ Импорт отменен", reply_markup=get_main_menu_inline_keyboard())
+
+def register_import_handlers(dp: Dispatcher):
+    """Регистрация обработчиков импорта"""
+    dp.register_message_handler(cmd_import, commands=['import'])
+    dp.register_message_handler(process_import_file, content_types=types.ContentType.DOCUMENT, state=ImportStates.file)
+    dp.register_message_handler(cancel_import, state=ImportStates.file)
@@ -0,0 +1,75 @@
+from aiogram import Dispatcher, types
+from aiogram.dispatcher import FSMContext
+import logging
+
+from utils.texts import get_meal_plan_text
+from utils.buttons import get_meal_plan_keyboard
+from utils.meal_plan import get_meal_plan
+from crud.user_crud import get_user
+from crud.record_crud import get_latest_record, read_record_targets, update_record_targets
+from crud.food_crud import get_food_preferences
+from models.database import SessionLocal
+from utils.group_commit import write_later
+
+def get_user_meal_plan(telegram_id: int, variant: int = 0):
+    """Меню под КБЖУ последней записи и предпочтения пользователя; иначе текст, чего не хватает"""
+    db = SessionLocal()
+    try:
+        user = get_user(db, telegram_id)
+        if not user:
+            return None, "❌ Сначала пройдите анкету! Используйте /start"
+        latest_record = get_latest_record(db, telegram_id)
+        targets, stale = read_record_targets(user.sex, latest_record) if latest_record else (None, None)
+        if stale:
+            write_later(update_record_targets, latest_record.id, stale)
+        if not targets or not targets['calories']:
+            return None, "📝 Сделайте замеры, чтобы рассчитать КБЖУ для меню"
+        preferences = get_food_preferences(db, telegram_id)
+        likes_raw = preferences.likes_raw if preferences else None
+        dislikes_raw = preferences.dislikes_raw if preferences else None
+    finally:
+        db.close()
+
+    plan = get_meal_plan(telegram_id, targets, likes_raw, dislikes_raw, variant)
+    if not plan:
+        return None, "❌ С такими предпочтениями не из чего составить меню. Проверьте «🍎 Предпочтения»"
+    return plan, None
+
+async def send_meal_plan(user_id: int, variant: int = 0):
+    """Отправить меню на день (из главного меню и по /plan)"""
+    from main import bot
+    plan, error = get_user_meal_plan(user_id, variant)
+    if error:
+        await bot.send_message(user_id, error)
+        return
+    await bot.send_message(
+        user_id,
+        get_meal_plan_text(plan),
+        parse_mode='Markdown',
+        reply_markup=get_meal_plan_keyboard(variant)
+    )
+
+async def cmd_plan(message: types.Message, state: FSMContext):
+    """Меню на день: /plan"""
+    logging.info(f"cmd_plan: user={message.from_user.id}")
+    await send_meal_plan(message.from_user.id)
+
+async def meal_plan_next_callback(callback: types.CallbackQuery, state: FSMContext):
+    """Другой вариант меню: заменяем предыдущее сообщение"""
+    await callback.answer()
+    variant = int(callback.data.split('_')[2])  # plan_next_2 -> 2
+    logging.info(f"meal_plan_next_callback: user={callback.from_user.id}, variant={variant}")
+    plan, error = get_user_meal_plan(callback.from_user.id, variant)
+    if error:
+        await callback.message.answer(error)
+        return
+    await callback.message.edit_text(
+        get_meal_plan_text(plan),
+        parse_mode='Markdown',
+        reply_markup=get_meal_plan_keyboard(variant)
+    )
+
+def register_meal_plan_handlers(dp: Dispatcher):
+    """Регистрация обработчиков меню на день"""
+    dp.register_message_handler(cmd_plan, commands=['plan'])
+    dp.register_callback_query_handler(meal_plan_next_callback, text_startswith='plan_next_')
@@ -6,15 +6,18 @@ import logging
 
 from models.database import SessionLocal
 from crud.user_crud import get_user
-from crud.record_crud import create_or_update_record, get_latest_record
+from crud.record_crud import create_or_update_record, get_latest_record, get_latest_bodyfat
 from states.fsm_states import MeasurementsStates
 from utils.texts import (
     get_weight_request, get_waist_request, get_neck_request, get_hip_request,
-    get_validation_error, get_final_results_text, get_kbju_explanation
+    get_validation_error, get_final_results_text, get_kbju_explanation,
+    get_quick_measurements_help
 )
 from utils.buttons import get_main_menu_inline_keyboard
-from utils.validators import validate_weight, validate_measurement
-from utils.calculations import calculate_bodyfat, calculate_kbju, calculate_step_multiplier
+from utils.validators import validate_weight, validate_measurement, parse_quick_measurements
+from utils.calculations import calculate_step_multiplier, calculate_record_targets
+from utils.group_commit import write
+from utils.reply import ReplyBuilder
 
 async def start_new_measurements(message: types.Message, state: FSMContext):
     """Начать новые измерения"""
@@ -185,45 +188,35 @@ async def finish_measurements(message: types.Message, state: FSMContext):
     from utils.calculations import calculate_step_multiplier
     step_multiplier = calculate_step_multiplier(measurements_data.get('steps', '8000-10000'))
     
-    # Создаем новую запись со всеми данными
-    create_or_update_record(
-        db,
-        message.from_user.id,
-        date.today(),
-        weight=measurements_data['weight'],
-        waist=measurements_data['waist'],
-        neck=measurements_data['neck'],
-        hip=measurements_data.get('hip'),
-        steps=measurements_data.get('steps', '8000-10000'),
-        sport_type=measurements_data.get('sport_type', 'none'),
-        sport_freq=measurements_data.get('sport_freq', '0'),
-        step_multiplier=step_multiplier,
-        height=latest_record.height if latest_record else 170,
-        goal=latest_record.goal if latest_record else 'maintain'
-    )
-    
     # Получаем пользователя для расчета процента жира
     user = get_user(db, message.from_user.id)
     db.close()
+
+    # Создаем новую запись со всеми данными и расчетными колонками
+    record_data = {
+        'weight': measurements_data['weight'],
+        'waist': measurements_data['waist'],
+        'neck': measurements_data['neck'],
+        'hip': measurements_data.get('hip'),
+        'steps': measurements_data.get('steps', '8000-10000'),
+        'sport_type': measurements_data.get('sport_type', 'none'),
+        'sport_freq': measurements_data.get('sport_freq', '0'),
+        'step_multiplier': step_multiplier,
+        'height': latest_record.height if latest_record else 170,
+        'goal': latest_record.goal if latest_record else 'maintain'
+    }
+    targets = calculate_record_targets(user.sex, record_data) if user else {}
+    await write(create_or_update_record, message.from_user.id, date.today(), **record_data, **targets)
     
     # Проверяем, что пользователь существует
     if not user:
-        await message.answer("❌ Ошибка: пользователь не найден. Сначала пройдите регистрацию!")
-        await message.answer("🏠 Главное меню", reply_markup=get_main_menu_inline_keyboard())
+        reply = ReplyBuilder().text("❌ Ошибка: пользователь не найден. Сначала пройдите регистрацию!")
+        reply.text("🏠 Главное меню").keyboard(get_main_menu_inline_keyboard())
+        await reply.send(message.bot, message.chat.id)
         await state.finish()
         return
     
-    # Рассчитываем процент жира
-    user_data = {
-        'sex': user.sex,
-        'height': latest_record.height if latest_record else 170,
-        'weight': measurements_data['weight'],
-        'waist': measurements_data['waist'],
-        'neck': measurements_data['neck'],
-        'hip': measurements_data.get('hip')
-    }
-    
-    bodyfat = calculate_bodyfat(user_data)
+    bodyfat = targets['bodyfat']
     
     # Показываем результаты
     text = f"""✅ **Новые замеры сохранены!**
@@ -245,14 +238,90 @@ async def finish_measurements(message: types.Message, state: FSMContext):
 
 🔥 **Процент жира:** {bodyfat:.1f}%"""
     
-    await message.answer(text, parse_mode='Markdown')
-    await message.answer("🏠 Главное меню", reply_markup=get_main_menu_inline_keyboard())
+    # Результаты и меню - одним сообщением
+    reply = ReplyBuilder().text(text, 'Markdown')
+    reply.text("🏠 Главное меню", 'Markdown').keyboard(get_main_menu_inline_keyboard())
+    await reply.send(message.bot, message.chat.id)
     
     await state.finish()
 
+async def cmd_quick_measurements(message: types.Message, state: FSMContext):
+    """
+    Замеры одним сообщением: /m вес [талия шея [бёдра]].
+    Активность, рост и цель берутся из последней записи. Сохраняется только присланное:
+    при замере одного веса обхваты и процент жира в записи пустые
+    """
+    logging.info(f"cmd_quick_measurements: user={message.from_user.id}, args={message.get_args()}")
+    db = SessionLocal()
+    user = get_user(db, message.from_user.id)
+    latest_record = get_latest_record(db, message.from_user.id) if user else None
+    if not user:
+        db.close()
+        await message.answer("❌ Сначала пройдите анкету! Используйте /start")
+        return
+    if not latest_record:
+        db.close()
+        await message.answer("📝 Сначала сделайте полные замеры через меню «📝 Новые замеры»")
+        return
+    if not message.get_args():
+        db.close()
+        await message.answer(get_quick_measurements_help())
+        return
+
+    ok, result = parse_quick_measurements(message.get_args(), user.sex)
+    if not ok:
+        db.close()
+        logging.warning(f"cmd_quick_measurements: user={message.from_user.id}, invalid input={message.get_args()}")
+        await message.answer(get_validation_error(result))
+        return
+
+    measurements_data = {
+        'weight': result['weight'],
+        'waist': result.get('waist'),
+        'neck': result.get('neck'),
+        'hip': result.get('hip'),
+    }
+    record_data = {
+        **measurements_data,
+        'height': latest_record.height,
+        'goal': latest_record.goal,
+        'steps': latest_record.steps,
+        'sport_type': latest_record.sport_type,
+        'sport_freq': latest_record.sport_freq,
+        'step_multiplier': latest_record.step_multiplier,
+    }
+    targets = calculate_record_targets(user.sex, record_data)
+    bodyfat = targets['bodyfat']
+    estimated = bodyfat is None
+    if estimated:
+        # Без обхватов КБЖУ считаются по последнему проценту жира, но сам он
+        # в новую запись не пишется - иначе лишние точки на графике и в аналитике
+        bodyfat = latest_record.bodyfat or get_latest_bodyfat(db, message.from_user.id)
+        targets = dict(calculate_record_targets(user.sex, dict(record_data, bodyfat=bodyfat)), bodyfat=None)
+    record_data.update(targets)
+    db.close()
+
+    record = await write(create_or_update_record, message.from_user.id, date.today(), **record_data)
+
+    if not record:
+        await message.answer("❌ Не удалось сохранить замеры. Попробуйте позже.")
+        return
+
+    text = f"✅ **Замеры сохранены!**\n\n• Вес: {measurements_data['weight']} кг"
+    if 'waist' in result:
+        text += f"\n• Талия: {measurements_data['waist']} см\n• Шея: {measurements_data['neck']} см"
+        if result.get('hip'):
+            text += f"\n• Бёдра: {measurements_data['hip']} см"
+    if bodyfat and not estimated:
+        text += f"\n\n🔥 **Процент жира:** {bodyfat:.1f}%"
+    elif bodyfat:
+        text += f"\n\n🔥 **Процент жира** (по последним обхватам): {bodyfat:.1f}%"
+    await message.answer(text, parse_mode='Markdown', reply_markup=get_main_menu_inline_keyboard())
+
 def register_measurements_handlers(dp: Dispatcher):
     """Регистрация обработчиков измерений"""
     dp.register_message_handler(start_new_measurements, text="📝 Новые замеры")
+    dp.register_message_handler(cmd_quick_measurements, commands=['m'])
     dp.register_message_handler(process_waist_measurement, state=MeasurementsStates.waist)
     dp.register_message_handler(process_neck_measurement, state=MeasurementsStates.neck)
     dp.register_message_handler(process_hip_measurement, state=MeasurementsStates.hip)
@@ -2,14 +2,20 @@ from aiogram import Dispatcher, types
 from aiogram.dispatcher import FSMContext
 import logging
 
-from utils.texts import get_main_menu_text
-from utils.buttons import get_main_menu_inline_keyboard
+from utils.texts import get_main_menu_text, get_my_data_text
+from utils.buttons import get_main_menu_inline_keyboard, get_progress_metrics_keyboard, get_consultation_keyboard
 from crud.user_crud import get_user
-from utils.calculations import calculate_bodyfat, calculate_kbju
-from utils.progress import create_progress_graph
+from utils.progress import (
+    PROGRESS_METRICS, create_multi_progress_graph,
+    get_graph_cache_key, get_cached_graph, remember_graph
+)
+from utils.throttling import throttle_cost, DEFAULT_COST, EXPENSIVE_COST
+from utils.reply import ReplyBuilder
+from utils.group_commit import write_later
 from models.database import SessionLocal
 from handlers.food_handlers import start_food_preferences
 from handlers.measurements_handlers import start_new_measurements
+from handlers.meal_plan_handlers import send_meal_plan
 
 async def start_new_measurements_wrapper(user_id: int, state: FSMContext):
     """Обертка для start_new_measurements"""
@@ -79,70 +85,19 @@ async def show_my_data(message: types.Message, state: FSMContext):
         
         # Получаем последнюю запись для расчета процента жира и отображения динамики
         db = SessionLocal()
-        from crud.record_crud import get_latest_record
+        from crud.record_crud import get_latest_record, get_latest_bodyfat, read_record_targets, update_record_targets
         latest_record = get_latest_record(db, user_id)
-        db.close()
-        
+        # Процент жира хранится в записи, пересчет только для записей старой версии формул
+        bodyfat = 0
         if latest_record:
-            user_data = {
-                'sex': user.sex,
-                'height': latest_record.height,
-                'weight': latest_record.weight,
-                'waist': latest_record.waist,
-                'neck': latest_record.neck,
-                'hip': latest_record.hip,
-                'steps': latest_record.steps,
-                'sport_type': latest_record.sport_type,
-                'sport_freq': latest_record.sport_freq,
-                'goal': latest_record.goal
-            }
-            bodyfat = calculate_bodyfat(user_data)
-        else:
-            bodyfat = 0
-        
-        # Форматируем данные активности
-        sport_names = {
-            'none': '❌ Не занимаюсь',
-            'walking': '🚶 Ходьба/Прогулки',
-            'running': '🏃 Бег/Кардио',
-            'strength': '🏋️ Тренажерный зал',
-            'yoga': '🧘 Йога/Пилатес',
-            'swimming': '🏊 Плавание',
-            'cycling': '🚴 Велосипед',
-            'team': '⚽ Футбол/Баскетбол'
-        }
-        
-        goal_names = {
-            'healthy': '🧘 Здоровое тело',
-            'athletic': '🏋 Спортивное тело',
-            'lean': '🔥 Сухое тело'
-        }
-        
-        text = f"""📊 **Ваши данные**
-
-👤 **Основная информация:**
-• Имя: {user.first_name}
-• Дата рождения: {user.date_of_birth}
-• Пол: {'Мужской' if user.sex == 'male' else 'Женский'}
-• Рост: {latest_record.height if latest_record else 'Не указано'} см
-
-🏃‍♂️ **Активность:**
-• Шаги в день: {latest_record.steps if latest_record else 'Не указано'}
-• Спорт: {sport_names.get(latest_record.sport_type, 'Не указано') if latest_record else 'Не указано'}
-• Частота: {latest_record.sport_freq if latest_record else 'Не указано'} раз в неделю
-
-📐 **Последние замеры:**
-• Вес: {latest_record.weight if latest_record else 'Не указано'} кг
-• Талия: {latest_record.waist if latest_record else 'Не указано'} см
-• Шея: {latest_record.neck if latest_record else 'Не указано'} см"""
-
-        if latest_record and latest_record.hip:
-            text += f"\n• Бёдра: {latest_record.hip} см"
+            targets, stale = read_record_targets(user.sex, latest_record)
+            if stale:
+                write_later(update_record_targets, latest_record.id, stale)
+            # У замера одного веса процента жира нет - берем последний посчитанный
+            bodyfat = targets['bodyfat'] or get_latest_bodyfat(db, user_id) or 0
+        db.close()
         
-        text += f"""
-
-🎯 **Цель:** {goal_names.get(latest_record.goal, 'Не указана') if latest_record else 'Не указана'}
-🔥 **Процент жира:** {bodyfat:.1f}%"""
+        text = get_my_data_text(user, latest_record, bodyfat)
         
         # Определяем, как отправить сообщение
         if hasattr(message, 'answer'):
@@ -159,6 +114,32 @@ async def show_my_data(message: types.Message, state: FSMContext):
             from main import bot
             await bot.send_message(user_id, "❌ Произошла ошибка при получении данных. Попробуйте позже.")
 
+async def send_progress_graph(user_id: int, metrics: str, rows, intro: str = None):
+    """
+    Отправить график выбранных метрик: из кэша file_id или одним рендером и одной загрузкой.
+    intro - Markdown-текст перед графиком: уходит в подпись, если в нее помещается
+    """
+    from main import bot
+    reply = ReplyBuilder()
+    if intro:
+        reply.text(intro, 'Markdown')
+    cache_key = get_graph_cache_key(user_id, metrics, rows)
+    file_id = get_cached_graph(cache_key)
+    if file_id:
+        logging.info(f"send_progress_graph: user={user_id}, metrics={metrics}, cached")
+        reply.photo(file_id, "📈 Ваш график прогресса", 'Markdown').keyboard(get_progress_metrics_keyboard())
+        await reply.send(bot, user_id)
+        return
+
+    buffer = create_multi_progress_graph(rows, PROGRESS_METRICS[metrics])
+    if buffer is None:
+        await reply.text("📈 Для этих метрик пока недостаточно замеров", 'Markdown').send(bot, user_id)
+        return
+
+    reply.photo(types.InputFile(buffer, filename='progress.png'), "📈 Ваш график прогресса", 'Markdown')
+    sent = await reply.keyboard(get_progress_metrics_keyboard()).send(bot, user_id)
+    remember_graph(cache_key, sent[-1].photo[-1].file_id)
+
 async def show_progress(user_id: int, state: FSMContext):
     """Показать прогресс"""
     try:
@@ -171,62 +152,73 @@ async def show_progress(user_id: int, state: FSMContext):
             await bot.send_message(user_id, "❌ Сначала пройдите анкету! Используйте /start")
             return
         
+        # Одна проекция на все метрики: и для текста, и для графика
         db = SessionLocal()
-        from crud.record_crud import get_user_records
-        records = get_user_records(db, user_id)
+        from crud.record_crud import get_progress_series
+        rows = get_progress_series(db, user_id, PROGRESS_METRICS['all'])
         db.close()
         
-        if len(records) < 2:
+        if len(rows) < 2:
             from main import bot
             await bot.send_message(user_id, "📈 Для отображения прогресса нужно минимум 2 записи. Сделайте новые замеры!")
             return
         
-        # Сортируем записи по дате (старые -> новые для правильного анализа)
-        records.sort(key=lambda x: x.date)
-        
         # Получаем мотивационное сообщение
-        from utils.progress import get_motivational_message
-        motivational_text = get_motivational_message(records)
-        
-        # Отправляем мотивационное сообщение
-        from main import bot
-        await bot.send_message(user_id, motivational_text, parse_mode='Markdown')
+        from utils.progress import get_motivational_message, get_trend_message
+        motivational_text = get_motivational_message(rows)
         
-        # Создаем график прогресса
-        from utils.progress import create_progress_graph
-        graph_path = create_progress_graph(records)
+        # Тренд уже посчитан при записи замеров: одна строка по ключу
+        db = SessionLocal()
+        from crud.trend_crud import get_weight_trend
+        from utils.trend import forecast_trend
+        trend = get_weight_trend(db, user_id)
+        forecast = forecast_trend(trend, user.target_weight) if trend else None
+        db.close()
+        if forecast:
+            motivational_text += "\n\n" + get_trend_message(forecast)
         
-        if graph_path:
-            with open(graph_path, 'rb') as photo:
-                await bot.send_photo(
-                    chat_id=user_id,
-                    photo=photo,
-                    caption="📈 Ваш график прогресса"
-                )
-        else:
-            await bot.send_message(user_id, "❌ Ошибка при создании графика прогресса")
+        # Мотивационное сообщение и все панели одной фигурой - в подписи к графику
+        await send_progress_graph(user_id, 'all', rows, intro=motivational_text)
     except Exception as e:
         logging.error(f"show_progress error: {e}")
         from main import bot
         await bot.send_message(user_id, "❌ Произошла ошибка при получении прогресса. Попробуйте позже.")
 
+@throttle_cost(EXPENSIVE_COST)
+async def progress_metrics_callback(callback: types.CallbackQuery, state: FSMContext):
+    """Перерисовать график для выбранного набора метрик"""
+    await callback.answer()
+    metrics = callback.data.split('_', 1)[1]  # progress_girths -> girths
+    user_id = callback.from_user.id
+    logging.info(f"progress_metrics_callback: user={user_id}, metrics={metrics}")
+    if metrics not in PROGRESS_METRICS:
+        return
+    
+    try:
+        db = SessionLocal()
+        from crud.record_crud import get_progress_series
+        rows = get_progress_series(db, user_id, PROGRESS_METRICS[metrics])
+        db.close()
+        await send_progress_graph(user_id, metrics, rows)
+    except Exception as e:
+        logging.error(f"progress_metrics_callback error: {e}")
+        await callback.message.answer("❌ Ошибка при создании графика прогресса")
+
 async def show_consultation(user_id: int, state: FSMContext):
     """Показать кнопку для консультации"""
-    keyboard = types.InlineKeyboardMarkup(row_width=1)
-    keyboard.add(
-        types.InlineKeyboardButton("💬 Написать специалисту", url="https://t.me/dryuzefovna")
-    )
-    
     from main import bot
     await bot.send_message(
         user_id,
         "💬 **Получить персональную консультацию**\n\n"
         "Нажмите кнопку ниже, чтобы связаться с профессиональным диетологом Екатериной Юзефовной.",
-        reply_markup=keyboard,
+        reply_markup=get_consultation_keyboard(),
         parse_mode='Markdown'
     )
 
 # Callback-обработчики для inline-меню
+MENU_COSTS = {'menu_progress': EXPENSIVE_COST}
+
+@throttle_cost(lambda callback: MENU_COSTS.get(callback.data, DEFAULT_COST))
 async def menu_callback_handler(callback: types.CallbackQuery, state: FSMContext):
     data = callback.data
     user_id = callback.from_user.id
@@ -240,6 +232,8 @@ async def menu_callback_handler(callback: types.CallbackQuery, state: FSMContext
         await start_new_measurements_wrapper(user_id, state)
     elif data == "menu_food_prefs":
         await start_food_preferences_wrapper(user_id, state)
+    elif data == "menu_meal_plan":
+        await send_meal_plan(user_id)
     elif data == "menu_consultation":
         await show_consultation(user_id, state)
     await callback.answer()
@@ -247,4 +241,5 @@ async def menu_callback_handler(callback: types.CallbackQuery, state: FSMContext
 def register_menu_handlers(dp: Dispatcher):
     """Регистрация обработчиков главного меню"""
     dp.register_message_handler(show_main_menu, commands=["menu"])
-    dp.register_callback_query_handler(menu_callback_handler, lambda c: c.data.startswith("menu_")) 
\ No newline at end of file
+    dp.register_callback_query_handler(menu_callback_handler, lambda c: c.data.startswith("menu_"))
+    dp.register_callback_query_handler(progress_metrics_callback, text_startswith="progress_") 
\ No newline at end of file
@@ -0,0 +1,88 @@
+from aiogram import Dispatcher, types
+from aiogram.dispatcher import FSMContext
+import logging
+import re
+import time
+
+from utils.texts import get_reminders_text, get_reminder_schedule_text, REMINDER_NAMES
+from utils.reminders import next_due, MAX_MONTH_DAY
+from utils.group_commit import write
+from crud.user_crud import get_user
+from crud.reminder_crud import upsert_reminder, get_user_reminders, disable_reminders
+from models.database import SessionLocal
+
+KIND_ALIASES = {
+    'вес': 'weight', 'взвешивание': 'weight', 'weight': 'weight',
+    'обхваты': 'girths', 'замеры': 'girths', 'girths': 'girths',
+}
+OFF_WORDS = ('выкл', 'off', 'стоп', 'нет')
+# Дни недели по первым двум-трем буквам: "пн", "понедельник", "mon"
+WEEKDAYS = {
+    'пн': 0, 'пон': 0, 'вт': 1, 'ср': 2, 'чт': 3, 'чет': 3, 'пт': 4, 'пят': 4, 'сб': 5, 'суб': 5, 'вс': 6, 'вос': 6,
+    'mon': 0, 'tue': 1, 'wed': 2, 'thu': 3, 'fri': 4, 'sat': 5, 'sun': 6,
+}
+DAILY_WORDS = ('ежедневно', 'каждый', 'daily')
+# Расписание по умолчанию: вес - раз в неделю в понедельник, обхваты - раз в месяц 1-го числа
+DEFAULT_SCHEDULES = {
+    'weight': {'cadence': 'weekly', 'weekday': 0, 'day': None},
+    'girths': {'cadence': 'monthly', 'weekday': None, 'day': 1},
+}
+DEFAULT_MINUTES = 9 * 60
+TIME_RE = re.compile(r'^(\d{1,2})[:.](\d{2})$')
+
+def parse_reminder_args(kind: str, tokens: list):
+    """Расписание из слов после вида: день недели, число месяца или "ежедневно", и время ЧЧ:ММ"""
+    schedule = dict(DEFAULT_SCHEDULES[kind], minutes=DEFAULT_MINUTES)
+    for token in tokens:
+        match = TIME_RE.match(token)
+        weekday = WEEKDAYS.get(token[:3], WEEKDAYS.get(token[:2]))
+        if match and int(match.group(1)) < 24 and int(match.group(2)) < 60:
+            schedule['minutes'] = int(match.group(1)) * 60 + int(match.group(2))
+        elif weekday is not None:
+            schedule.update(cadence='weekly', weekday=weekday, day=None)
+        elif token in DAILY_WORDS:
+            schedule.update(cadence='daily', weekday=None, day=None)
+        elif token.isdigit() and 1 <= int(token) <= MAX_MONTH_DAY:
+            schedule.update(cadence='monthly', weekday=None, day=int(token))
+        else:
+            return None
+    return schedule
+
+async def cmd_remind(message: types.Message, state: FSMContext):
+    """Напоминания о замерах: /remind, /remind вес пн 08:00, /remind выкл"""
+    logging.info(f"cmd_remind: user={message.from_user.id}, args={message.get_args()}")
+    tokens = (message.get_args() or '').lower().split()
+    db = SessionLocal()
+    user = get_user(db, message.from_user.id)
+    reminders = get_user_reminders(db, message.from_user.id) if user and not tokens else []
+    db.close()
+    if not user:
+        await message.answer("❌ Сначала пройдите анкету! Используйте /start")
+        return
+    if not tokens:
+        await message.answer(get_reminders_text(reminders), parse_mode='Markdown')
+        return
+
+    if tokens[0] in OFF_WORDS:
+        kind = KIND_ALIASES.get(tokens[1]) if len(tokens) > 1 else None
+        count = await write(disable_reminders, message.from_user.id, kind)
+        await message.answer("🔕 Напоминания выключены" if count else "🔕 Включенных напоминаний нет")
+        return
+
+    kind = KIND_ALIASES.get(tokens[0])
+    schedule = parse_reminder_args(kind, tokens[1:]) if kind else None
+    if not schedule:
+        await message.answer(get_reminders_text([]), parse_mode='Markdown')
+        return
+    schedule['next_due'] = next_due(
+        schedule['cadence'], schedule['minutes'], time.time(), schedule['weekday'], schedule['day']
+    )
+    reminder = await write(upsert_reminder, message.from_user.id, kind, **schedule)
+    if not reminder:
+        await message.answer("❌ Не удалось сохранить напоминание, попробуйте еще раз")
+        return
+    await message.answer(f"⏰ {REMINDER_NAMES[kind]}: {get_reminder_schedule_text(reminder)}")
+
+def register_reminder_handlers(dp: Dispatcher):
+    """Регистрация обработчиков напоминаний"""
+    dp.register_message_handler(cmd_remind, commands=['remind'])
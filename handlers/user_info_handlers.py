@@ -6,7 +6,7 @@ import logging
 import asyncio
 
 from models.database import SessionLocal
-from crud.user_crud import create_user, update_user, get_user
+from crud.user_crud import create_user, get_user
 from states.fsm_states import UserInfoStates
 from utils.texts import (
     get_name_request, get_birthday_request, get_sex_request, 
@@ -14,7 +14,8 @@ from utils.texts import (
     get_sport_request, get_frequency_request, get_goal_request,
     get_waist_request, get_neck_request, get_hip_request,
     get_validation_error, get_final_results_text, get_kbju_explanation,
-    get_funnel_text_with_image, get_kbju_text
+    get_funnel_text_with_image, get_kbju_text,
+    SPORT_ECHO_NAMES, FREQ_NAMES, GOAL_ECHO_NAMES
 )
 from utils.buttons import (
     get_sex_keyboard, get_steps_keyboard, get_sport_keyboard,
@@ -22,8 +23,11 @@ from utils.buttons import (
     get_funnel_keyboard
 )
 from utils.validators import validate_name, validate_birthday, validate_height, validate_weight, validate_measurement
-from utils.calculations import calculate_bodyfat, calculate_kbju, calculate_step_multiplier
+from utils.calculations import calculate_bodyfat, calculate_kbju, calculate_step_multiplier, get_record_targets
 from crud.record_crud import create_or_update_record
+from utils.group_commit import write
+from utils.reply import ReplyBuilder
+from utils.events import track
 
 async def ask_name(message: types.Message, state: FSMContext):
     logging.info(f"ask_name: user={message.from_user.id}")
@@ -174,18 +178,7 @@ async def process_sport_callback(callback: types.CallbackQuery, state: FSMContex
     await callback.answer()
     
     sport_type = callback.data.split('_')[1]  # sport_walking -> walking
-    sport_names = {
-        'none': 'Не занимаюсь',
-        'walking': 'Ходьба/Прогулки',
-        'running': 'Бег/Кардио',
-        'strength': 'Тренажерный зал',
-        'yoga': 'Йога/Пилатес',
-        'swimming': 'Плавание',
-        'cycling': 'Велосипед',
-        'team': 'Футбол/Баскетбол'
-    }
-    
-    sport_text = sport_names.get(sport_type, sport_type)
+    sport_text = SPORT_ECHO_NAMES.get(sport_type, sport_type)
     
     # Обновляем сообщение с выбором
     await callback.message.edit_text(
@@ -205,14 +198,7 @@ async def process_frequency_callback(callback: types.CallbackQuery, state: FSMCo
     await callback.answer()
     
     freq = callback.data.split('_')[1]  # freq_1_2 -> 1_2
-    freq_names = {
-        '1_2': '1-2 раза',
-        '3_4': '3-4 раза',
-        '5_6': '5-6 раз',
-        'daily': 'Ежедневно'
-    }
-    
-    freq_text = freq_names.get(freq, freq)
+    freq_text = FREQ_NAMES.get(freq, freq)
     
     # Обновляем сообщение с выбором
     await callback.message.edit_text(
@@ -296,13 +282,7 @@ async def process_goal_callback(callback: types.CallbackQuery, state: FSMContext
     await callback.answer()
     
     goal = callback.data.split('_')[1]  # goal_healthy -> healthy
-    goal_names = {
-        'healthy': 'Здоровое тело',
-        'athletic': 'Спортивное тело',
-        'lean': 'Сухое тело'
-    }
-    
-    goal_text = goal_names.get(goal, goal)
+    goal_text = GOAL_ECHO_NAMES.get(goal, goal)
     
     # Обновляем сообщение с выбором
     await callback.message.edit_text(
@@ -312,6 +292,11 @@ async def process_goal_callback(callback: types.CallbackQuery, state: FSMContext
     await state.update_data(goal=goal)
     await finish_survey(callback.from_user, state)
 
+# Задержка воронки после результатов анкеты
+FUNNEL_DELAY_SECONDS = 60
+# Ссылки на отложенные отправки, чтобы задачи не собрал сборщик мусора
+_funnel_tasks = set()
+
 async def finish_survey(user, state: FSMContext):
     """Завершаем анкету и показываем результаты"""
     user_data = await state.get_data()
@@ -345,25 +330,21 @@ async def finish_survey(user, state: FSMContext):
         db.close()
         await state.finish()
         return
-    user_obj = create_user(
-        db,
+    db.close()
+
+    # Пользователь и первая запись user_records с полным срезом параметров.
+    # Запись ссылается на пользователя, поэтому пишем по очереди
+    await write(
+        create_user,
         telegram_id=user.id,
         username=user.username,
         first_name=first_name,
-        last_name=last_name
-    )
-    update_user(
-        db,
-        user.id,
-        first_name=first_name,
         last_name=last_name,
         sex=user_data['sex'],
         date_of_birth=datetime.strptime(user_data['birthday'], '%d.%m.%Y').date()
     )
-
-    # Создаём первую запись user_records с полным срезом параметров
-    create_or_update_record(
-        db,
+    await write(
+        create_or_update_record,
         user.id,
         date.today(),
         weight=user_data['weight'],
@@ -376,46 +357,43 @@ async def finish_survey(user, state: FSMContext):
         sport_type=user_data['sport_type'],
         sport_freq=user_data['sport_freq'],
         step_multiplier=step_multiplier,
-        bodyfat=bodyfat
-    )
-    db.close()
-
-    # Показываем итоговые результаты (без КБЖУ и рекомендаций)
-    await bot.send_message(
-        user.id,
-        get_final_results_text(user_data, bodyfat),
-        parse_mode='Markdown'
-    )
-
-    # Показываем КБЖУ и рекомендации в одном сообщении
-    kbju_explanation = get_kbju_explanation(user_data['goal'], kbju)
-    await bot.send_message(
-        user.id,
-        kbju_explanation,
-        parse_mode='Markdown'
+        **get_record_targets(bodyfat, kbju)
     )
 
-    # Ждём 1 минуту перед отправкой воронки
-    await asyncio.sleep(60)
+    # Итоговые результаты и КБЖУ с рекомендациями - одним сообщением
+    reply = ReplyBuilder().text(get_final_results_text(user_data, bodyfat), 'Markdown')
+    reply.text(get_kbju_explanation(user_data['goal'], kbju), 'Markdown')
+    await reply.send(bot, user.id)
 
-    # Воронка: фото, экспертный текст, кнопка
-    with open('data/1.jpg', 'rb') as photo:
-        await bot.send_photo(user.id, photo=photo)
-    await bot.send_message(
-        user.id,
-        "💬 Хочешь не просто похудеть или набрать форму, а изменить свою жизнь комплексно?\n\n"
-        "Эксперт Екатерина Юзефовна — профессиональный психолог и специалист по питанию с многолетним опытом.\n\n"
-        "🔹 Поможет разобраться с причинами пищевого поведения\n"
-        "🔹 Поддержит на каждом этапе — от работы с сознанием до подбора питания и активности\n"
-        "🔹 Индивидуальный подход к твоим целям и особенностям\n"
-        "🔹 Комплексное решение: психология, питание, движение, поддержка\n\n"
-        "✨ Запишись на консультацию и начни свой путь к гармонии с собой и телом!",
-        parse_mode='Markdown',
-        reply_markup=get_funnel_keyboard()
-    )
-    
     await state.finish()
 
+    # Воронка через минуту - отдельной задачей: обработчик не держит очередь пользователя
+    # и слот диспетчера, следующие нажатия обрабатываются сразу
+    task = asyncio.create_task(send_funnel(bot, user.id, FUNNEL_DELAY_SECONDS))
+    _funnel_tasks.add(task)
+    task.add_done_callback(_funnel_tasks.discard)
+
+async def send_funnel(bot, user_id: int, delay: float = 0):
+    """Фото с экспертным текстом в подписи и кнопкой записи"""
+    await asyncio.sleep(delay)
+    try:
+        reply = ReplyBuilder().photo(types.InputFile('data/1.jpg'))
+        reply.text(
+            "💬 Хочешь не просто похудеть или набрать форму, а изменить свою жизнь комплексно?\n\n"
+            "Эксперт Екатерина Юзефовна — профессиональный психолог и специалист по питанию с многолетним опытом.\n\n"
+            "🔹 Поможет разобраться с причинами пищевого поведения\n"
+            "🔹 Поддержит на каждом этапе — от работы с сознанием до подбора питания и активности\n"
+            "🔹 Индивидуальный подход к твоим целям и особенностям\n"
+            "🔹 Комплексное решение: психология, питание, движение, поддержка\n\n"
+            "✨ Запишись на консультацию и начни свой путь к гармонии с собой и телом!",
+            'Markdown'
+        )
+        await reply.keyboard(get_funnel_keyboard()).send(bot, user_id)
+        # Кнопка воронки - ссылка, нажатие на нее в бот не приходит: отмечаем показ
+        track(user_id, 'mark', 'funnel_shown')
+    except Exception as e:
+        logging.error(f"send_funnel error: user={user_id}, {e}")
+
 def register_user_info_handlers(dp: Dispatcher):
     """Регистрация обработчиков пользовательской информации"""
     # Обработчики текстовых сообщений
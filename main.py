@@ -3,6 +3,7 @@ import asyncio
 import logging
 from aiogram import Bot, Dispatcher
 from aiogram.contrib.fsm_storage.memory import MemoryStorage
+from utils.ordered_dispatcher import OrderedDispatcher
 from dotenv import load_dotenv
 import os
 
@@ -31,7 +32,8 @@ logger = logging.getLogger(__name__)
 # Инициализация бота
 bot = Bot(token=BOT_TOKEN)
 storage = MemoryStorage()
-dp = Dispatcher(bot, storage=storage)
+# Обновления одного пользователя по очереди, разных - параллельно
+dp = OrderedDispatcher(bot, storage=storage)
 
 # Импорт и регистрация обработчиков
 from handlers.start_handlers import register_start_handlers
@@ -39,32 +41,152 @@ from handlers.user_info_handlers import register_user_info_handlers
 from handlers.menu_handlers import register_menu_handlers
 from handlers.measurements_handlers import register_measurements_handlers
 from handlers.food_handlers import register_food_handlers
+from handlers.export_handlers import register_export_handlers
+from handlers.import_handlers import register_import_handlers
+from handlers.goal_handlers import register_goal_handlers
+from handlers.admin_handlers import register_admin_handlers
+from handlers.meal_plan_handlers import register_meal_plan_handlers
+from handlers.diary_handlers import register_diary_handlers
+from handlers.reminder_handlers import register_reminder_handlers
 
-async def main():
-    """Основная функция"""
-    logger.info("Запуск бота...")
-    
-    # Создаем таблицы базы данных
+def init_database():
+    """Создаем таблицы базы данных и доводим схему до текущих моделей"""
     from models.database import engine
     from models.tables import Base
+    from models.migrations import upgrade_schema
     Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+    # Тренды веса для замеров до их появления: обработчики только читают тренд по ключу
+    from models.database import SessionLocal
+    from crud.trend_crud import rebuild_missing_weight_trends
+    db = SessionLocal()
+    try:
+        trends = rebuild_missing_weight_trends(db)
+    finally:
+        db.close()
+    if trends:
+        logger.info(f"Собраны тренды веса: {trends}")
     logger.info("База данных инициализирована")
+
+def init_nutrition_db():
+    """Собираем и открываем базу продуктов до форка: рабочие процессы делят одни mmap-файлы"""
+    from utils.nutrition_db import get_nutrition_db
+    logger.info(f"База продуктов: {len(get_nutrition_db())} продуктов")
+
+async def setup_dispatcher(dispatcher: Dispatcher):
+    """Обработчики и фоновые задачи процесса, который обрабатывает обновления"""
+    register_start_handlers(dispatcher)
+    register_user_info_handlers(dispatcher)
+    register_menu_handlers(dispatcher)
+    register_measurements_handlers(dispatcher)
+    register_food_handlers(dispatcher)
+    register_export_handlers(dispatcher)
+    register_import_handlers(dispatcher)
+    register_goal_handlers(dispatcher)
+    register_admin_handlers(dispatcher)
+    register_meal_plan_handlers(dispatcher)
+    register_diary_handlers(dispatcher)
+    register_reminder_handlers(dispatcher)
+    
+    # Антифлуд: у каждого пользователя свое ведро токенов, дорогие обработчики стоят больше
+    from utils.throttling import ThrottlingMiddleware
+    dispatcher.middleware.setup(ThrottlingMiddleware())
+    
+    # Счетчик SQL-запросов на обновление: бюджет и повторяющиеся запросы в лог
+    from models.database import engine
+    from utils.query_counter import install_query_counter, QueryCounterMiddleware
+    install_query_counter(engine)
+    dispatcher.middleware.setup(QueryCounterMiddleware())
     
-    # Регистрация обработчиков
-    register_start_handlers(dp)
-    register_user_info_handlers(dp)
-    register_menu_handlers(dp)
-    register_measurements_handlers(dp)
-    register_food_handlers(dp)
+    # Профили медленных обновлений (по умолчанию выключено)
+    from config import PROFILE_UPDATES
+    if PROFILE_UPDATES:
+        from utils.profiling import ProfilingMiddleware
+        dispatcher.middleware.setup(ProfilingMiddleware())
+    
+    # Журнал событий воронок: смены состояний и нажатия, запись пачками в фоне
+    from config import EVENTS_ENABLED
+    if EVENTS_ENABLED:
+        from utils.events import EventsMiddleware, event_log
+        dispatcher.middleware.setup(EventsMiddleware())
+        event_log.start()
+    
+    # Group commit для записей из обработчиков (по умолчанию выключен)
+    from config import GROUP_COMMIT_ENABLED
+    from utils.group_commit import writer
+    if GROUP_COMMIT_ENABLED:
+        writer.start()
+
+def start_archive_task():
+    """Архивация старых замеров в фоне; одна на весь бот"""
+    from config import ARCHIVE_INTERVAL_HOURS
+    from utils.archive import archive_loop
+    return asyncio.create_task(archive_loop()) if ARCHIVE_INTERVAL_HOURS > 0 else None
+
+def start_reminder_task():
+    """Планировщик напоминаний о замерах; один на весь бот (в родителе при нескольких процессах)"""
+    from config import REMINDERS_ENABLED
+    from utils.reminders import reminder_scheduler
+    return asyncio.create_task(reminder_scheduler.run(bot)) if REMINDERS_ENABLED else None
+
+async def main():
+    """Основная функция"""
+    logger.info("Запуск бота...")
+    init_database()
+    init_nutrition_db()
+    await setup_dispatcher(dp)
+    archive_task = start_archive_task()
+    reminder_task = start_reminder_task()
     
     logger.info("Бот запущен!")
     
+    from utils.group_commit import writer
+    from utils.events import event_log
     try:
         # Удаляем webhook и pending updates для избежания конфликтов
         await bot.delete_webhook(drop_pending_updates=True)
         await dp.start_polling()
     finally:
+        logger.info(f"Задержка обновлений в очереди, мс: {dp.get_delay_stats()}")
+        if archive_task:
+            archive_task.cancel()
+        if reminder_task:
+            reminder_task.cancel()
+        await event_log.stop()
+        await writer.stop()
         await bot.session.close()
 
+async def supervise(workers: list):
+    """Родитель в режиме нескольких процессов: опрос Telegram и архивация"""
+    from utils.supervisor import poll_and_route
+    archive_task = start_archive_task()
+    reminder_task = start_reminder_task()
+    logger.info("Бот запущен!")
+    try:
+        await poll_and_route(bot, workers)
+    finally:
+        if archive_task:
+            archive_task.cancel()
+        if reminder_task:
+            reminder_task.cancel()
+        await bot.session.close()
+
+def run_supervisor(workers_count: int):
+    """Несколько рабочих процессов за одним опросом Telegram"""
+    from utils.supervisor import start_workers, stop_workers
+    logger.info(f"Запуск бота в {workers_count} процессах...")
+    init_database()
+    init_nutrition_db()
+    # Форк до запуска event loop и первых запросов к Telegram
+    workers = start_workers(workers_count, setup_dispatcher)
+    try:
+        asyncio.run(supervise(workers))
+    finally:
+        stop_workers(workers)
+
 if __name__ == '__main__':
-    asyncio.run(main()) 
\ No newline at end of file
+    from config import BOT_WORKERS
+    if BOT_WORKERS > 1:
+        run_supervisor(BOT_WORKERS)
+    else:
+        asyncio.run(main())
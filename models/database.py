@@ -1,12 +1,102 @@
-from sqlalchemy import create_engine
+import functools
+import logging
+import random
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./kbju_bot.db"
-
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+from config import (
+    DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+    SQLITE_PROFILE, SQLITE_BUSY_TIMEOUT_MS, SQLITE_MMAP_SIZE, SQLITE_CACHE_SIZE_KB,
+    DB_LOCK_RETRIES, DB_LOCK_RETRY_DELAY_MS
 )
+
+SQLALCHEMY_DATABASE_URL = DATABASE_URL
+
+def get_sqlite_pragmas(profile: str) -> list:
+    """PRAGMA, которые выполняются на каждом новом соединении SQLite"""
+    # busy_timeout нужен всегда: без него параллельная запись сразу падает с "database is locked"
+    pragmas = [f"busy_timeout={SQLITE_BUSY_TIMEOUT_MS}"]
+    if profile == 'performance':
+        pragmas += [
+            "journal_mode=WAL",        # читатели не блокируют писателя
+            "synchronous=NORMAL",      # в WAL fsync только на checkpoint, а не на каждый commit
+            f"mmap_size={SQLITE_MMAP_SIZE}",
+            f"cache_size=-{SQLITE_CACHE_SIZE_KB}",
+            "temp_store=MEMORY",
+        ]
+    return pragmas
+
+def create_db_engine(url: str = SQLALCHEMY_DATABASE_URL, sqlite_profile: str = SQLITE_PROFILE):
+    """Движок с пулом из конфигурации; для SQLite на подключении применяется профиль PRAGMA"""
+    if not url.startswith('sqlite'):
+        return create_engine(
+            url,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_pre_ping=True
+        )
+
+    # Соединения SQLite переиспользуются пулом, чтобы PRAGMA, кэш страниц и mmap не терялись на каждой сессии
+    db_engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False},
+        poolclass=QueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT
+    )
+    pragmas = get_sqlite_pragmas(sqlite_profile)
+
+    @event.listens_for(db_engine, "connect")
+    def apply_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(f"PRAGMA {pragma}")
+        cursor.close()
+
+    return db_engine
+
+def create_readonly_engine(url: str = SQLALCHEMY_DATABASE_URL):
+    """
+    Движок только для чтения (аналитика): SQLite открывается с mode=ro, запись
+    через него невозможна даже по ошибке; для других баз - транзакции READ ONLY
+    """
+    if not url.startswith('sqlite'):
+        db_engine = create_engine(url, pool_size=1, max_overflow=1, pool_pre_ping=True)
+
+        @event.listens_for(db_engine, "connect")
+        def set_read_only(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("SET SESSION CHARACTERISTICS AS TRANSACTION READ ONLY")
+            cursor.close()
+
+        return db_engine
+
+    path = url.split(':///', 1)[1]
+    db_engine = create_engine(
+        f"sqlite:///file:{path}?mode=ro&uri=true",
+        connect_args={"check_same_thread": False},
+        poolclass=QueuePool,
+        pool_size=1,
+        max_overflow=1
+    )
+
+    @event.listens_for(db_engine, "connect")
+    def apply_readonly_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+    return db_engine
+
+engine = create_db_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -16,4 +106,33 @@ def get_db():
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+def is_locked_error(error: Exception) -> bool:
+    """SQLite не дождался блокировки записи"""
+    return isinstance(error, OperationalError) and 'database is locked' in str(error)
+
+def retry_on_locked(func):
+    """
+    Повторяет запись при "database is locked" с экспоненциальной задержкой.
+    Функция должна пробрасывать такую ошибку (после rollback); если все попытки
+    исчерпаны, как и остальные crud-функции возвращает None.
+    Ожидание блокирует поток: из обработчиков такие функции вызываются только через
+    utils.group_commit.write, который выполняет их вне event loop
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        delay = DB_LOCK_RETRY_DELAY_MS / 1000
+        for attempt in range(1, DB_LOCK_RETRIES + 1):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as e:
+                if not is_locked_error(e):
+                    raise
+                logging.warning(f"{func.__name__}: database is locked, attempt {attempt}/{DB_LOCK_RETRIES}")
+                if attempt < DB_LOCK_RETRIES:
+                    time.sleep(delay * (1 + random.random()))
+                    delay *= 2
+        logging.error(f"{func.__name__}: database is still locked after {DB_LOCK_RETRIES} attempts")
+        return None
+    return wrapper
@@ -0,0 +1,42 @@
+import logging
+
+from sqlalchemy import inspect, text
+
+def _ensure_unique_index(conn, table: str, index_name: str, columns: tuple):
+    """
+    Уникальный индекс для уже существующей таблицы (create_all добавляет индексы только новым таблицам).
+    Перед созданием удаляет дубли, оставляя самую свежую строку (максимальный id)
+    """
+    existing = {index['name'] for index in inspect(conn).get_indexes(table)}
+    if index_name in existing:
+        return
+    key = ', '.join(columns)
+    deleted = conn.execute(text(
+        f"DELETE FROM {table} WHERE id NOT IN (SELECT MAX(id) FROM {table} GROUP BY {key})"
+    )).rowcount
+    conn.execute(text(f"CREATE UNIQUE INDEX {index_name} ON {table} ({key})"))
+    logging.info(f"upgrade_schema: created {index_name}, removed {deleted} duplicate rows from {table}")
+
+def _ensure_columns(conn, table: str, columns: dict):
+    """Добавляет недостающие колонки (create_all не меняет существующие таблицы)"""
+    existing = {column['name'] for column in inspect(conn).get_columns(table)}
+    for name, column_type in columns.items():
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}"))
+            logging.info(f"upgrade_schema: added {table}.{name}")
+
+def upgrade_schema(engine):
+    """Доводит схему уже созданной базы до текущих моделей; вызывается после create_all"""
+    with engine.begin() as conn:
+        _ensure_unique_index(conn, 'user_records', 'ux_user_records_telegram_id_date', ('telegram_id', 'date'))
+        _ensure_unique_index(conn, 'user_food_preferences', 'ux_user_food_preferences_telegram_id', ('telegram_id',))
+        # Расчетные колонки записей; у старых записей formula_version пустая - пересчитаются при чтении
+        _ensure_columns(conn, 'user_records', {
+            'calories': 'INTEGER', 'protein': 'INTEGER', 'fat': 'INTEGER',
+            'carbs': 'INTEGER', 'formula_version': 'INTEGER'
+        })
+        _ensure_columns(conn, 'users', {'target_weight': 'FLOAT'})
+        _ensure_columns(conn, 'user_record_archive', {
+            'calories': 'INTEGER', 'protein': 'INTEGER', 'fat': 'INTEGER',
+            'carbs': 'INTEGER', 'formula_version': 'INTEGER'
+        })
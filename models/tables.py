@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Boolean, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Boolean, Text, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
@@ -11,10 +11,16 @@ class User(Base):
     last_name = Column(String)
     sex = Column(String)  # 'male' / 'female'
     date_of_birth = Column(Date)
+    target_weight = Column(Float)  # целевой вес для прогноза (/target)
     created_at = Column(DateTime, default=datetime.utcnow)
     # Relationships
     records = relationship("UserRecord", back_populates="user")
+    archived_weeks = relationship("UserRecordArchive", back_populates="user")
     food_preferences = relationship("UserFoodPreferences", back_populates="user")
+    weight_trend = relationship("UserWeightTrend", back_populates="user", uselist=False)
+    diary_items = relationship("FoodDiaryItem", back_populates="user")
+    diary_days = relationship("FoodDiaryDay", back_populates="user")
+    reminders = relationship("Reminder", back_populates="user")
 
 class UserRecord(Base):
     __tablename__ = "user_records"
@@ -33,8 +39,80 @@ class UserRecord(Base):
     sport_freq = Column(String)
     step_multiplier = Column(Float)
     bodyfat = Column(Float)
+    # КБЖУ на день записи, считаются при записи (utils.calculations.calculate_record_targets)
+    calories = Column(Integer)
+    protein = Column(Integer)
+    fat = Column(Integer)
+    carbs = Column(Integer)
+    formula_version = Column(Integer)  # версия формул; устаревшие пересчитываются при чтении
     # Relationship
     user = relationship("User", back_populates="records")
+    # Одна запись на пользователя в день: ключ для upsert
+    __table_args__ = (
+        Index('ux_user_records_telegram_id_date', 'telegram_id', 'date', unique=True),
+    )
+
+class UserRecordArchive(Base):
+    """Старые замеры, свернутые до недели: рост, цель и активность не хранятся"""
+    __tablename__ = "user_record_archive"
+    id = Column(Integer, primary_key=True, index=True)
+    telegram_id = Column(Integer, ForeignKey("users.telegram_id"))
+    week_start = Column(Date)  # понедельник недели
+    last_date = Column(Date)  # дата последнего замера недели
+    records_count = Column(Integer)
+    weight_mean = Column(Float)
+    weight_min = Column(Float)
+    weight_max = Column(Float)
+    # Последние за неделю обхваты, процент жира и КБЖУ (с версией формул, которой они посчитаны)
+    waist = Column(Float)
+    neck = Column(Float)
+    hip = Column(Float)
+    bodyfat = Column(Float)
+    calories = Column(Integer)
+    protein = Column(Integer)
+    fat = Column(Integer)
+    carbs = Column(Integer)
+    formula_version = Column(Integer)
+    # Relationship
+    user = relationship("User", back_populates="archived_weeks")
+    __table_args__ = (
+        Index('ux_user_record_archive_telegram_id_week', 'telegram_id', 'week_start', unique=True),
+    )
+
+class UserFoodTerm(Base):
+    """
+    Нормализованные термины предпочтений (utils.food_terms): обратный индекс
+    "термин -> пользователи" по (kind, term), переиндексируется при сохранении предпочтений
+    """
+    __tablename__ = "user_food_terms"
+    id = Column(Integer, primary_key=True)
+    telegram_id = Column(Integer, ForeignKey("users.telegram_id"))
+    kind = Column(String)  # 'like' / 'dislike'
+    term = Column(String)  # продукт, основа слова или категория '#...'
+    __table_args__ = (
+        Index('ux_user_food_terms_user_kind_term', 'telegram_id', 'kind', 'term', unique=True),
+        Index('ix_user_food_terms_kind_term', 'kind', 'term'),
+    )
+
+class UserWeightTrend(Base):
+    """Накопленная статистика тренда веса (utils.trend), обновляется при каждой записи замеров"""
+    __tablename__ = "user_weight_trends"
+    telegram_id = Column(Integer, ForeignKey("users.telegram_id"), primary_key=True)
+    last_date = Column(Date)
+    last_weight = Column(Float)
+    # EMA до последнего замера: нужна, чтобы заменить замер за тот же день
+    prev_date = Column(Date)
+    prev_ema = Column(Float)
+    ema = Column(Float)
+    points = Column(Integer)
+    # Взвешенные суммы МНК, x - дни до last_date
+    sum_w = Column(Float)
+    sum_x = Column(Float)
+    sum_y = Column(Float)
+    sum_xx = Column(Float)
+    sum_xy = Column(Float)
+    # Relationship
+    user = relationship("User", back_populates="weight_trend")
 
 class UserFoodPreferences(Base):
     __tablename__ = "user_food_preferences"
@@ -44,4 +122,82 @@ class UserFoodPreferences(Base):
     dislikes_raw = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
     # Relationship
-    user = relationship("User", back_populates="food_preferences") 
\ No newline at end of file
+    user = relationship("User", back_populates="food_preferences")
+    # Один набор предпочтений на пользователя: ключ для upsert
+    __table_args__ = (
+        Index('ux_user_food_preferences_telegram_id', 'telegram_id', unique=True),
+    )
+
+class FoodDiaryItem(Base):
+    """Дневник питания: съеденный продукт с КБЖУ порции (utils.nutrition_db)"""
+    __tablename__ = "food_diary_items"
+    id = Column(Integer, primary_key=True)
+    telegram_id = Column(Integer, ForeignKey("users.telegram_id"))
+    date = Column(Date)
+    name = Column(String)
+    grams = Column(Float)
+    calories = Column(Float)
+    protein = Column(Float)
+    fat = Column(Float)
+    carbs = Column(Float)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    # Relationship
+    user = relationship("User", back_populates="diary_items")
+    __table_args__ = (
+        Index('ix_food_diary_items_telegram_id_date', 'telegram_id', 'date'),
+    )
+
+class FoodDiaryDay(Base):
+    """
+    Итоги дня дневника питания: обновляются в той же транзакции, что и запись продукта,
+    поэтому "сколько осталось" - чтение одной строки, а не сумма по продуктам дня
+    """
+    __tablename__ = "food_diary_days"
+    id = Column(Integer, primary_key=True)
+    telegram_id = Column(Integer, ForeignKey("users.telegram_id"))
+    date = Column(Date)
+    calories = Column(Float)
+    protein = Column(Float)
+    fat = Column(Float)
+    carbs = Column(Float)
+    items = Column(Integer)
+    # Relationship
+    user = relationship("User", back_populates="diary_days")
+    __table_args__ = (
+        Index('ux_food_diary_days_telegram_id_date', 'telegram_id', 'date', unique=True),
+    )
+
+class Reminder(Base):
+    """
+    Напоминание о замерах (utils.reminders): расписание и время следующей отправки.
+    Планировщик читает только то, что наступает в ближайшее окно, по индексу next_due
+    """
+    __tablename__ = "reminders"
+    id = Column(Integer, primary_key=True)
+    telegram_id = Column(Integer, ForeignKey("users.telegram_id"))
+    kind = Column(String)  # 'weight' - взвешивание, 'girths' - обхваты
+    cadence = Column(String)  # 'daily' / 'weekly' / 'monthly'
+    weekday = Column(Integer)  # 0 - понедельник, для weekly
+    day = Column(Integer)  # число месяца 1-28, для monthly
+    minutes = Column(Integer)  # время отправки: минут от полуночи (REMINDERS_UTC_OFFSET_HOURS)
+    enabled = Column(Boolean)
+    next_due = Column(Float)  # unix time следующей отправки
+    last_sent = Column(Float)
+    # Relationship
+    user = relationship("User", back_populates="reminders")
+    __table_args__ = (
+        Index('ux_reminders_telegram_id_kind', 'telegram_id', 'kind', unique=True),
+        Index('ix_reminders_enabled_next_due', 'enabled', 'next_due'),
+    )
+
+class Event(Base):
+    """Журнал событий для воронок (utils.events): только вставка, пишется пачками"""
+    __tablename__ = "events"
+    id = Column(Integer, primary_key=True)
+    telegram_id = Column(Integer, index=True)
+    ts = Column(Float)  # unix time: разница двух событий - секунды в любой СУБД
+    kind = Column(String)  # 'state' - смена FSM-состояния, 'click' - нажатие кнопки, 'mark' - отметка из кода
+    name = Column(String)
+    __table_args__ = (
+        Index('ix_events_kind_name_ts', 'kind', 'name', 'ts'),
+    )
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Сводка по пользователям (то же, что /stats у администратора) без запуска бота.
+Читает базу через соединение только для чтения, можно запускать на живой базе
+"""
+
+import sys
+import os
+import argparse
+import json
+import logging
+
+# Добавляем путь к корневой папке проекта
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.analytics import build_analytics_report, format_analytics_report, build_funnel_report, format_funnel_report
+
+def main():
+    """Основная функция"""
+    parser = argparse.ArgumentParser(description="Сводка по пользователям бота")
+    parser.add_argument('--funnel', action='store_true', help="воронка анкеты по журналу событий")
+    parser.add_argument('--json', action='store_true', help="вывести сырые числа в JSON")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.funnel:
+        report = build_funnel_report()
+        text = format_funnel_report(report)
+    else:
+        report = build_analytics_report()
+        report['bodyfat'] = [list(row) for row in report['bodyfat']]
+        text = format_analytics_report(report)
+    print(json.dumps(report, ensure_ascii=False, indent=2) if args.json else text)
+
+if __name__ == "__main__":
+    main()
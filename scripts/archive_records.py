@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Архивация старых замеров: записи старше горизонта сворачиваются в недельные сводки
+и удаляются из user_records. Бот делает то же сам раз в ARCHIVE_INTERVAL_HOURS
+"""
+
+import sys
+import os
+import argparse
+import logging
+
+# Добавляем путь к корневой папке проекта
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from models.database import engine
+from models.tables import Base
+from models.migrations import upgrade_schema
+from utils.archive import archive_old_records
+from config import ARCHIVE_HORIZON_DAYS
+
+def main():
+    """Основная функция"""
+    parser = argparse.ArgumentParser(description="Архивация старых замеров")
+    parser.add_argument('--horizon-days', type=int, default=ARCHIVE_HORIZON_DAYS,
+                        help=f"архивировать замеры старше стольких дней (по умолчанию {ARCHIVE_HORIZON_DAYS})")
+    parser.add_argument('--vacuum', action='store_true',
+                        help="после архивации сжать файл базы (VACUUM, только SQLite)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+
+    print("🗄 Архивация старых замеров")
+    print("=" * 50)
+    report = archive_old_records(args.horizon_days)
+    print(f"Граница: {report['cutoff']}")
+    print(f"Пользователей: {report['users']}")
+    print(f"Заархивировано замеров: {report['records']}")
+
+    if args.vacuum and engine.dialect.name == 'sqlite':
+        with engine.connect() as conn:
+            conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
+        print("Файл базы сжат")
+    print("=" * 50)
+
+if __name__ == "__main__":
+    main()
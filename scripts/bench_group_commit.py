@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк group commit: N "пользователей" одновременно сохраняют замеры.
+Без писателя каждая запись - своя транзакция, с писателем записи фиксируются пачками.
+Показывает записей в секунду и коммитов в секунду
+"""
+
+import sys
+import os
+import time
+import asyncio
+import tempfile
+import logging
+from datetime import date, timedelta
+
+# Добавляем путь к корневой папке проекта
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.orm import sessionmaker
+from models.database import create_db_engine, Base
+from crud.record_crud import create_or_update_record, get_user_records
+from utils.group_commit import GroupCommitWriter
+
+WRITES_PER_USER = 50
+USERS = (1, 16, 64)
+PROFILES = ('default', 'performance')
+
+def write_direct(session_factory, *args, **kwargs):
+    """Запись без писателя: своя сессия и свой commit, как раньше в обработчиках"""
+    db = session_factory()
+    try:
+        return create_or_update_record(db, *args, **kwargs)
+    finally:
+        db.close()
+
+async def user_writes(session_factory, writer, user_id: int):
+    """Серия замеров одного пользователя; каждый следующий ждет сохранения предыдущего"""
+    loop = asyncio.get_running_loop()
+    start_date = date(2024, 1, 1)
+    for i in range(WRITES_PER_USER):
+        args = (user_id, start_date + timedelta(days=i))
+        values = dict(weight=80.0 + i % 10, waist=90.0, neck=40.0, height=180, goal='healthy')
+        if writer:
+            await writer.submit(create_or_update_record, *args, **values)
+        else:
+            await loop.run_in_executor(None, lambda: write_direct(session_factory, *args, **values))
+
+async def bench(profile: str, users: int, group_commit: bool):
+    """Возвращает (записей в секунду, коммитов в секунду, записей в базе)"""
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_db_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}", profile)
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        writer = GroupCommitWriter(session_factory) if group_commit else None
+        if writer:
+            writer.start()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user_writes(session_factory, writer, user_id) for user_id in range(users)))
+        elapsed = time.perf_counter() - started
+
+        if writer:
+            await writer.stop()
+        total = users * WRITES_PER_USER
+        commits = writer.commits if writer else total
+
+        db = session_factory()
+        saved = sum(len(get_user_records(db, user_id)) for user_id in range(users))
+        db.close()
+        engine.dispose()
+
+    return total / elapsed, commits / elapsed, saved
+
+async def run():
+    print("📊 Group commit: записей в секунду против коммитов в секунду")
+    print("=" * 70)
+    for profile in PROFILES:
+        print(f"Профиль SQLite: {profile}")
+        for users in USERS:
+            for group_commit in (False, True):
+                writes, commits, saved = await bench(profile, users, group_commit)
+                mode = 'group commit' if group_commit else 'по одной'
+                print(f"  {mode:<13} пользователей: {users:<3} {writes:8.0f} записей/с {commits:8.0f} коммитов/с, "
+                      f"в базе: {saved}/{users * WRITES_PER_USER}")
+        print("=" * 70)
+
+def main():
+    """Основная функция"""
+    logging.disable(logging.WARNING)
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    main()
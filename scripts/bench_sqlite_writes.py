@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк записи в SQLite: профиль 'default' против 'performance'
+Каждая запись - отдельный create_or_update_record с commit, как в обработчиках
+"""
+
+import sys
+import os
+import time
+import tempfile
+import logging
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+# Добавляем путь к корневой папке проекта
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.orm import sessionmaker
+from models.database import create_db_engine, Base
+from crud.record_crud import create_or_update_record
+
+WRITES_PER_WORKER = 200
+WORKERS = (1, 8)
+
+def run_writes(session_factory, worker: int, count: int):
+    """Серия записей одного "пользователя"; возвращает число неудачных"""
+    db = session_factory()
+    failed = 0
+    start_date = date(2024, 1, 1)
+    for i in range(count):
+        record = create_or_update_record(
+            db,
+            worker,
+            start_date + timedelta(days=i),
+            weight=80.0 + i % 10,
+            waist=90.0,
+            neck=40.0,
+            height=180,
+            goal='healthy'
+        )
+        if record is None:
+            failed += 1
+    db.close()
+    return failed
+
+def bench(profile: str, workers: int):
+    """Записи с нуля в новую базу; возвращает (записей в секунду, неудачных записей)"""
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_db_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}", profile)
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            failed = sum(pool.map(lambda w: run_writes(session_factory, w, WRITES_PER_WORKER), range(workers)))
+        elapsed = time.perf_counter() - started
+        engine.dispose()
+
+    total = workers * WRITES_PER_WORKER
+    return total / elapsed, failed
+
+def main():
+    """Основная функция"""
+    logging.disable(logging.WARNING)
+    print("📊 Запись в SQLite: default против performance")
+    print("=" * 50)
+    for workers in WORKERS:
+        for profile in ('default', 'performance'):
+            rate, failed = bench(profile, workers)
+            print(f"{profile:<12} потоков: {workers:<2} {rate:8.0f} записей/с, ошибок: {failed}")
+    print("=" * 50)
+
+if __name__ == "__main__":
+    main()
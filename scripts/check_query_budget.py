@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Проверка бюджета SQL-запросов основных обработчиков.
+Вызываются сами обработчики (с заглушкой вместо Telegram) на временной базе, поэтому
+проверка считает ровно те запросы, которые делает бот.
+Запускается в CI: при превышении печатает запросы и завершается с кодом 1
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+import logging
+import types as pytypes
+from datetime import date, timedelta
+
+# Временная база и токен задаются до импорта проекта: config читает их при импорте
+TMP_DIR = tempfile.TemporaryDirectory()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(TMP_DIR.name, 'budget.db')}"
+os.environ.setdefault('BOT_TOKEN', '1:budget')
+# Логи обработчиков в CI не нужны (и не должны создавать bot.log)
+logging.basicConfig(handlers=[logging.NullHandler()])
+logging.disable(logging.WARNING)
+
+# Добавляем путь к корневой папке проекта
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiogram.contrib.fsm_storage.memory import MemoryStorage
+from aiogram.dispatcher import FSMContext
+from models.database import engine, SessionLocal, Base
+import models.tables  # noqa: F401 - регистрирует таблицы
+from crud.user_crud import create_user
+from crud.record_crud import create_or_update_record
+from utils.calculations import calculate_record_targets
+from utils.query_counter import install_query_counter, assert_max_queries
+
+USER_ID = 1
+
+class StubBot:
+    """Вместо Bot API: запоминает тексты и подписи отправленного"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append(text)
+        return pytypes.SimpleNamespace(message_id=len(self.sent))
+
+    async def send_photo(self, chat_id, photo=None, caption=None, **kwargs):
+        self.sent.append(caption or '')
+        return pytypes.SimpleNamespace(message_id=len(self.sent), photo=[pytypes.SimpleNamespace(file_id='stub')])
+
+class StubMessage:
+    """Сообщение пользователя: ответы уходят в StubBot"""
+
+    def __init__(self, bot, text: str = ''):
+        self.bot = bot
+        self.text = text
+        self.from_user = pytypes.SimpleNamespace(id=USER_ID, username=None)
+        self.chat = pytypes.SimpleNamespace(id=USER_ID)
+
+    async def answer(self, text, **kwargs):
+        return await self.bot.send_message(self.chat.id, text, **kwargs)
+
+    async def edit_text(self, text, **kwargs):
+        self.text = text
+
+class StubCallback:
+    def __init__(self, bot, data: str):
+        self.data = data
+        self.from_user = pytypes.SimpleNamespace(id=USER_ID)
+        self.message = StubMessage(bot)
+
+    async def answer(self, *args, **kwargs):
+        pass
+
+async def make_state(data: dict = None) -> FSMContext:
+    """Состояние FSM пользователя с данными анкеты"""
+    state = FSMContext(MemoryStorage(), chat=USER_ID, user=USER_ID)
+    if data:
+        await state.set_data(data)
+    return state
+
+async def show_progress_flow(bot):
+    """show_progress: пользователь, проекция по всем метрикам (рабочая таблица + архив), тренд"""
+    from handlers.menu_handlers import show_progress
+    await show_progress(USER_ID, await make_state())
+
+async def finish_measurements_flow(bot):
+    """finish_measurements: последняя запись, пользователь, upsert замера, чтение и обновление тренда"""
+    from handlers.measurements_handlers import finish_measurements
+    state = await make_state({'weight': 80.5, 'waist': 90.0, 'neck': 40.0, 'steps': '8000-10000'})
+    await finish_measurements(StubMessage(bot), state)
+
+async def goal_change_flow(bot):
+    """process_goal_change_callback: пользователь, последняя запись и сохранение цели в нее"""
+    from handlers.goal_handlers import process_goal_change_callback
+    await process_goal_change_callback(StubCallback(bot, 'goal_athletic'), await make_state())
+
+# Обработчик -> максимум запросов
+BUDGETS = (
+    (show_progress_flow, 4),
+    (finish_measurements_flow, 5),
+    (goal_change_flow, 4),
+)
+
+def seed():
+    """Пользователь с месяцем ежедневных замеров"""
+    db = SessionLocal()
+    create_user(db, USER_ID, sex='male')
+    for days in range(30, 0, -1):
+        record = {'weight': 80.0, 'waist': 90.0, 'neck': 40.0, 'height': 180, 'goal': 'healthy'}
+        create_or_update_record(db, USER_ID, date.today() - timedelta(days=days), **record,
+                                **calculate_record_targets('male', record))
+    db.close()
+
+async def run_budgets() -> int:
+    bot = StubBot()
+    # Обработчики берут бота через "from main import bot": подставляем заглушку,
+    # не запуская main (он создает настоящий Bot и пишет bot.log)
+    sys.modules['main'] = pytypes.SimpleNamespace(bot=bot)
+    failed = 0
+    for flow, budget in BUDGETS:
+        sent = len(bot.sent)
+        try:
+            with assert_max_queries(budget) as stats:
+                await flow(bot)
+            # Обработчики ловят свои ошибки и отвечают "❌ ...": такой прогон не считается
+            replies = bot.sent[sent:]
+            if not replies or any(reply.startswith('❌') for reply in replies):
+                raise AssertionError(f"handler failed: {replies}")
+            print(f"✅ {flow.__name__:<30} {stats.count}/{budget}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {flow.__name__:<30} {e}")
+    return failed
+
+def main():
+    """Основная функция"""
+    Base.metadata.create_all(bind=engine)
+    install_query_counter(engine)
+    seed()
+
+    print("📊 Бюджет SQL-запросов")
+    print("=" * 50)
+    failed = asyncio.run(run_budgets())
+    print("=" * 50)
+    engine.dispose()
+    TMP_DIR.cleanup()
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
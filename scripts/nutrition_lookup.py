@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Пересборка индекса базы продуктов и проверка поиска:
+python scripts/nutrition_lookup.py [--rebuild] "гречка 150г" "яйца 2 шт"
+"""
+
+import sys
+import os
+import time
+import argparse
+import logging
+
+# Добавляем путь к корневой папке проекта
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.nutrition_db import build_nutrition_index, get_nutrition_db, lookup_food, parse_food_entry
+
+def main():
+    """Основная функция"""
+    parser = argparse.ArgumentParser(description="Поиск продуктов в базе КБЖУ")
+    parser.add_argument('queries', nargs='*', help='запросы вида "гречка 150г"')
+    parser.add_argument('--rebuild', action='store_true', help='пересобрать индекс из data/nutrition.csv')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.rebuild:
+        build_nutrition_index()
+    db = get_nutrition_db()
+    print(f"🍽 Продуктов в базе: {len(db)}, триграмм: {len(db.trigram_keys)}")
+
+    for query in args.queries:
+        started = time.perf_counter()
+        food = lookup_food(query, db)
+        elapsed_us = (time.perf_counter() - started) * 1e6
+        if not food:
+            print(f"\n{query}: не найдено ({elapsed_us:.0f} мкс)")
+            continue
+        print(
+            f"\n{query}: {food['name']}, {food['grams']} г (похожесть {food['similarity']}, {elapsed_us:.0f} мкс)\n"
+            f"  {food['calories']} ккал • Б {food['protein']} • Ж {food['fat']} • У {food['carbs']}"
+        )
+        for index, similarity in db.search(parse_food_entry(query)[0], k=3)[1:]:
+            print(f"  также: {db.names[index]} ({similarity:.2f})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Отчет по профилям медленных обновлений (PROFILE_UPDATES=1):
+список снятых профилей и самые тяжелые функции по всем сразу
+"""
+
+import sys
+import os
+import json
+import argparse
+import pstats
+
+# Добавляем путь к корневой папке проекта
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import PROFILE_DIR
+
+def load_captures(directory: str, handler: str = None) -> list:
+    """Пары (путь к .prof, теги), от старых к новым"""
+    captures = []
+    for file in sorted(os.listdir(directory)):
+        if not file.endswith('.prof'):
+            continue
+        tags_path = os.path.join(directory, file[:-len('.prof')] + '.json')
+        tags = {}
+        if os.path.exists(tags_path):
+            with open(tags_path, encoding='utf-8') as f:
+                tags = json.load(f)
+        if handler and tags.get('handler') != handler:
+            continue
+        captures.append((os.path.join(directory, file), tags))
+    return captures
+
+def main():
+    """Основная функция"""
+    parser = argparse.ArgumentParser(description="Самые тяжелые функции в профилях медленных обновлений")
+    parser.add_argument('--dir', default=PROFILE_DIR, help=f"папка с профилями (по умолчанию {PROFILE_DIR})")
+    parser.add_argument('--handler', help="только профили этого обработчика, например show_progress")
+    parser.add_argument('--top', type=int, default=25, help="сколько функций показать")
+    parser.add_argument('--sort', default='cumulative', choices=('cumulative', 'tottime', 'ncalls'),
+                        help="сортировка функций")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.dir):
+        print(f"❌ Папка {args.dir} не найдена: профили еще не снимались")
+        return
+    captures = load_captures(args.dir, args.handler)
+    if not captures:
+        print("📭 Подходящих профилей нет")
+        return
+
+    print(f"📊 Профилей: {len(captures)}")
+    print("=" * 70)
+    for _, tags in captures:
+        print(f"{tags.get('created', '?'):<20} {tags.get('handler', '?'):<30} "
+              f"{tags.get('elapsed_ms', 0):>8.0f} мс  состояние: {tags.get('state') or '-'}")
+    print("=" * 70)
+
+    stats = pstats.Stats(captures[0][0])
+    for path, _ in captures[1:]:
+        stats.add(path)
+    stats.strip_dirs().sort_stats(args.sort).print_stats(args.top)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Сборка трендов веса по истории замеров.
+Бот сам собирает недостающие тренды при старте; скрипт - чтобы сделать это заранее
+или пересобрать тренды всех пользователей (--all) после изменения формул в utils/trend.py
+"""
+
+import sys
+import os
+import argparse
+import logging
+
+# Добавляем путь к корневой папке проекта
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import engine, SessionLocal
+from models.tables import Base, UserRecord
+from models.migrations import upgrade_schema
+from crud.trend_crud import rebuild_weight_trend, rebuild_missing_weight_trends
+
+def main():
+    """Основная функция"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--all', action='store_true', help='пересобрать тренды всех пользователей')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+
+    db = SessionLocal()
+    try:
+        if args.all:
+            users = [row.telegram_id for row in db.query(UserRecord.telegram_id).distinct().all()]
+            count = sum(1 for telegram_id in users if rebuild_weight_trend(db, telegram_id) is not None)
+        else:
+            count = rebuild_missing_weight_trends(db)
+        print(f"📉 Собрано трендов веса: {count}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Переиндексация терминов пищевых предпочтений по сохраненному тексту.
+Нужна один раз для предпочтений, сохраненных до появления индекса, и после
+изменения словарей в utils/food_terms.py
+"""
+
+import sys
+import os
+import logging
+
+# Добавляем путь к корневой папке проекта
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import engine, SessionLocal
+from models.tables import Base
+from models.migrations import upgrade_schema
+from crud.food_crud import reindex_all_food_terms, get_top_food_terms
+
+def main():
+    """Основная функция"""
+    logging.basicConfig(level=logging.WARNING)
+    Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+
+    db = SessionLocal()
+    try:
+        count = reindex_all_food_terms(db)
+        print(f"🍎 Переиндексировано пользователей: {count}")
+        for kind, title in (('like', 'Любят'), ('dislike', 'Не любят')):
+            top = get_top_food_terms(db, kind, limit=10, categories=True)
+            print(f"{title}: {', '.join(f'{term} ({users})' for term, users in top) or '—'}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
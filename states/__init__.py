@@ -1,5 +1,6 @@
 from .fsm_states import *
 
 __all__ = [
-    'UserInfoStates', 'MeasurementsStates', 'GoalStates', 'FoodStates'
+    'UserInfoStates', 'MeasurementsStates', 'GoalStates', 'FoodStates',
+    'ImportStates'
 ] 
\ No newline at end of file
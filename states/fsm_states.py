@@ -32,4 +32,8 @@ class GoalStates(StatesGroup):
 class FoodStates(StatesGroup):
     """Состояния для пищевых предпочтений"""
     likes = State()
-    dislikes = State() 
\ No newline at end of file
+    dislikes = State()
+
+class ImportStates(StatesGroup):
+    """Состояния для импорта истории замеров"""
+    file = State()
@@ -0,0 +1,292 @@
+import logging
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import Date, DateTime, Integer, String, text
+
+from config import ANALYTICS_CACHE_TTL, ANALYTICS_CHUNK_SIZE
+from utils.texts import GOAL_NAMES
+from states.fsm_states import UserInfoStates
+
+# Сводка по всей базе для администраторов. Все считает SQL (GROUP BY, оконные функции),
+# в Python приходят только агрегаты или узкие строки, которые читаются из курсора
+# пачками по ANALYTICS_CHUNK_SIZE. Соединение только для чтения (create_readonly_engine)
+
+# Последняя запись каждого пользователя: цель, активность и процент жира "сейчас"
+LATEST_RECORDS_SQL = """
+    SELECT telegram_id, goal, steps, sport_type, bodyfat FROM (
+        SELECT telegram_id, goal, steps, sport_type, bodyfat,
+               ROW_NUMBER() OVER (PARTITION BY telegram_id ORDER BY date DESC) AS rn
+        FROM user_records
+    ) latest WHERE rn = 1
+"""
+
+USERS_BY_SEX_SQL = text("SELECT sex, COUNT(*) AS users FROM users GROUP BY sex")
+
+GOALS_SQL = text(f"SELECT goal, COUNT(*) AS users FROM ({LATEST_RECORDS_SQL}) l GROUP BY goal")
+
+STEPS_SQL = text(f"SELECT steps, COUNT(*) AS users FROM ({LATEST_RECORDS_SQL}) l GROUP BY steps")
+
+SPORT_SQL = text(f"SELECT sport_type, COUNT(*) AS users FROM ({LATEST_RECORDS_SQL}) l GROUP BY sport_type")
+
+# Корзины по 5% жира отдельно по полу
+BODYFAT_SQL = text(f"""
+    SELECT u.sex AS sex, CAST(l.bodyfat / 5 AS INTEGER) * 5 AS bucket, COUNT(*) AS users
+    FROM ({LATEST_RECORDS_SQL}) l JOIN users u ON u.telegram_id = l.telegram_id
+    WHERE l.bodyfat IS NOT NULL
+    GROUP BY u.sex, bucket
+    ORDER BY u.sex, bucket
+""").columns(sex=String, bucket=Integer, users=Integer)
+
+# Промежутки между соседними замерами пользователя; строк столько же, сколько записей,
+# поэтому читаются потоком
+GAPS_SQL = text("""
+    SELECT date, LAG(date) OVER (PARTITION BY telegram_id ORDER BY date) AS prev_date
+    FROM user_records
+""").columns(date=Date, prev_date=Date)
+
+# Одна строка на пользователя: когда пришел, сколько замеров и когда последний
+ACTIVITY_SQL = text("""
+    SELECT u.created_at AS created_at, COUNT(r.id) AS records, MAX(r.date) AS last_date
+    FROM users u LEFT JOIN user_records r ON r.telegram_id = u.telegram_id
+    GROUP BY u.telegram_id, u.created_at
+""").columns(created_at=DateTime, records=Integer, last_date=Date)
+
+# Частые категории в предпочтениях - по обратному индексу терминов, без сырого текста
+FOOD_CATEGORIES_SQL = text("""
+    SELECT kind, term, COUNT(*) AS users FROM user_food_terms
+    WHERE term LIKE '#%'
+    GROUP BY kind, term
+    ORDER BY kind, users DESC
+""")
+
+# Корзины промежутков между замерами, дней: (до, подпись)
+GAP_BUCKETS = ((1, '1 день'), (3, '2-3 дня'), (7, '4-7 дней'), (14, '8-14 дней'), (None, '15+ дней'))
+
+# Воронка анкеты по журналу событий (utils.events): сколько пользователей дошло до шага
+FUNNEL_REACH_SQL = text("""
+    SELECT name, COUNT(DISTINCT telegram_id) AS users FROM events
+    WHERE kind = 'state' GROUP BY name
+""")
+
+# Медиана времени на шаге: от входа в состояние до следующей смены состояния
+FUNNEL_DWELL_SQL = text("""
+    WITH transitions AS (
+        SELECT name, LEAD(ts) OVER (PARTITION BY telegram_id ORDER BY ts, id) - ts AS seconds
+        FROM events WHERE kind = 'state'
+    ), ranked AS (
+        SELECT name, seconds,
+               ROW_NUMBER() OVER (PARTITION BY name ORDER BY seconds) AS rn,
+               COUNT(*) OVER (PARTITION BY name) AS cnt
+        FROM transitions WHERE seconds IS NOT NULL
+    )
+    SELECT name, AVG(seconds) AS median_seconds FROM ranked
+    WHERE rn IN ((cnt + 1) / 2, (cnt + 2) / 2)
+    GROUP BY name
+""")
+
+# Закончили анкету: из последнего шага вышли без состояния
+FUNNEL_COMPLETED_SQL = text("""
+    SELECT COUNT(DISTINCT telegram_id) AS users FROM (
+        SELECT telegram_id, name, LAG(name) OVER (PARTITION BY telegram_id ORDER BY ts, id) AS prev_name
+        FROM events WHERE kind = 'state'
+    ) transitions
+    WHERE prev_name = :last_step AND name = 'none'
+""")
+
+# Предложение консультации и переход к ней из меню после него
+CONSULTATION_SQL = text("""
+    SELECT COUNT(DISTINCT shown.telegram_id) AS shown, COUNT(DISTINCT clicked.telegram_id) AS clicked
+    FROM events shown LEFT JOIN events clicked
+        ON clicked.telegram_id = shown.telegram_id AND clicked.kind = 'click'
+        AND clicked.name = 'menu_consultation' AND clicked.ts > shown.ts
+    WHERE shown.kind = 'mark' AND shown.name = 'funnel_shown'
+""")
+
+FUNNEL_STEPS = UserInfoStates.all_states_names
+# Шаги не для всех (бёдра - только женщины): не база для конверсии следующего шага
+FUNNEL_OPTIONAL_STEPS = {UserInfoStates.hip.state}
+
+_cache = {}
+_readonly_engine = None
+
+def get_readonly_engine():
+    global _readonly_engine
+    if _readonly_engine is None:
+        from models.database import create_readonly_engine
+        _readonly_engine = create_readonly_engine()
+    return _readonly_engine
+
+def _stream(conn, query):
+    """Строки запроса пачками, без загрузки всего результата"""
+    result = conn.execution_options(stream_results=True).execute(query)
+    while True:
+        rows = result.fetchmany(ANALYTICS_CHUNK_SIZE)
+        if not rows:
+            break
+        yield from rows
+
+def _count_gaps(conn) -> dict:
+    counts = {label: 0 for _, label in GAP_BUCKETS}
+    for row in _stream(conn, GAPS_SQL):
+        if row.prev_date is None:
+            continue
+        gap = (row.date - row.prev_date).days
+        for limit, label in GAP_BUCKETS:
+            if limit is None or gap <= limit:
+                counts[label] += 1
+                break
+    return counts
+
+def _count_retention(conn, today: date) -> dict:
+    retention = {'users': 0, 'new_7d': 0, 'active_7d': 0, 'active_30d': 0, 'returned': 0}
+    week_ago = today - timedelta(days=7)
+    month_ago = today - timedelta(days=30)
+    for row in _stream(conn, ACTIVITY_SQL):
+        retention['users'] += 1
+        if row.created_at and row.created_at.date() >= week_ago:
+            retention['new_7d'] += 1
+        if row.last_date and row.last_date >= week_ago:
+            retention['active_7d'] += 1
+        if row.last_date and row.last_date >= month_ago:
+            retention['active_30d'] += 1
+        # Вернулся хотя бы раз после анкеты
+        if row.records >= 2:
+            retention['returned'] += 1
+    return retention
+
+def build_analytics_report(engine=None, today: date = None) -> dict:
+    """Считает сводку по базе; без кэша - для CLI и get_analytics_report"""
+    logging.info("build_analytics_report: start")
+    started = time.perf_counter()
+    engine = engine or get_readonly_engine()
+    today = today or date.today()
+    with engine.connect() as conn:
+        report = {
+            'sex': {row.sex: row.users for row in conn.execute(USERS_BY_SEX_SQL)},
+            'goals': {row.goal: row.users for row in conn.execute(GOALS_SQL)},
+            'steps': {row.steps: row.users for row in conn.execute(STEPS_SQL)},
+            'sport': {row.sport_type: row.users for row in conn.execute(SPORT_SQL)},
+            'bodyfat': [(row.sex, row.bucket, row.users) for row in conn.execute(BODYFAT_SQL)],
+            'gaps': _count_gaps(conn),
+            'retention': _count_retention(conn, today),
+            'food': {'like': {}, 'dislike': {}},
+        }
+        for row in conn.execute(FOOD_CATEGORIES_SQL):
+            report['food'].setdefault(row.kind, {})[row.term] = row.users
+    report['built_at'] = datetime.now().strftime('%d.%m.%Y %H:%M')
+    logging.info(f"build_analytics_report: done in {(time.perf_counter() - started) * 1000:.0f} ms")
+    return report
+
+def get_analytics_report(force: bool = False, ttl: int = ANALYTICS_CACHE_TTL) -> dict:
+    """Сводка из кэша, если она моложе ttl секунд, иначе считается заново"""
+    cached = _cache.get('report')
+    if cached and not force and time.monotonic() - cached[0] < ttl:
+        return cached[1]
+    report = build_analytics_report()
+    _cache['report'] = (time.monotonic(), report)
+    return report
+
+def build_funnel_report(engine=None) -> dict:
+    """Воронка анкеты и консультации по журналу событий"""
+    logging.info("build_funnel_report: start")
+    engine = engine or get_readonly_engine()
+    with engine.connect() as conn:
+        reach = {row.name: row.users for row in conn.execute(FUNNEL_REACH_SQL)}
+        dwell = {row.name: row.median_seconds for row in conn.execute(FUNNEL_DWELL_SQL)}
+        completed = conn.execute(FUNNEL_COMPLETED_SQL, {'last_step': FUNNEL_STEPS[-1]}).scalar()
+        consultation = conn.execute(CONSULTATION_SQL).one()
+
+    steps = []
+    started = reach.get(FUNNEL_STEPS[0], 0)
+    previous = started
+    for name in FUNNEL_STEPS:
+        users = reach.get(name, 0)
+        steps.append({
+            'step': name.split(':', 1)[1],
+            'users': users,
+            'from_start': users / started if started else 0,
+            'from_previous': users / previous if previous else 0,
+            'median_seconds': dwell.get(name),
+        })
+        if name not in FUNNEL_OPTIONAL_STEPS:
+            previous = users
+    return {
+        'steps': steps,
+        'completed': completed,
+        'consultation_shown': consultation.shown,
+        'consultation_clicked': consultation.clicked,
+        'built_at': datetime.now().strftime('%d.%m.%Y %H:%M'),
+    }
+
+def get_funnel_report(force: bool = False, ttl: int = ANALYTICS_CACHE_TTL) -> dict:
+    """Воронка из кэша, если она моложе ttl секунд"""
+    cached = _cache.get('funnel')
+    if cached and not force and time.monotonic() - cached[0] < ttl:
+        return cached[1]
+    report = build_funnel_report()
+    _cache['funnel'] = (time.monotonic(), report)
+    return report
+
+def _percent(part: int, total: int) -> str:
+    return f"{part * 100 / total:.0f}%" if total else "0%"
+
+def _format_counts(counts: dict, names: dict = None, keep_order: bool = False) -> str:
+    total = sum(counts.values())
+    items = counts.items() if keep_order else sorted(counts.items(), key=lambda item: -item[1])
+    return ', '.join(
+        f"{(names or {}).get(key, key or '—')}: {value} ({_percent(value, total)})" for key, value in items
+    ) or '—'
+
+def _format_top(counts: dict, limit: int = 5) -> str:
+    items = sorted(counts.items(), key=lambda item: -item[1])[:limit]
+    return ', '.join(f"{term.lstrip('#')}: {users}" for term, users in items) or '—'
+
+def format_analytics_report(report: dict) -> str:
+    """Компактный текст сводки"""
+    retention = report['retention']
+    users = retention['users']
+    lines = [
+        f"📊 Статистика на {report['built_at']}",
+        "",
+        f"👥 Пользователей: {users}, новых за 7 дней: {retention['new_7d']}",
+        f"Пол: {_format_counts(report['sex'], {'male': 'М', 'female': 'Ж'})}",
+        f"Цели: {_format_counts(report['goals'], GOAL_NAMES)}",
+        "",
+        "🔥 Процент жира (последний замер):",
+    ]
+    for sex, bucket, count in report['bodyfat']:
+        lines.append(f"  {'М' if sex == 'male' else 'Ж'} {bucket}-{bucket + 4}%: {count}")
+    lines += [
+        "",
+        f"🚶 Шаги: {_format_counts(report['steps'])}",
+        f"🏃 Спорт: {_format_counts(report['sport'])}",
+        "",
+        f"📅 Промежутки между замерами: {_format_counts(report['gaps'], keep_order=True)}",
+        "",
+        f"🔁 Активны за 7 дней: {retention['active_7d']} ({_percent(retention['active_7d'], users)}), "
+        f"за 30 дней: {retention['active_30d']} ({_percent(retention['active_30d'], users)})",
+        f"Вернулись после анкеты: {retention['returned']} ({_percent(retention['returned'], users)})",
+        "",
+        f"🍎 Любят: {_format_top(report['food']['like'])}",
+        f"🚫 Не любят: {_format_top(report['food']['dislike'])}",
+    ]
+    return '\n'.join(lines)
+
+def format_funnel_report(report: dict) -> str:
+    """Текст воронки: шаг, дошедшие, конверсия от старта и от прошлого шага, медиана времени"""
+    lines = [f"🪜 Воронка анкеты на {report['built_at']}", ""]
+    for step in report['steps']:
+        dwell = f", медиана {step['median_seconds']:.0f} с" if step['median_seconds'] is not None else ""
+        lines.append(
+            f"{step['step']}: {step['users']} ({step['from_start'] * 100:.0f}% от старта, "
+            f"{step['from_previous'] * 100:.0f}% от прошлого шага{dwell})"
+        )
+    started = report['steps'][0]['users']
+    lines += [
+        "",
+        f"✅ Закончили анкету: {report['completed']} ({_percent(report['completed'], started)})",
+        f"💬 Консультация: показана {report['consultation_shown']}, открыта из меню "
+        f"{report['consultation_clicked']} ({_percent(report['consultation_clicked'], report['consultation_shown'])})",
+    ]
+    return '\n'.join(lines)
@@ -0,0 +1,33 @@
+import asyncio
+import logging
+from datetime import date
+
+from models.database import SessionLocal
+from crud.archive_crud import get_archive_cutoff, get_users_to_archive, archive_user_records
+from config import ARCHIVE_HORIZON_DAYS, ARCHIVE_INTERVAL_HOURS
+
+def archive_old_records(horizon_days: int = ARCHIVE_HORIZON_DAYS) -> dict:
+    """
+    Архивирует замеры старше horizon_days у всех пользователей,
+    по одной короткой транзакции на пользователя. Возвращает отчет
+    """
+    cutoff = get_archive_cutoff(date.today(), horizon_days)
+    logging.info(f"archive_old_records: cutoff={cutoff}")
+    db = SessionLocal()
+    try:
+        users = get_users_to_archive(db, cutoff)
+        records = sum(archive_user_records(db, telegram_id, cutoff) or 0 for telegram_id in users)
+    finally:
+        db.close()
+    report = {'cutoff': cutoff, 'users': len(users), 'records': records}
+    logging.info(f"archive_old_records: report={report}")
+    return report
+
+async def archive_loop(interval_hours: int = ARCHIVE_INTERVAL_HOURS):
+    """Фоновая архивация раз в interval_hours; работа с базой - в отдельном потоке"""
+    while True:
+        try:
+            await asyncio.to_thread(archive_old_records)
+        except Exception as e:
+            logging.error(f"archive_loop error: {e}")
+        await asyncio.sleep(interval_hours * 3600)
@@ -1,5 +1,23 @@
+import functools
+import json
+
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup, KeyboardButton
 
+def frozen_keyboard(builder):
+    """
+    Клавиатуры неизменяемы: строим разметку один раз при первом вызове
+    и дальше отдаем готовый JSON, который aiogram передает в API как есть.
+    Результат - str, а не InlineKeyboardMarkup: add()/row() к нему не применимы
+    """
+    @functools.wraps(builder)
+    @functools.lru_cache(maxsize=None)
+    def wrapper() -> str:
+        return json.dumps(builder().to_python(), ensure_ascii=False)
+    # wraps копирует аннотации builder: возвращаем настоящий тип результата
+    wrapper.__annotations__ = {'return': str}
+    return wrapper
+
+@frozen_keyboard
 def get_start_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура для начала анкеты"""
     keyboard = InlineKeyboardMarkup(row_width=1)
@@ -8,6 +26,7 @@ def get_start_keyboard() -> InlineKeyboardMarkup:
     )
     return keyboard
 
+@frozen_keyboard
 def get_sex_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура для выбора пола"""
     keyboard = InlineKeyboardMarkup(row_width=2)
@@ -17,6 +36,7 @@ def get_sex_keyboard() -> InlineKeyboardMarkup:
     )
     return keyboard
 
+@frozen_keyboard
 def get_steps_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура для выбора количества шагов (группировка)"""
     keyboard = InlineKeyboardMarkup(row_width=2)
@@ -33,6 +53,7 @@ def get_steps_keyboard() -> InlineKeyboardMarkup:
     )
     return keyboard
 
+@frozen_keyboard
 def get_sport_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура для выбора типа спорта (более понятные примеры)"""
     keyboard = InlineKeyboardMarkup(row_width=2)
@@ -54,6 +75,7 @@ def get_sport_keyboard() -> InlineKeyboardMarkup:
     )
     return keyboard
 
+@frozen_keyboard
 def get_frequency_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура для выбора частоты тренировок"""
     keyboard = InlineKeyboardMarkup(row_width=2)
@@ -67,6 +89,7 @@ def get_frequency_keyboard() -> InlineKeyboardMarkup:
     )
     return keyboard
 
+@frozen_keyboard
 def get_goal_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура для выбора цели"""
     keyboard = InlineKeyboardMarkup(row_width=1)
@@ -81,6 +104,7 @@ def get_goal_keyboard() -> InlineKeyboardMarkup:
     )
     return keyboard
 
+@frozen_keyboard
 def get_funnel_keyboard() -> InlineKeyboardMarkup:
     """Красивая кнопка для записи на консультацию"""
     keyboard = InlineKeyboardMarkup(row_width=1)
@@ -89,6 +113,7 @@ def get_funnel_keyboard() -> InlineKeyboardMarkup:
     )
     return keyboard
 
+@frozen_keyboard
 def get_back_keyboard() -> InlineKeyboardMarkup:
     """Кнопка назад"""
     keyboard = InlineKeyboardMarkup(row_width=1)
@@ -97,6 +122,7 @@ def get_back_keyboard() -> InlineKeyboardMarkup:
     )
     return keyboard
 
+@frozen_keyboard
 def get_confirm_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура подтверждения"""
     keyboard = InlineKeyboardMarkup(row_width=2)
@@ -106,6 +132,7 @@ def get_confirm_keyboard() -> InlineKeyboardMarkup:
     )
     return keyboard
 
+@frozen_keyboard
 def get_main_menu_inline_keyboard() -> InlineKeyboardMarkup:
     """Главное меню через inline-кнопки (обновленное)"""
     keyboard = InlineKeyboardMarkup(row_width=2)
@@ -118,6 +145,48 @@ def get_main_menu_inline_keyboard() -> InlineKeyboardMarkup:
         InlineKeyboardButton("🍎 Предпочтения", callback_data="menu_food_prefs")
     )
     keyboard.add(
+        InlineKeyboardButton("🍽 Меню на день", callback_data="menu_meal_plan"),
         InlineKeyboardButton("💬 Консультация", callback_data="menu_consultation")
     )
-    return keyboard 
\ No newline at end of file
+    return keyboard
+
+@frozen_keyboard
+def get_progress_metrics_keyboard() -> InlineKeyboardMarkup:
+    """Выбор метрик для графика прогресса"""
+    keyboard = InlineKeyboardMarkup(row_width=3)
+    keyboard.add(
+        InlineKeyboardButton("⚖️ Вес", callback_data="progress_weight"),
+        InlineKeyboardButton("🔥 Жир", callback_data="progress_bodyfat"),
+        InlineKeyboardButton("📐 Обхваты", callback_data="progress_girths")
+    )
+    keyboard.add(
+        InlineKeyboardButton("📊 Все метрики", callback_data="progress_all")
+    )
+    return keyboard
+
+@frozen_keyboard
+def get_edit_preferences_keyboard() -> InlineKeyboardMarkup:
+    """Редактирование или отмена пищевых предпочтений"""
+    keyboard = InlineKeyboardMarkup(row_width=2)
+    keyboard.add(
+        InlineKeyboardButton("✏️ Редактировать", callback_data="edit_preferences"),
+        InlineKeyboardButton("❌ Отмена", callback_data="cancel_preferences")
+    )
+    return keyboard
+
+@frozen_keyboard
+def get_consultation_keyboard() -> InlineKeyboardMarkup:
+    """Кнопка связи со специалистом"""
+    keyboard = InlineKeyboardMarkup(row_width=1)
+    keyboard.add(
+        InlineKeyboardButton("💬 Написать специалисту", url="https://t.me/dryuzefovna")
+    )
+    return keyboard
+
+def get_meal_plan_keyboard(variant: int) -> InlineKeyboardMarkup:
+    """Другой вариант меню (номер варианта в callback_data, поэтому не frozen)"""
+    keyboard = InlineKeyboardMarkup(row_width=1)
+    keyboard.add(
+        InlineKeyboardButton("🔄 Другое меню", callback_data=f"plan_next_{variant + 1}")
+    )
+    return keyboard
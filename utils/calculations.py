@@ -1,39 +1,57 @@
 import math
 import logging
+from collections import OrderedDict
 
-def calculate_bodyfat(user_data: dict):
+def navy_bodyfat(sex: str, waist: float, neck: float, hip: float, height: float):
     """
-    Расчёт % жира по методу US Navy
+    Формула US Navy без логирования - для массовых расчетов (импорт истории)
     """
-    logging.info(f"calculate_bodyfat: input={user_data}")
-    sex = user_data.get('sex')
-    waist = user_data.get('waist')
-    neck = user_data.get('neck')
-    hip = user_data.get('hip')
-    height = user_data.get('height')
-    
     if sex == 'male':
-        if not all([waist, neck, height]):
+        if not all([waist, neck, height]) or waist <= neck:
             return None
         bodyfat = 86.010 * math.log10(waist - neck) - 70.041 * math.log10(height) + 36.76
     else:  # female
-        if not all([waist, neck, hip, height]):
+        if not all([waist, neck, hip, height]) or waist + hip <= neck:
             return None
         bodyfat = 163.205 * math.log10(waist + hip - neck) - 97.684 * math.log10(height) - 78.387
-    
-    logging.info(f"calculate_bodyfat: result={bodyfat}")
     return round(max(0, min(100, bodyfat)), 1)
 
-def calculate_kbju(user_data: dict, bodyfat: float):
+def calculate_bodyfat(user_data: dict):
     """
-    Расчёт КБЖУ по методу Katch-McArdle
+    Расчёт % жира по методу US Navy
+    """
+    logging.info(f"calculate_bodyfat: input={user_data}")
+    bodyfat = navy_bodyfat(
+        user_data.get('sex'),
+        user_data.get('waist'),
+        user_data.get('neck'),
+        user_data.get('hip'),
+        user_data.get('height')
+    )
+    logging.info(f"calculate_bodyfat: result={bodyfat}")
+    return bodyfat
+
+# Версия формул расчетных колонок user_records (процент жира, КБЖУ).
+# При изменении формул увеличить: записи пересчитаются при следующем чтении
+FORMULA_VERSION = 1
+
+SPORT_CALORIES = {
+    'none': 0,
+    'walking': 200,
+    'running': 400,
+    'strength': 600,
+    'yoga': 200,
+    'swimming': 400,
+    'cycling': 300,
+    'team': 500
+}
+
+GOALS = ('healthy', 'athletic', 'lean')
+
+def katch_mcardle_tdee(weight: float, bodyfat: float, step_multiplier: float, sport_type: str):
+    """
+    Суточный расход энергии (TDEE) по Katch-McArdle - общая часть расчета для всех целей
     """
-    logging.info(f"calculate_kbju: input={user_data}, bodyfat={bodyfat}")
-    weight = user_data.get('weight')
-    step_multiplier = user_data.get('step_multiplier', 1.2)  # значение по умолчанию
-    sport_type = user_data.get('sport_type', 'none')
-    goal = user_data.get('goal', 'healthy')
-    
     if not weight or not bodyfat:
         return None
     
@@ -44,21 +62,15 @@ def calculate_kbju(user_data: dict, bodyfat: float):
     bmr = 370 + 21.6 * lbm
     
     # 3. Спортивный коэффициент
-    sport_coefficients = {
-        'none': 0,
-        'walking': 200,
-        'running': 400,
-        'strength': 600,
-        'yoga': 200,
-        'swimming': 400,
-        'cycling': 300,
-        'team': 500
-    }
-    sport_calories = sport_coefficients.get(sport_type.lower(), 0)
+    sport_calories = SPORT_CALORIES.get(sport_type.lower(), 0)
     
     # 4. TDEE = BMR * шаговый множитель + спорт коэффициент
-    tdee = bmr * step_multiplier + sport_calories
-    
+    return bmr * step_multiplier + sport_calories
+
+def goal_kbju(tdee: float, weight: float, bodyfat: float, goal: str):
+    """
+    КБЖУ под цель из уже посчитанного TDEE
+    """
     # 5. По цели
     if goal == 'healthy':
         calories = tdee
@@ -77,7 +89,6 @@ def calculate_kbju(user_data: dict, bodyfat: float):
     fat_g = calories * 0.25 / 9  # 25% жиры
     carbs_g = max(100, (calories - protein_g * 4 - fat_g * 9) / 4)  # углеводы ≥ 100 г
     
-    logging.info(f"calculate_kbju: result={{'calories': round(calories), 'protein': round(protein_g), 'fat': round(fat_g), 'carbs': round(carbs_g)}}")
     return {
         'calories': round(calories),
         'protein': round(protein_g),
@@ -85,6 +96,92 @@ def calculate_kbju(user_data: dict, bodyfat: float):
         'carbs': round(carbs_g)
     }
 
+def katch_mcardle_kbju(weight: float, bodyfat: float, step_multiplier: float, sport_type: str, goal: str):
+    """
+    Формула Katch-McArdle без логирования - для массовых расчетов
+    """
+    tdee = katch_mcardle_tdee(weight, bodyfat, step_multiplier, sport_type)
+    if tdee is None:
+        return None
+    return goal_kbju(tdee, weight, bodyfat, goal)
+
+def calculate_all_goals_kbju(weight: float, bodyfat: float, step_multiplier: float, sport_type: str) -> dict:
+    """
+    КБЖУ сразу для всех целей: TDEE считается один раз. goal -> КБЖУ или None
+    """
+    tdee = katch_mcardle_tdee(weight, bodyfat, step_multiplier, sport_type)
+    if tdee is None:
+        return {goal: None for goal in GOALS}
+    return {goal: goal_kbju(tdee, weight, bodyfat, goal) for goal in GOALS}
+
+# Сравнение целей по последней записи пользователя: telegram_id -> (версия записи, КБЖУ по целям)
+_goal_comparison_cache = OrderedDict()
+GOAL_COMPARISON_CACHE_SIZE = 1000
+
+def get_goal_comparison(telegram_id: int, record, bodyfat: float) -> dict:
+    """
+    КБЖУ всех целей для последней записи. Пересчитывается, только когда запись
+    изменилась (новые замеры, пересчет формул), иначе берется из кэша
+    """
+    step_multiplier = record.step_multiplier or calculate_step_multiplier(record.steps)
+    version = (record.id, record.date, record.weight, bodyfat, step_multiplier, record.sport_type, FORMULA_VERSION)
+    cached = _goal_comparison_cache.get(telegram_id)
+    if cached and cached[0] == version:
+        _goal_comparison_cache.move_to_end(telegram_id)
+        return cached[1]
+
+    logging.info(f"get_goal_comparison: telegram_id={telegram_id}, record id={record.id}")
+    goals_kbju = calculate_all_goals_kbju(record.weight, bodyfat, step_multiplier, record.sport_type or 'none')
+    _goal_comparison_cache[telegram_id] = (version, goals_kbju)
+    _goal_comparison_cache.move_to_end(telegram_id)
+    while len(_goal_comparison_cache) > GOAL_COMPARISON_CACHE_SIZE:
+        _goal_comparison_cache.popitem(last=False)
+    return goals_kbju
+
+def calculate_kbju(user_data: dict, bodyfat: float):
+    """
+    Расчёт КБЖУ по методу Katch-McArdle
+    """
+    logging.info(f"calculate_kbju: input={user_data}, bodyfat={bodyfat}")
+    kbju = katch_mcardle_kbju(
+        user_data.get('weight'),
+        bodyfat,
+        user_data.get('step_multiplier', 1.2),  # значение по умолчанию
+        user_data.get('sport_type', 'none'),
+        user_data.get('goal', 'healthy')
+    )
+    logging.info(f"calculate_kbju: result={kbju}")
+    return kbju
+
+def get_record_targets(bodyfat: float, kbju: dict) -> dict:
+    """Расчетные колонки записи из уже посчитанных процента жира и КБЖУ"""
+    kbju = kbju or {}
+    return {
+        'bodyfat': bodyfat,
+        'calories': kbju.get('calories'),
+        'protein': kbju.get('protein'),
+        'fat': kbju.get('fat'),
+        'carbs': kbju.get('carbs'),
+        'formula_version': FORMULA_VERSION
+    }
+
+def calculate_record_targets(sex: str, record: dict) -> dict:
+    """
+    Расчетные колонки записи по ее замерам и активности: процент жира
+    (если обхватов нет - тот, что уже в записи) и КБЖУ под цель записи
+    """
+    bodyfat = navy_bodyfat(
+        sex, record.get('waist'), record.get('neck'), record.get('hip'), record.get('height')
+    ) or record.get('bodyfat')
+    kbju = katch_mcardle_kbju(
+        record.get('weight'),
+        bodyfat,
+        record.get('step_multiplier') or 1.2,
+        record.get('sport_type') or 'none',
+        record.get('goal') or 'healthy'
+    )
+    return get_record_targets(bodyfat, kbju)
+
 def calculate_step_multiplier(steps: str):
     """
     Расчёт множителя активности по шагам
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from aiogram import types
+from aiogram.dispatcher.middlewares import BaseMiddleware
+from sqlalchemy import insert
+
+from config import EVENTS_ENABLED, EVENTS_FLUSH_SECONDS, EVENTS_BUFFER_LIMIT
+from models.database import SessionLocal
+from models.tables import Event
+
+# Журнал событий для воронок: обработчик только добавляет кортеж в буфер в памяти,
+# фоновая задача раз в EVENTS_FLUSH_SECONDS пишет накопленное одной вставкой в отдельном
+# потоке. При остановке бота буфер дописывается; при падении теряются последние секунды -
+# для аналитики это допустимо
+
+# Состояние "без состояния" в журнале
+NO_STATE = 'none'
+
+class EventLog:
+    """Буфер событий и его фоновый сброс в таблицу events"""
+
+    def __init__(self, session_factory=SessionLocal, flush_seconds: float = EVENTS_FLUSH_SECONDS,
+                 limit: int = EVENTS_BUFFER_LIMIT):
+        self.session_factory = session_factory
+        self.flush_seconds = flush_seconds
+        self._buffer = deque(maxlen=limit)
+        self._task = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='events')
+        self.written = 0
+        self.dropped = 0
+
+    def track(self, telegram_id: int, kind: str, name: str):
+        """Добавить событие в буфер; без ожиданий и запросов к базе"""
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+        self._buffer.append({'telegram_id': telegram_id, 'ts': time.time(), 'kind': kind, 'name': name})
+
+    def start(self):
+        """Запустить фоновый сброс в текущем event loop"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+            logging.info(f"EventLog: started, flush every {self.flush_seconds}s")
+
+    async def stop(self):
+        """Остановить фоновый сброс и дописать буфер"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+        logging.info(f"EventLog: stopped, written={self.written}, dropped={self.dropped}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            await self.flush()
+
+    async def flush(self):
+        """Записать все, что накопилось, одной вставкой"""
+        if not self._buffer:
+            return
+        rows = list(self._buffer)
+        self._buffer.clear()
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._write, rows)
+
+    def _write(self, rows: list):
+        db = self.session_factory()
+        try:
+            db.execute(insert(Event.__table__), rows)
+            db.commit()
+            self.written += len(rows)
+        except Exception as e:
+            logging.error(f"EventLog: can't write {len(rows)} events: {e}")
+            db.rollback()
+            self.dropped += len(rows)
+        finally:
+            db.close()
+
+event_log = EventLog()
+
+def track(telegram_id: int, kind: str, name: str):
+    """Записать событие в журнал воронок (если журнал включен)"""
+    if EVENTS_ENABLED:
+        event_log.track(telegram_id, kind, name)
+
+class EventsMiddleware(BaseMiddleware):
+    """Пишет в журнал нажатия кнопок и смену FSM-состояния после каждого обработчика"""
+
+    async def _get_state(self, chat_id: int, user_id: int):
+        return await self.manager.dispatcher.storage.get_state(chat=chat_id, user=user_id)
+
+    async def _remember_state(self, chat_id: int, user_id: int, data: dict):
+        data['events_state'] = await self._get_state(chat_id, user_id)
+
+    async def _track_state_change(self, chat_id: int, user_id: int, data: dict):
+        if 'events_state' not in data:
+            return
+        old_state = data.pop('events_state')
+        new_state = await self._get_state(chat_id, user_id)
+        if new_state != old_state:
+            track(user_id, 'state', new_state or NO_STATE)
+
+    async def on_pre_process_message(self, message: types.Message, data: dict):
+        await self._remember_state(message.chat.id, message.from_user.id, data)
+
+    async def on_post_process_message(self, message: types.Message, results, data: dict):
+        await self._track_state_change(message.chat.id, message.from_user.id, data)
+
+    async def on_pre_process_callback_query(self, callback: types.CallbackQuery, data: dict):
+        track(callback.from_user.id, 'click', callback.data)
+        chat_id = callback.message.chat.id if callback.message else callback.from_user.id
+        await self._remember_state(chat_id, callback.from_user.id, data)
+
+    async def on_post_process_callback_query(self, callback: types.CallbackQuery, results, data: dict):
+        chat_id = callback.message.chat.id if callback.message else callback.from_user.id
+        await self._track_state_change(chat_id, callback.from_user.id, data)
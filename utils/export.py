@@ -0,0 +1,59 @@
+import csv
+import io
+import logging
+import tempfile
+
+from models.database import SessionLocal
+from crud.record_crud import iter_user_records
+from utils.jobs import run_job
+
+# Колонки выгрузки; этот же формат принимает импорт истории
+EXPORT_COLUMNS = (
+    'date', 'weight', 'waist', 'neck', 'hip', 'bodyfat',
+    'height', 'goal', 'steps', 'sport_type', 'sport_freq'
+)
+
+# До 1 МБ файл живет в памяти, дальше SpooledTemporaryFile сам уходит на диск
+EXPORT_SPOOL_SIZE = 1024 * 1024
+EXPORT_BATCH_SIZE = 500
+
+def write_records_csv(telegram_id: int):
+    """
+    Пишет историю замеров в CSV пачками прямо из курсора.
+    Возвращает файловый объект, перемотанный в начало
+    """
+    logging.info(f"write_records_csv: telegram_id={telegram_id}")
+    buffer = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE, mode='w+b')
+    # CSV пачки собирается в строку и дописывается байтами: TextIOWrapper поверх
+    # SpooledTemporaryFile работает только с Python 3.11
+    chunk = io.StringIO()
+    writer = csv.writer(chunk)
+    writer.writerow(EXPORT_COLUMNS)
+    # utf-8-sig (BOM в начале файла), чтобы Excel сразу открыл кириллицу
+    encoding = 'utf-8-sig'
+
+    db = SessionLocal()
+    try:
+        rows = 0
+        for row in iter_user_records(db, telegram_id, EXPORT_COLUMNS, EXPORT_BATCH_SIZE):
+            writer.writerow(row)
+            rows += 1
+            if rows % EXPORT_BATCH_SIZE == 0:
+                buffer.write(chunk.getvalue().encode(encoding))
+                encoding = 'utf-8'
+                chunk.seek(0)
+                chunk.truncate()
+        buffer.write(chunk.getvalue().encode(encoding))
+    except Exception:
+        buffer.close()
+        raise
+    finally:
+        db.close()
+
+    buffer.seek(0)
+    logging.info(f"write_records_csv: telegram_id={telegram_id}, rows={rows}")
+    return buffer
+
+async def export_records_csv(telegram_id: int):
+    """Поставить выгрузку в пул задач и дождаться готового файла"""
+    return await run_job(write_records_csv, telegram_id)
@@ -0,0 +1,206 @@
+import re
+
+# Нормализация пищевых предпочтений в термины: нижний регистр, ё -> е, слова без
+# стоп-слов, стемминг (Snowball для русского языка), свертка синонимов к одному
+# названию продукта и категории продукта ('#молочное'). Один и тот же нормализатор
+# разбирает и то, что пишет пользователь, и поисковые запросы по предпочтениям
+
+_VOWELS = 'аеиоуыэюя'
+
+_PERFECTIVE_GERUND = (('в', 'вши', 'вшись'), ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'))
+_ADJECTIVE = (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем', 'им', 'ым', 'ом',
+    'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю', 'ая', 'яя', 'ою', 'ею'
+)
+_PARTICIPLE = (('ем', 'нн', 'вш', 'ющ', 'щ'), ('ивш', 'ывш', 'ующ'))
+_REFLEXIVE = ('ся', 'сь')
+_VERB = (
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет', 'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй', 'ил', 'ыл', 'им', 'ым', 'ен',
+     'ило', 'ыло', 'ено', 'ят', 'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю')
+)
+_NOUN = (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и', 'ией', 'ей', 'ой', 'ий', 'й',
+    'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья', 'я'
+)
+_SUPERLATIVE = ('ейше', 'ейш')
+_DERIVATIONAL = ('ость', 'ост')
+
+def _strip(word: str, endings, start: int, after_a: bool = False):
+    """Отрезать самое длинное окончание из endings, не залезая левее start; None - не нашлось"""
+    for ending in sorted(endings, key=len, reverse=True):
+        if not word.endswith(ending):
+            continue
+        rest = word[:-len(ending)]
+        if len(rest) < start:
+            continue
+        # а/я перед окончанием остается в слове, но тоже должна быть в RV
+        if after_a and (len(rest) <= start or rest[-1] not in 'ая'):
+            continue
+        return rest
+    return None
+
+def _strip_group(word: str, groups: tuple, start: int):
+    """Группа 1 окончаний - только после а/я, группа 2 - в любом месте"""
+    candidates = [rest for rest in (_strip(word, groups[0], start, after_a=True), _strip(word, groups[1], start)) if rest is not None]
+    return min(candidates, key=len) if candidates else None
+
+def _region_after_vowel(word: str, start: int = 0) -> int:
+    for i in range(start, len(word)):
+        if word[i] in _VOWELS:
+            return i + 1
+    return len(word)
+
+def _r1(word: str, start: int = 0) -> int:
+    """Начало R1: после первой согласной, которая идет за гласной"""
+    for i in range(start + 1, len(word)):
+        if word[i] not in _VOWELS and word[i - 1] in _VOWELS:
+            return i + 1
+    return len(word)
+
+def stem(word: str) -> str:
+    """Основа русского слова по алгоритму Snowball (Porter)"""
+    rv = _region_after_vowel(word)
+    if rv >= len(word):
+        return word
+    r2 = _r1(word, _r1(word))
+
+    # Шаг 1: деепричастие; иначе возвратность, затем прилагательное/причастие, глагол или существительное
+    rest = _strip_group(word, _PERFECTIVE_GERUND, rv)
+    if rest is None:
+        word = _strip(word, _REFLEXIVE, rv) or word
+        rest = _strip(word, _ADJECTIVE, rv)
+        if rest is not None:
+            rest = _strip_group(rest, _PARTICIPLE, rv) or rest
+        else:
+            rest = _strip_group(word, _VERB, rv)
+            if rest is None:
+                rest = _strip(word, _NOUN, rv)
+    word = rest if rest is not None else word
+
+    # Шаг 2: и на конце
+    if word.endswith('и') and len(word) - 1 >= rv:
+        word = word[:-1]
+    # Шаг 3: словообразовательные суффиксы в R2
+    word = _strip(word, _DERIVATIONAL, r2) or word
+    # Шаг 4: превосходная степень, двойное н, мягкий знак
+    word = _strip(word, _SUPERLATIVE, rv) or word
+    if word.endswith('нн'):
+        word = word[:-1]
+    elif word.endswith('ь'):
+        word = word[:-1]
+    return word
+
+# Слова, которые ничего не говорят о продукте
+STOP_WORDS = {
+    'и', 'или', 'а', 'но', 'не', 'ни', 'нет', 'да', 'в', 'во', 'на', 'с', 'со', 'без', 'из', 'к', 'по', 'для',
+    'очень', 'все', 'всё', 'всякие', 'разные', 'любые', 'люблю', 'любит', 'нравится', 'нравятся', 'обожаю',
+    'ем', 'есть', 'кушаю', 'могу', 'можно', 'нельзя', 'особенно', 'например', 'какие', 'так', 'же', 'тоже',
+    'еще', 'ещё', 'почти', 'только', 'кроме', 'мне', 'я', 'это', 'виде', 'блюда', 'продукты', 'еда', 'вообще'
+}
+
+# Синонимы: название продукта -> как его еще пишут
+FOOD_SYNONYMS = {
+    'курица': ('курица', 'курочка', 'куриный', 'куриное', 'цыпленок', 'цыплята', 'курятина', 'chicken'),
+    'говядина': ('говядина', 'говяжий', 'телятина', 'beef'),
+    'свинина': ('свинина', 'свиной', 'pork'),
+    'индейка': ('индейка', 'индюшатина'),
+    'баранина': ('баранина', 'ягнятина'),
+    'рыба': ('рыба', 'рыбный', 'fish'),
+    'лосось': ('лосось', 'семга', 'форель', 'горбуша', 'кета'),
+    'тунец': ('тунец',),
+    'креветки': ('креветки', 'креветка'),
+    'молоко': ('молоко', 'молочко', 'milk'),
+    'творог': ('творог', 'творожок', 'творожный'),
+    'сыр': ('сыр', 'сырок', 'сыры', 'cheese'),
+    'кефир': ('кефир', 'ряженка', 'айран', 'тан'),
+    'йогурт': ('йогурт', 'йогурты', 'yogurt'),
+    'сметана': ('сметана',),
+    'яйца': ('яйца', 'яйцо', 'яичница', 'омлет', 'eggs'),
+    'гречка': ('гречка', 'гречневая', 'греча'),
+    'рис': ('рис', 'рисовая', 'rice'),
+    'овсянка': ('овсянка', 'овсяная', 'овсяные', 'геркулес'),
+    'макароны': ('макароны', 'паста', 'спагетти'),
+    'хлеб': ('хлеб', 'хлебцы', 'батон'),
+    'картофель': ('картофель', 'картошка', 'картофельное', 'пюре'),
+    'грибы': ('грибы', 'грибной', 'шампиньоны'),
+    'орехи': ('орехи', 'орешки', 'арахис', 'миндаль', 'фундук', 'кешью', 'грецкие', 'nuts'),
+    'бобовые': ('фасоль', 'горох', 'чечевица', 'нут', 'бобовые'),
+    'сладкое': ('сладкое', 'сладости', 'конфеты', 'шоколад', 'торты', 'пирожные', 'десерты', 'сахар'),
+    'острое': ('острое', 'острые', 'перец', 'чили'),
+    'морепродукты': ('морепродукты', 'кальмары', 'мидии', 'осьминог', 'seafood'),
+    'овощи': ('овощи', 'овощной', 'vegetables'),
+    'фрукты': ('фрукты', 'фруктовый', 'fruits'),
+    'ягоды': ('ягоды', 'клубника', 'малина', 'черника', 'голубика', 'смородина'),
+    'мясо': ('мясо', 'мясной', 'meat'),
+}
+
+# Категории: термин '#категория' добавляется к каждому продукту категории
+FOOD_CATEGORIES = {
+    '#молочное': ('молоко', 'творог', 'сыр', 'кефир', 'йогурт', 'сметана'),
+    '#мясо': ('мясо', 'курица', 'говядина', 'свинина', 'индейка', 'баранина'),
+    '#рыба': ('рыба', 'лосось', 'тунец'),
+    '#морепродукты': ('морепродукты', 'креветки'),
+    '#крупы': ('гречка', 'рис', 'овсянка'),
+    '#овощи': ('овощи', 'картофель', 'грибы', 'бобовые', 'огурцы', 'помидоры', 'капуста', 'морковь', 'брокколи', 'кабачки'),
+    '#фрукты': ('фрукты', 'ягоды', 'яблоки', 'бананы', 'апельсины', 'груши', 'мандарины', 'киви', 'виноград'),
+    '#орехи': ('орехи',),
+    '#сладкое': ('сладкое',),
+    '#острое': ('острое',),
+}
+
+# Слова, которые называют саму категорию ("не ем молочку", запрос "dairy")
+CATEGORY_ALIASES = {
+    '#молочное': ('молочка', 'молочное', 'молочные', 'молочный', 'dairy'),
+    '#крупы': ('крупы', 'каши', 'каша', 'злаки'),
+    '#мясо': ('meat',),
+    '#рыба': ('fish',),
+    '#морепродукты': ('seafood',),
+}
+
+def _build_lookup():
+    """Основа слова -> термин и термин -> категории"""
+    synonyms = {}
+    for product, variants in FOOD_SYNONYMS.items():
+        for variant in variants:
+            synonyms[stem(variant)] = product
+    for category, aliases in CATEGORY_ALIASES.items():
+        for alias in aliases:
+            synonyms.setdefault(stem(alias), category)
+    categories = {}
+    for category, products in FOOD_CATEGORIES.items():
+        for product in products:
+            # Продукт без синонимов хранится основой, как любое незнакомое слово
+            term = product if product in FOOD_SYNONYMS else stem(product)
+            categories.setdefault(term, set()).add(category)
+    return synonyms, categories
+
+_SYNONYMS, _CATEGORIES = _build_lookup()
+
+_WORD_RE = re.compile(r'[a-zа-я]+')
+MIN_WORD_LENGTH = 3
+
+def normalize_food_text(text: str) -> set:
+    """
+    Термины из свободного текста: названия продуктов (после свертки синонимов),
+    основы незнакомых слов и категории '#...'
+    """
+    terms = set()
+    if not text:
+        return terms
+    for word in _WORD_RE.findall(text.lower().replace('ё', 'е')):
+        if word in STOP_WORDS or len(word) < MIN_WORD_LENGTH:
+            continue
+        key = stem(word)
+        term = _SYNONYMS.get(key, key)
+        terms.add(term)
+        terms.update(_CATEGORIES.get(term, ()))
+    return terms
+
+def normalize_food_query(query: str) -> str:
+    """Поисковый запрос к предпочтениям - тот же термин, что получился бы из текста пользователя"""
+    query = query.strip().lower().replace('ё', 'е')
+    if query.startswith('#'):
+        return query
+    key = stem(query)
+    return _SYNONYMS.get(key, key)
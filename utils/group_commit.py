@@ -0,0 +1,186 @@
+import asyncio
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from models.database import SessionLocal
+from config import GROUP_COMMIT_MAX_BATCH, GROUP_COMMIT_MAX_DELAY_MS
+
+# Group commit: обработчики не коммитят сами, а отдают намерение записи одному писателю.
+# Писатель копит намерения до GROUP_COMMIT_MAX_BATCH штук или GROUP_COMMIT_MAX_DELAY_MS
+# и фиксирует их одной транзакцией - один fsync на пачку вместо одного на запись.
+# Каждое намерение выполняется в своем savepoint: ошибка одного не откатывает остальные
+
+class GroupCommitWriter:
+    """Единственный писатель: очередь намерений, пачки, одна транзакция на пачку"""
+
+    def __init__(self, session_factory=SessionLocal, max_batch: int = GROUP_COMMIT_MAX_BATCH,
+                 max_delay_ms: int = GROUP_COMMIT_MAX_DELAY_MS):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self.commits = 0
+        self.writes = 0
+        self._last_batch = 0
+        self._queue = None
+        self._task = None
+        # Транзакции выполняются в отдельном потоке, чтобы не блокировать event loop
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='group-commit')
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Запустить писателя в текущем event loop"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logging.info(f"GroupCommitWriter: started, max_batch={self.max_batch}, max_delay={self.max_delay}s")
+
+    async def stop(self):
+        """Дописать то, что уже в очереди, и остановиться"""
+        if not self.running:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+        logging.info(f"GroupCommitWriter: stopped, commits={self.commits}, writes={self.writes}")
+
+    async def submit(self, func, *args, **kwargs):
+        """
+        Поставить запись в очередь и дождаться ее результата.
+        func - crud-функция с параметрами (db, ..., commit=False)
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((future, func, args, kwargs))
+        return await future
+
+    async def _collect(self, first) -> list:
+        """
+        Пачка: первое намерение, все уже накопившиеся и те, что успеют прийти за max_delay.
+        Ждем добора только под нагрузкой (прошлая пачка была больше одной записи),
+        чтобы одиночная запись не теряла max_delay впустую
+        """
+        batch = [first]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (self.max_delay if self._last_batch > 1 else 0)
+        while len(batch) < self.max_batch:
+            if not self._queue.empty():
+                item = self._queue.get_nowait()
+            else:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            if item is None:
+                # Остановка: дописываем пачку, потом выходим
+                self._queue.put_nowait(None)
+                break
+            batch.append(item)
+        self._last_batch = len(batch)
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            first = await self._queue.get()
+            if first is None:
+                return
+            batch = await self._collect(first)
+            try:
+                results = await loop.run_in_executor(self._executor, self._commit_batch, batch)
+            except Exception as e:
+                logging.error(f"GroupCommitWriter: batch of {len(batch)} failed, writing one by one: {e}")
+                results = await loop.run_in_executor(self._executor, self._write_each, batch)
+            for (future, *_), (ok, value) in zip(batch, results):
+                if future.done():
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+    def _commit_batch(self, batch: list) -> list:
+        """Все намерения пачки в одной транзакции, каждое в своем savepoint"""
+        db = self.session_factory(expire_on_commit=False)
+        try:
+            if db.get_bind().dialect.name == 'sqlite':
+                # pysqlite сам не открывает транзакцию перед SAVEPOINT, и RELEASE внешнего
+                # savepoint закоммитил бы его. Открываем ее явно и сразу берем блокировку записи
+                db.connection().exec_driver_sql("BEGIN IMMEDIATE")
+            results = []
+            for _, func, args, kwargs in batch:
+                try:
+                    with db.begin_nested():
+                        results.append((True, func(db, *args, commit=False, **kwargs)))
+                except Exception as e:
+                    logging.error(f"GroupCommitWriter: {func.__name__} failed: {e}")
+                    results.append((False, e))
+            db.commit()
+            self.commits += 1
+            self.writes += len(batch)
+            return results
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _write_each(self, batch: list) -> list:
+        """Запасной путь: каждое намерение своей транзакцией, как без group commit"""
+        results = []
+        for _, func, args, kwargs in batch:
+            db = self.session_factory(expire_on_commit=False)
+            try:
+                results.append((True, func(db, *args, **kwargs)))
+                self.commits += 1
+                self.writes += 1
+            except Exception as e:
+                results.append((False, e))
+            finally:
+                db.close()
+        return results
+
+writer = GroupCommitWriter()
+
+def _write_now(func, args, kwargs):
+    db = SessionLocal(expire_on_commit=False)
+    try:
+        return func(db, *args, **kwargs)
+    finally:
+        db.close()
+
+async def write(func, *args, **kwargs):
+    """
+    Запись из обработчика: через писателя, если он запущен, иначе сразу своей транзакцией.
+    Без писателя запись идет в пуле потоков: ожидание блокировки SQLite (busy_timeout
+    и повторы retry_on_locked) не останавливает event loop. Контекст копируется, чтобы
+    запросы считались в статистике обновления. Возвращает то же, что вернула бы func
+    """
+    if writer.running:
+        return await writer.submit(func, *args, **kwargs)
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(None, context.run, _write_now, func, args, kwargs)
+
+# Ссылки на фоновые записи, чтобы задачи не собрал сборщик мусора
+_background_writes = set()
+
+def write_later(func, *args, **kwargs):
+    """
+    Запись в фоне, без ожидания результата: для того, что обработчик может не дожидаться
+    (сохранить пересчитанное при чтении). Ошибка только пишется в лог
+    """
+    async def run():
+        try:
+            await write(func, *args, **kwargs)
+        except Exception as e:
+            logging.error(f"write_later: {func.__name__} failed: {e}")
+    task = asyncio.get_running_loop().create_task(run())
+    _background_writes.add(task)
+    task.add_done_callback(_background_writes.discard)
+    return task
@@ -0,0 +1,127 @@
+import csv
+import io
+import logging
+from datetime import date, datetime
+
+from models.database import SessionLocal
+from crud.user_crud import get_user
+from crud.record_crud import get_latest_record, bulk_upsert_records
+from utils.calculations import calculate_record_targets, calculate_step_multiplier
+from utils.validators import (
+    validate_weight, validate_height, validate_waist_measurement,
+    validate_neck_measurement, validate_hip_measurement
+)
+from utils.jobs import run_job
+
+# Размер файла, который принимаем (Telegram отдает ботам файлы до 20 МБ)
+IMPORT_MAX_FILE_SIZE = 2 * 1024 * 1024
+IMPORT_BATCH_SIZE = 500
+# Сколько ошибок показывать пользователю
+IMPORT_ERRORS_SHOWN = 5
+
+# Колонки, которые копируются из последней записи, если их нет в файле
+CARRIED_COLUMNS = ('height', 'goal', 'steps', 'sport_type', 'sport_freq', 'step_multiplier')
+
+GIRTH_VALIDATORS = {
+    'waist': (validate_waist_measurement, "талия должна быть от 50 до 200 см"),
+    'neck': (validate_neck_measurement, "шея должна быть от 20 до 100 см"),
+    'hip': (validate_hip_measurement, "бёдра должны быть от 50 до 200 см"),
+}
+
+def _parse_date(value: str):
+    """Дата в формате ГГГГ-ММ-ДД (как в выгрузке) или ДД.ММ.ГГГГ"""
+    for fmt in ('%Y-%m-%d', '%d.%m.%Y'):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+def parse_history_row(raw: dict, defaults: dict):
+    """
+    Проверка одной строки файла по тем же правилам, что и ручной ввод.
+    Возвращает (данные, None) или (None, текст ошибки)
+    """
+    values = {key.strip().lower(): (value or '').strip().replace(',', '.') for key, value in raw.items() if key}
+
+    record_date = _parse_date(values.get('date', ''))
+    if not record_date:
+        return None, "дата должна быть в формате ГГГГ-ММ-ДД или ДД.ММ.ГГГГ"
+    if record_date > date.today():
+        return None, "дата в будущем"
+
+    if not validate_weight(values.get('weight', '')):
+        return None, "вес должен быть от 30 до 300 кг"
+    row = {'date': record_date, 'weight': float(values['weight'])}
+
+    for column, (validator, error) in GIRTH_VALIDATORS.items():
+        if values.get(column):
+            if not validator(values[column]):
+                return None, error
+            row[column] = float(values[column])
+
+    if values.get('height'):
+        height = values['height'].split('.')[0]
+        if not validate_height(height):
+            return None, "рост должен быть от 100 до 250 см"
+        row['height'] = int(height)
+
+    for column in ('goal', 'steps', 'sport_type', 'sport_freq'):
+        if values.get(column):
+            row[column] = values[column]
+
+    for column in CARRIED_COLUMNS:
+        if column not in row:
+            row[column] = defaults.get(column)
+    if 'steps' in values and values['steps']:
+        row['step_multiplier'] = calculate_step_multiplier(row['steps'])
+    return row, None
+
+def import_history_csv(telegram_id: int, file) -> dict:
+    """
+    Построчно читает CSV, проверяет строки и пачками записывает принятые.
+    Процент жира считается для всех строк сразу по формуле US Navy.
+    Возвращает отчет: сколько принято, сколько отклонено и первые ошибки
+    """
+    logging.info(f"import_history_csv: telegram_id={telegram_id}")
+    db = SessionLocal()
+    try:
+        user = get_user(db, telegram_id)
+        latest_record = get_latest_record(db, telegram_id)
+        defaults = {column: getattr(latest_record, column) for column in CARRIED_COLUMNS} if latest_record else {}
+
+        # Одна дата - одна запись: при повторе в файле побеждает последняя строка
+        rows = {}
+        rejected = 0
+        errors = []
+        reader = csv.DictReader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+        header = [name.strip().lower() for name in reader.fieldnames or []]
+        if 'date' not in header or 'weight' not in header:
+            return {'accepted': 0, 'rejected': 0, 'errors': ["в первой строке нужны колонки date и weight"]}
+        for raw in reader:
+            row, error = parse_history_row(raw, defaults)
+            if error:
+                rejected += 1
+                if len(errors) < IMPORT_ERRORS_SHOWN:
+                    errors.append(f"строка {reader.line_num}: {error}")
+                continue
+            rows[row['date']] = row
+
+        for row in rows.values():
+            row.update(calculate_record_targets(user.sex, row))
+
+        saved = bulk_upsert_records(db, telegram_id, list(rows.values()), IMPORT_BATCH_SIZE)
+    finally:
+        db.close()
+
+    report = {
+        'accepted': saved,
+        'rejected': rejected + len(rows) - saved,
+        'errors': errors,
+    }
+    logging.info(f"import_history_csv: telegram_id={telegram_id}, report={report}")
+    return report
+
+async def import_history(telegram_id: int, file) -> dict:
+    """Поставить импорт в пул задач и дождаться отчета"""
+    return await run_job(import_history_csv, telegram_id, file)
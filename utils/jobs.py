@@ -0,0 +1,27 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+# Тяжелые задачи (выгрузка, импорт) идут в отдельных потоках, чтобы не блокировать event loop;
+# очередь ограничена, лишние запросы получают отказ вместо ожидания
+JOB_WORKERS = 2
+JOB_QUEUE_LIMIT = 8
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='job')
+_slots = None
+
+class JobQueueFullError(Exception):
+    """Очередь фоновых задач переполнена"""
+
+async def run_job(func, *args):
+    """Выполнить func(*args) в пуле задач и дождаться результата"""
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(JOB_QUEUE_LIMIT)
+    if _slots.locked():
+        logging.warning(f"run_job: queue is full, rejected {func.__name__}")
+        raise JobQueueFullError()
+
+    async with _slots:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, func, *args)
@@ -0,0 +1,168 @@
+import logging
+import time
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+from config import MEAL_PLAN_TIME_BUDGET_MS
+from utils.food_terms import normalize_food_text
+from utils.nutrition_db import NutritionDB, MACROS, get_nutrition_db
+
+# Меню на день под КБЖУ пользователя из продуктов базы utils.nutrition_db. Каждый прием
+# пищи - набор слотов по ролям продуктов (белок, гарнир, овощи...). Поиск векторный: сразу пачка случайных сочетаний продуктов,
+# для каждого граммовки решаются МНК (псевдообратная матрица на всю пачку одним вызовом),
+# затем обрезаются до разумных порций и округляются. Пачки генерируются, пока не найдено
+# меню в пределах допусков или не вышел бюджет времени; побеждает меню с наименьшей ошибкой
+
+# Приемы пищи: роли слотов и доля калорий дня
+MEAL_SLOTS = (
+    ('breakfast', ('carb', 'protein', 'fruit')),
+    ('lunch', ('protein', 'carb', 'veg', 'fat')),
+    ('dinner', ('protein', 'carb', 'veg')),
+    ('snack', ('dairy', 'fat')),
+)
+MEAL_SHARES = {'breakfast': 0.25, 'lunch': 0.35, 'dinner': 0.25, 'snack': 0.15}
+MEAL_LETTERS = {'breakfast': 'b', 'lunch': 'l', 'dinner': 'd', 'snack': 's'}
+
+# Допуски меню: калории точнее, БЖУ свободнее
+CALORIES_TOLERANCE = 0.05
+MACROS_TOLERANCE = 0.10
+# Вес в ошибке: калории важнее всего, распределение по приемам пищи - мягкое пожелание
+MACRO_WEIGHTS = np.array([2.0, 1.0, 1.0, 1.0])
+MEAL_WEIGHT = 0.3
+# Один и тот же продукт дважды за день - чуть хуже
+REPEAT_PENALTY = 0.002
+# Любимые продукты выпадают чаще
+LIKE_WEIGHT = 3.0
+BATCH_SIZE = 256
+
+def _candidates(db: NutritionDB, role: str, meal: str, excluded: np.ndarray) -> np.ndarray:
+    """Индексы продуктов роли, подходящих к приему пищи"""
+    fits = np.char.find(db.meals, MEAL_LETTERS[meal]) >= 0
+    return np.flatnonzero((db.roles == role) & fits & ~excluded)
+
+def _preference_mask(db: NutritionDB, terms: frozenset) -> np.ndarray:
+    """Продукты, у которых есть общий термин с terms (по названию, синонимам и тегам)"""
+    return np.array([bool(food_terms & terms) for food_terms in db.terms])
+
+def _build_slots(db: NutritionDB, excluded: np.ndarray):
+    """Слоты меню: (прием пищи, роль, кандидаты); роль без кандидатов пропускается"""
+    slots = []
+    for meal, roles in MEAL_SLOTS:
+        for role in roles:
+            candidates = _candidates(db, role, meal, excluded)
+            if len(candidates):
+                slots.append((meal, role, candidates))
+    return slots
+
+def _sample(rng, slots: list, weights: np.ndarray, size: int) -> np.ndarray:
+    """Пачка сочетаний: (size, слоты) индексов продуктов"""
+    columns = []
+    for _, _, candidates in slots:
+        p = weights[candidates]
+        columns.append(rng.choice(candidates, size=size, p=p / p.sum()))
+    return np.stack(columns, axis=1)
+
+def _solve_batch(db: NutritionDB, choice: np.ndarray, targets: np.ndarray, meal_rows: np.ndarray):
+    """
+    Граммовки для пачки сочетаний и их ошибка. Строки системы - отношение к цели
+    каждого макронутриента дня и калорий каждого приема пищи (с весом MEAL_WEIGHT)
+    """
+    nutrients = db.per_gram[choice]                                  # (n, слоты, 4)
+    macro_part = nutrients.transpose(0, 2, 1) / targets[:, None]        # (n, 4, слоты)
+    meal_part = nutrients[:, None, :, 0] * meal_rows[None]               # (n, приемы, слоты)
+    system = np.concatenate([macro_part * np.sqrt(MACRO_WEIGHTS)[:, None], meal_part], axis=1)
+    rhs = np.concatenate([np.sqrt(MACRO_WEIGHTS), np.full(len(meal_rows), MEAL_WEIGHT)])
+
+    grams = np.linalg.pinv(system) @ rhs
+    step = db.portion_step[choice]
+    grams = np.clip(grams, db.portion_min[choice], db.portion_max[choice])
+    grams = np.round(grams / step) * step
+
+    totals = np.einsum('ns,nsk->nk', grams, nutrients)
+    deviation = totals / targets - 1
+    meal_deviation = np.einsum('ns,ms->nm', grams * nutrients[:, :, 0], meal_rows) - MEAL_WEIGHT
+    repeats = (np.diff(np.sort(choice, axis=1), axis=1) == 0).sum(axis=1)
+    error = (deviation ** 2 * MACRO_WEIGHTS).sum(axis=1) + (meal_deviation ** 2).sum(axis=1) + repeats * REPEAT_PENALTY
+    within = (np.abs(deviation[:, 0]) <= CALORIES_TOLERANCE) & (np.abs(deviation[:, 1:]) <= MACROS_TOLERANCE).all(axis=1)
+    return grams, totals, error, within
+
+def generate_meal_plan(targets: dict, likes: frozenset = frozenset(), dislikes: frozenset = frozenset(),
+                       seed: int = 0, time_budget_ms: float = MEAL_PLAN_TIME_BUDGET_MS, db: NutritionDB = None):
+    """
+    Меню на день под КБЖУ targets. Продукты с терминами из dislikes не предлагаются,
+    из likes - выпадают чаще. None, если меню собрать не из чего
+    """
+    db = db or get_nutrition_db()
+    target_vector = np.array([float(targets[macro]) for macro in MACROS])
+    excluded = _preference_mask(db, dislikes)
+    slots = _build_slots(db, excluded)
+    if not slots:
+        return None
+
+    weights = np.where(_preference_mask(db, likes), LIKE_WEIGHT, 1.0)
+    meals = [meal for meal, _ in MEAL_SLOTS]
+    # Строки калорий приемов пищи: калории слота / цель калорий приема
+    meal_rows = np.array([
+        [MEAL_WEIGHT / (MEAL_SHARES[meal] * target_vector[0]) if slot[0] == meal else 0.0 for slot in slots]
+        for meal in meals
+    ])
+
+    rng = np.random.default_rng(seed)
+    deadline = time.perf_counter() + time_budget_ms / 1000
+    best = None
+    batches = 0
+    while True:
+        choice = _sample(rng, slots, weights, BATCH_SIZE)
+        grams, totals, error, within = _solve_batch(db, choice, target_vector, meal_rows)
+        batches += 1
+        # Среди попавших в допуски - с наименьшей ошибкой; если таких нет - просто лучшее
+        i = int(np.argmin(np.where(within, error, error + 1e6)))
+        if best is None or (within[i], -error[i]) > (best[3], -best[2]):
+            best = (choice[i], grams[i], error[i], bool(within[i]), totals[i])
+        if best[3] or time.perf_counter() >= deadline:
+            break
+
+    choice, grams, _, within, totals = best
+    logging.info(f"generate_meal_plan: batches={batches}, within_tolerance={within}")
+    plan_meals = []
+    for meal in meals:
+        items = [
+            (str(db.names[food]), int(grams[s]), round(float(grams[s] * db.per_gram[food, 0])))
+            for s, (slot, food) in enumerate(zip(slots, choice)) if slot[0] == meal
+        ]
+        if items:
+            plan_meals.append((meal, items))
+    return {
+        'meals': plan_meals,
+        'totals': {macro: round(float(value)) for macro, value in zip(MACROS, totals)},
+        'targets': {macro: round(float(value)) for macro, value in zip(MACROS, target_vector)},
+        'within_tolerance': within,
+    }
+
+# Готовые меню: (telegram_id, КБЖУ, предпочтения, вариант) -> меню
+_meal_plan_cache = OrderedDict()
+MEAL_PLAN_CACHE_SIZE = 1000
+
+def get_meal_plan(telegram_id: int, targets: dict, likes_raw: str = None, dislikes_raw: str = None, variant: int = 0):
+    """
+    Меню пользователя из кэша. Ключ - КБЖУ и термины предпочтений, поэтому новые замеры
+    или правка предпочтений дают новое меню, а повторный запрос - то же самое.
+    variant - номер варианта для кнопки "другое меню"
+    """
+    likes, dislikes = frozenset(normalize_food_text(likes_raw)), frozenset(normalize_food_text(dislikes_raw))
+    target_key = tuple(round(float(targets[macro])) for macro in MACROS)
+    key = (telegram_id, target_key, likes, dislikes, variant)
+    if key in _meal_plan_cache:
+        _meal_plan_cache.move_to_end(key)
+        return _meal_plan_cache[key]
+
+    logging.info(f"get_meal_plan: telegram_id={telegram_id}, targets={target_key}, variant={variant}")
+    # Сид от ключа: одинаковые входные данные дают одинаковое меню и после перезапуска
+    seed = zlib.crc32(repr((telegram_id, target_key, sorted(likes), sorted(dislikes), variant)).encode())
+    plan = generate_meal_plan(dict(zip(MACROS, target_key)), likes, dislikes, seed=seed)
+    _meal_plan_cache[key] = plan
+    while len(_meal_plan_cache) > MEAL_PLAN_CACHE_SIZE:
+        _meal_plan_cache.popitem(last=False)
+    return plan
@@ -0,0 +1,210 @@
+import csv
+import logging
+import os
+import re
+import shutil
+import tempfile
+
+import numpy as np
+
+from utils.food_terms import normalize_food_text
+
+# База продуктов: data/nutrition.csv (на 100 г) компилируется в массивы NumPy в
+# data/nutrition_index/ и открывается через mmap - несколько рабочих процессов бота
+# делят одну копию в page cache. Нечеткий поиск по названию - триграммный индекс
+# в формате CSR: отсортированные коды триграмм, смещения и списки продуктов.
+# Запрос - searchsorted по своим триграммам и bincount по найденным спискам
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+NUTRITION_CSV = os.path.join(DATA_DIR, 'nutrition.csv')
+NUTRITION_INDEX_DIR = os.path.join(DATA_DIR, 'nutrition_index')
+
+MACROS = ('calories', 'protein', 'fat', 'carbs')
+INDEX_ARRAYS = (
+    'names', 'term_texts', 'roles', 'meals', 'per_gram', 'portion_min', 'portion_max', 'portion_step', 'piece_grams',
+    'name_trigrams', 'trigram_keys', 'trigram_offsets', 'trigram_postings',
+)
+
+# Ниже этой похожести продукт не считается найденным
+MIN_SIMILARITY = 0.4
+# Без указания количества: штука, если продукт считают штуками, иначе столько граммов
+DEFAULT_GRAMS = 100
+# Число без единиц не больше этого у штучного продукта - штуки ("яйца 2")
+MAX_PIECES_WITHOUT_UNIT = 10
+
+_WORD_RE = re.compile(r'[0-9a-zа-я]+')
+
+def _trigrams(text: str) -> np.ndarray:
+    """Уникальные коды триграмм текста; слова дополняются пробелами, как в pg_trgm"""
+    codes = set()
+    for word in _WORD_RE.findall(text.lower().replace('ё', 'е')):
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            a, b, c = padded[i:i + 3]
+            codes.add((ord(a) << 42) | (ord(b) << 21) | ord(c))
+    return np.fromiter(codes, dtype=np.int64, count=len(codes))
+
+def build_nutrition_index(csv_path: str = NUTRITION_CSV, index_dir: str = NUTRITION_INDEX_DIR):
+    """Скомпилировать таблицу продуктов в массивы; каталог подменяется целиком"""
+    with open(csv_path, encoding='utf-8', newline='') as f:
+        rows = list(csv.DictReader(f))
+
+    def column(name, default=0.0):
+        return np.array([float(row[name]) if row[name] else default for row in rows])
+
+    arrays = {
+        'names': np.array([row['name'] for row in rows]),
+        # Из чего строятся термины предпочтений продукта: название, синонимы и теги состава
+        # (колонка tags: "молочное", "орехи", "глютен"...), чтобы исключение категории
+        # убирало и продукты, где ее нет в названии (масло сливочное, арахисовая паста)
+        'term_texts': np.array([f"{row['name']} {row['aliases']} {row['tags']}" for row in rows]),
+        'roles': np.array([row['role'] for row in rows]),
+        'meals': np.array([row['meals'] for row in rows]),
+        # Питательность одного грамма: калории, белки, жиры, углеводы
+        'per_gram': np.stack([column(macro) for macro in MACROS], axis=1) / 100,
+        'portion_min': column('portion_min'),
+        'portion_max': column('portion_max'),
+        'portion_step': column('portion_step'),
+        'piece_grams': column('piece_grams'),
+    }
+    # Ищем по названию и синонимам из колонки aliases ("картошка", "семга")
+    food_trigrams = [_trigrams(f"{row['name']} {row['aliases']}") for row in rows]
+    arrays['name_trigrams'] = np.array([len(_trigrams(row['name'])) for row in rows], dtype=np.int32)
+
+    # CSR: ключи - уникальные триграммы, postings[offsets[i]:offsets[i + 1]] - продукты с ключом i
+    codes = np.concatenate(food_trigrams)
+    foods = np.repeat(np.arange(len(rows), dtype=np.int32), [len(trigrams) for trigrams in food_trigrams])
+    order = np.lexsort((foods, codes))
+    keys, counts = np.unique(codes[order], return_counts=True)
+    arrays['trigram_keys'] = keys
+    arrays['trigram_offsets'] = np.concatenate([[0], np.cumsum(counts)]).astype(np.int32)
+    arrays['trigram_postings'] = foods[order]
+
+    parent = os.path.dirname(index_dir)
+    tmp_dir = tempfile.mkdtemp(prefix='nutrition_index.', dir=parent)
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_dir, f'{name}.npy'), array)
+    old_dir = tempfile.mkdtemp(prefix='nutrition_index.old.', dir=parent)
+    try:
+        if os.path.isdir(index_dir):
+            os.rename(index_dir, os.path.join(old_dir, 'index'))
+        os.rename(tmp_dir, index_dir)
+    except OSError as e:
+        # Индекс в это же время собрал другой процесс - его и используем
+        logging.warning(f"build_nutrition_index: index replaced concurrently: {e}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    logging.info(f"build_nutrition_index: foods={len(rows)}, trigrams={len(keys)}")
+
+def _index_is_fresh(csv_path: str, index_dir: str) -> bool:
+    paths = [os.path.join(index_dir, f'{name}.npy') for name in INDEX_ARRAYS]
+    if not all(os.path.exists(path) for path in paths):
+        return False
+    return min(os.path.getmtime(path) for path in paths) >= os.path.getmtime(csv_path)
+
+class NutritionDB:
+    """Продукты в массивах (только чтение, mmap) и нечеткий поиск по названию"""
+
+    def __init__(self, index_dir: str = NUTRITION_INDEX_DIR):
+        for name in INDEX_ARRAYS:
+            setattr(self, name, np.load(os.path.join(index_dir, f'{name}.npy'), mmap_mode='r'))
+        self._terms = None
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def terms(self) -> list:
+        """Термины предпочтений каждого продукта (для лайков и исключений)"""
+        if self._terms is None:
+            self._terms = [normalize_food_text(str(text)) for text in self.term_texts]
+        return self._terms
+
+    def search(self, query: str, k: int = 5) -> list:
+        """До k продуктов, похожих на query: [(индекс, похожесть 0..1)], лучшие первыми"""
+        codes = _trigrams(query)
+        if not len(codes):
+            return []
+        positions = np.minimum(np.searchsorted(self.trigram_keys, codes), len(self.trigram_keys) - 1)
+        positions = positions[self.trigram_keys[positions] == codes]
+        if not len(positions):
+            return []
+        starts, ends = self.trigram_offsets[positions], self.trigram_offsets[positions + 1]
+        postings = np.concatenate([self.trigram_postings[start:end] for start, end in zip(starts, ends)])
+        common = np.bincount(postings, minlength=len(self.names))
+        # Главное - сколько триграмм запроса нашлось в продукте; коэффициент Дайса по
+        # самому названию поднимает выше короткие названия из одних совпадений
+        coverage = common / len(codes)
+        dice = np.minimum(2 * common / (len(codes) + self.name_trigrams), 1.0)
+        similarity = (3 * coverage + dice) / 4
+        k = min(k, len(similarity))
+        top = np.argpartition(-similarity, k - 1)[:k]
+        top = top[np.argsort(-similarity[top], kind='stable')]
+        return [(int(i), float(similarity[i])) for i in top if similarity[i] > 0]
+
+    def nutrients(self, index: int, grams: float) -> dict:
+        """КБЖУ порции продукта"""
+        values = self.per_gram[index] * grams
+        return {macro: round(float(value), 1) for macro, value in zip(MACROS, values)}
+
+_db = None
+
+def get_nutrition_db() -> NutritionDB:
+    """База продуктов процесса; индекс пересобирается, если CSV новее"""
+    global _db
+    if _db is None:
+        if not _index_is_fresh(NUTRITION_CSV, NUTRITION_INDEX_DIR):
+            build_nutrition_index()
+        _db = NutritionDB()
+    return _db
+
+_AMOUNT_RE = re.compile(
+    r'(\d+(?:[.,]\d+)?)\s*(кг|килограмм\w*|грамм\w*|гр|г|мл|л|штук\w*|шт)?\.?(?=\s|$)',
+    re.IGNORECASE
+)
+
+def parse_food_entry(text: str):
+    """
+    "гречка 150г" -> ('гречка', 150.0, 'g'), "яйца 2 шт" -> ('яйца', 2.0, 'pcs'),
+    "банан" -> ('банан', None, None). Количество - последнее число в тексте
+    """
+    text = text.strip().lower().replace('ё', 'е')
+    matches = list(_AMOUNT_RE.finditer(text))
+    if not matches:
+        return text, None, None
+    match = matches[-1]
+    query = (text[:match.start()] + ' ' + text[match.end():]).strip(' ,-')
+    amount = float(match.group(1).replace(',', '.'))
+    unit = match.group(2) or ''
+    if unit.startswith('шт'):
+        return query, amount, 'pcs'
+    if not unit:
+        return query, amount, None
+    multiplier = 1000 if unit in ('кг', 'л') or unit.startswith('килограмм') else 1
+    return query, amount * multiplier, 'g'
+
+def lookup_food(text: str, db: NutritionDB = None):
+    """
+    Продукт и КБЖУ порции по тексту вида "гречка 150г".
+    None, если текст не похож ни на один продукт
+    """
+    db = db or get_nutrition_db()
+    query, amount, unit = parse_food_entry(text)
+    matches = db.search(query, k=1)
+    if not matches or matches[0][1] < MIN_SIMILARITY:
+        return None
+    index, similarity = matches[0]
+    piece = float(db.piece_grams[index])
+    if amount is None:
+        grams = piece or DEFAULT_GRAMS
+    elif unit == 'pcs' or (unit is None and piece and amount <= MAX_PIECES_WITHOUT_UNIT):
+        grams = amount * (piece or DEFAULT_GRAMS)
+    else:
+        grams = amount
+    return {
+        'index': index,
+        'name': str(db.names[index]),
+        'grams': round(grams),
+        'similarity': round(similarity, 2),
+        **db.nutrients(index, grams),
+    }
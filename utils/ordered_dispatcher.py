@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+from aiogram import Dispatcher, types
+
+from config import MAX_CONCURRENT_UPDATES
+
+# Обновления одного пользователя выполняются строго по очереди (двойное нажатие кнопки,
+# два быстрых ответа в анкете не обгоняют друг друга), разные пользователи - параллельно,
+# но не больше MAX_CONCURRENT_UPDATES одновременно
+
+# Задержка в очереди, после которой пишем предупреждение
+UPDATE_DELAY_WARNING_MS = 1000
+# Сколько последних задержек держим для перцентилей
+UPDATE_DELAY_WINDOW = 1000
+
+USER_UPDATE_FIELDS = (
+    'message', 'edited_message', 'callback_query', 'inline_query',
+    'chosen_inline_result', 'shipping_query', 'pre_checkout_query', 'my_chat_member'
+)
+
+def get_update_user_id(update: types.Update):
+    """telegram_id отправителя обновления; None, если отправителя нет"""
+    for field in USER_UPDATE_FIELDS:
+        event = getattr(update, field, None)
+        if event is not None and event.from_user is not None:
+            return event.from_user.id
+    return None
+
+class OrderedDispatcher(Dispatcher):
+    """Dispatcher с очередью на пользователя и общим лимитом параллельных обновлений"""
+
+    def __init__(self, *args, max_concurrent: int = MAX_CONCURRENT_UPDATES, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_concurrent = max_concurrent
+        self._slots = None
+        # telegram_id -> [замок, сколько обновлений его ждут или держат]
+        self._user_locks = {}
+        self._delays = deque(maxlen=UPDATE_DELAY_WINDOW)
+        self.processed = 0
+
+    async def process_updates(self, updates, fast: bool = True):
+        # Через updates_handler, как в Dispatcher: middleware уровня обновления сохраняются
+        if not fast:
+            return await super().process_updates(updates, fast)
+        return await asyncio.gather(*(self._run_ordered(update, self.updates_handler.notify) for update in updates))
+
+    async def _run_ordered(self, update: types.Update, process):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+        received = time.perf_counter()
+        user_id = get_update_user_id(update)
+        if user_id is None:
+            async with self._slots:
+                self._record_delay(update, received)
+                return await process(update)
+
+        entry = self._user_locks.get(user_id)
+        if entry is None:
+            entry = self._user_locks[user_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            # Сначала очередь пользователя, потом общий слот: ждущий своей очереди не занимает слот
+            async with entry[0]:
+                async with self._slots:
+                    self._record_delay(update, received)
+                    return await process(update)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._user_locks[user_id]
+
+    def _record_delay(self, update: types.Update, received: float):
+        delay_ms = (time.perf_counter() - received) * 1000
+        self._delays.append(delay_ms)
+        self.processed += 1
+        if delay_ms > UPDATE_DELAY_WARNING_MS:
+            logging.warning(f"OrderedDispatcher: update {update.update_id} waited {delay_ms:.0f} ms")
+
+    def get_delay_stats(self) -> dict:
+        """Задержка в очереди по последним обновлениям, мс"""
+        delays = sorted(self._delays)
+        if not delays:
+            return {'processed': self.processed, 'p50': 0.0, 'p95': 0.0, 'max': 0.0}
+        return {
+            'processed': self.processed,
+            'p50': delays[len(delays) // 2],
+            'p95': delays[min(len(delays) - 1, int(len(delays) * 0.95))],
+            'max': delays[-1],
+        }
@@ -0,0 +1,102 @@
+import cProfile
+import json
+import logging
+import os
+import time
+from datetime import datetime
+
+from aiogram import types
+from aiogram.dispatcher.handler import current_handler
+from aiogram.dispatcher.middlewares import BaseMiddleware
+
+from config import PROFILE_SLOW_MS, PROFILE_DIR, PROFILE_KEEP
+
+# Профилирование медленных обновлений: cProfile вокруг обработчика, сохраняются только
+# профили обновлений дольше PROFILE_SLOW_MS. cProfile один на процесс, поэтому одновременно
+# снимается один профиль; в него попадают и корутины других пользователей, которые
+# выполнялись в это время, - для поиска горячих функций это не мешает
+
+_capturing = False
+
+def save_profile(profiler: cProfile.Profile, tags: dict, directory: str = PROFILE_DIR, keep: int = PROFILE_KEEP) -> str:
+    """
+    Сохраняет профиль и теги рядом (.prof + .json). Хранит не больше keep профилей,
+    самые старые удаляются. Возвращает путь к .prof
+    """
+    os.makedirs(directory, exist_ok=True)
+    name = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}_{tags['handler']}"
+    path = os.path.join(directory, f"{name}.prof")
+    profiler.dump_stats(path)
+    with open(os.path.join(directory, f"{name}.json"), 'w', encoding='utf-8') as f:
+        json.dump(tags, f, ensure_ascii=False)
+
+    # Имена начинаются со времени, поэтому сортировка по имени - по возрасту
+    profiles = sorted(file for file in os.listdir(directory) if file.endswith('.prof'))
+    for old in profiles[:-keep]:
+        for ext in ('.prof', '.json'):
+            old_path = os.path.join(directory, old[:-len('.prof')] + ext)
+            if os.path.exists(old_path):
+                os.remove(old_path)
+    return path
+
+class ProfilingMiddleware(BaseMiddleware):
+    """Снимает cProfile с обработчиков сообщений и callback и сохраняет медленные"""
+
+    def __init__(self, slow_ms: int = PROFILE_SLOW_MS):
+        super().__init__()
+        self.slow_ms = slow_ms
+
+    def _start(self, data: dict):
+        global _capturing
+        if _capturing:
+            return
+        _capturing = True
+        profiler = cProfile.Profile()
+        data['profiler'] = profiler
+        data['profile_started'] = time.perf_counter()
+        profiler.enable()
+
+    def _finish(self, event, data: dict):
+        global _capturing
+        profiler = data.pop('profiler', None)
+        if profiler is None:
+            return
+        profiler.disable()
+        _capturing = False
+        elapsed_ms = (time.perf_counter() - data.pop('profile_started')) * 1000
+        if elapsed_ms < self.slow_ms:
+            return
+
+        handler = data.get('profile_handler', 'unknown')
+        tags = {
+            'handler': handler,
+            'state': data.get('profile_state'),
+            'user_id': event.from_user.id,
+            'elapsed_ms': round(elapsed_ms, 1),
+            'created': datetime.now().isoformat(timespec='seconds'),
+        }
+        try:
+            path = save_profile(profiler, tags)
+            logging.warning(f"ProfilingMiddleware: slow update {handler} {elapsed_ms:.0f} ms, profile={path}")
+        except OSError as e:
+            logging.error(f"ProfilingMiddleware: can't save profile: {e}")
+
+    async def _remember_handler(self, data: dict):
+        handler = current_handler.get()
+        data['profile_handler'] = getattr(handler, '__name__', 'unknown')
+        if not _capturing:
+            data['profile_state'] = await self.manager.dispatcher.current_state().get_state()
+
+    async def on_process_message(self, message: types.Message, data: dict):
+        await self._remember_handler(data)
+        self._start(data)
+
+    async def on_post_process_message(self, message: types.Message, results, data: dict):
+        self._finish(message, data)
+
+    async def on_process_callback_query(self, callback: types.CallbackQuery, data: dict):
+        await self._remember_handler(data)
+        self._start(data)
+
+    async def on_post_process_callback_query(self, callback: types.CallbackQuery, results, data: dict):
+        self._finish(callback, data)
@@ -2,6 +2,8 @@ import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 from datetime import datetime, timedelta
 import os
+from collections import OrderedDict
+from io import BytesIO
 from typing import List, Dict
 from models.tables import UserRecord
 
@@ -52,70 +54,153 @@ def get_motivational_message(records) -> str:
         else:
             return f"✅ **Стабильный прогресс!**\n\nТвой вес стабилен уже {days_between} дней.\n\nПериод: {start_date} - {end_date}\n\nПродолжай поддерживать здоровый образ жизни! 🌟"
 
+def get_trend_message(forecast: dict) -> str:
+    """Блок тренда веса для сообщения о прогрессе (forecast - utils.trend.forecast_trend)"""
+    text = f"📉 **Тренд веса:** {forecast['trend_weight']:.1f} кг"
+    if forecast['weekly_rate'] is not None:
+        text += f"\n• Скорость: {forecast['weekly_rate']:+.2f} кг в неделю"
+    if forecast['target_weight'] is None:
+        text += "\n• Задайте целевой вес командой /target, чтобы увидеть прогноз"
+    elif forecast['reached']:
+        text += f"\n• Цель {forecast['target_weight']:.1f} кг достигнута! 🏆"
+    elif forecast['eta']:
+        text += f"\n• Цель {forecast['target_weight']:.1f} кг - примерно к {forecast['eta'].strftime('%d.%m.%Y')}"
+    else:
+        text += f"\n• Цель {forecast['target_weight']:.1f} кг: при текущем темпе прогноза нет"
+    return text
+
+# Наборы метрик для графика: ключ кнопки -> колонки user_records
+PROGRESS_METRICS = {
+    'weight': ('weight',),
+    'bodyfat': ('bodyfat',),
+    'girths': ('waist', 'neck', 'hip'),
+}
+PROGRESS_METRICS['all'] = PROGRESS_METRICS['weight'] + PROGRESS_METRICS['bodyfat'] + PROGRESS_METRICS['girths']
+
+GIRTH_LABELS = {
+    'waist': 'Талия',
+    'neck': 'Шея',
+    'hip': 'Бёдра',
+}
+
+# file_id уже загруженных в Telegram графиков: повторный запрос не рендерит и не загружает картинку
+_graph_cache = OrderedDict()
+GRAPH_CACHE_SIZE = 1000
+
+def get_graph_cache_key(user_id: int, metrics: str, rows) -> tuple:
+    """Ключ кэша: пользователь, набор метрик и сами данные графика"""
+    return (user_id, metrics, hash(tuple(tuple(row) for row in rows)))
+
+def get_cached_graph(key: tuple):
+    file_id = _graph_cache.get(key)
+    if file_id:
+        _graph_cache.move_to_end(key)
+    return file_id
+
+def remember_graph(key: tuple, file_id: str):
+    _graph_cache[key] = file_id
+    _graph_cache.move_to_end(key)
+    while len(_graph_cache) > GRAPH_CACHE_SIZE:
+        _graph_cache.popitem(last=False)
+
+def _plot_weight_panel(ax, dates, weights):
+    """Панель веса с крупными подписями значений"""
+    ax.plot(dates, weights, 'b-o', linewidth=4, markersize=12, markerfacecolor='white', markeredgewidth=3, markeredgecolor='blue')
+    ax.set_title('Ваш прогресс веса', fontsize=20, fontweight='bold', pad=25)
+    ax.set_ylabel('Вес (кг)', fontsize=16, fontweight='bold')
+    for date, weight in zip(dates, weights):
+        ax.annotate(f'{weight:.1f} кг', (date, weight),
+                    textcoords="offset points",
+                    xytext=(0, 20),
+                    ha='center',
+                    fontsize=14,
+                    fontweight='bold',
+                    bbox=dict(boxstyle="round,pad=0.5", facecolor="white", alpha=0.9, edgecolor="blue", linewidth=2))
+
+def _plot_bodyfat_panel(ax, dates, bodyfats):
+    """Панель процента жира"""
+    ax.plot(dates, bodyfats, 'r-o', linewidth=3, markersize=10, markerfacecolor='white', markeredgewidth=2, markeredgecolor='red')
+    ax.set_title('Процент жира', fontsize=18, fontweight='bold', pad=20)
+    ax.set_ylabel('Жир (%)', fontsize=14, fontweight='bold')
+    for date, bodyfat in zip(dates, bodyfats):
+        ax.annotate(f'{bodyfat:.1f}%', (date, bodyfat), textcoords="offset points", xytext=(0, 14), ha='center', fontsize=12)
+
+def _plot_girths_panel(ax, series):
+    """Панель обхватов: талия, шея и бёдра на одной оси"""
+    for column, (dates, values) in series.items():
+        ax.plot(dates, values, '-o', linewidth=3, markersize=8, label=GIRTH_LABELS[column])
+    ax.set_title('Обхваты', fontsize=18, fontweight='bold', pad=20)
+    ax.set_ylabel('См', fontsize=14, fontweight='bold')
+    ax.legend(fontsize=12)
+
+def _column_series(rows, column):
+    """Даты и значения колонки без пропусков (частичные замеры хранят None)"""
+    points = [(row.date, getattr(row, column)) for row in rows if getattr(row, column) is not None]
+    return [date for date, _ in points], [value for _, value in points]
+
+def create_multi_progress_graph(rows, columns: tuple) -> BytesIO:
+    """
+    Рисует все выбранные метрики одной фигурой за один проход.
+    rows - записи или строки проекции с полем date и колонками columns.
+    Возвращает PNG в памяти или None, если рисовать нечего
+    """
+    rows = sorted(rows, key=lambda x: x.date)
+
+    panels = []
+    if 'weight' in columns:
+        dates, weights = _column_series(rows, 'weight')
+        if len(dates) >= 2:
+            panels.append(lambda ax: _plot_weight_panel(ax, dates, weights))
+    if 'bodyfat' in columns:
+        bf_dates, bodyfats = _column_series(rows, 'bodyfat')
+        if len(bf_dates) >= 2:
+            panels.append(lambda ax: _plot_bodyfat_panel(ax, bf_dates, bodyfats))
+    girths = {}
+    for column in GIRTH_LABELS:
+        if column in columns:
+            girth_dates, values = _column_series(rows, column)
+            if len(girth_dates) >= 2:
+                girths[column] = (girth_dates, values)
+    if girths:
+        panels.append(lambda ax: _plot_girths_panel(ax, girths))
+
+    if not panels:
+        return None
+
+    fig, axes = plt.subplots(len(panels), 1, figsize=(14, 7 * len(panels)), squeeze=False, sharex=True)
+    for ax, draw in zip(axes[:, 0], panels):
+        draw(ax)
+        ax.grid(True, alpha=0.3, linestyle='--')
+    axes[-1, 0].xaxis.set_major_formatter(mdates.DateFormatter('%d.%m.%y'))
+    fig.autofmt_xdate()
+    fig.tight_layout(pad=2.0)
+
+    buffer = BytesIO()
+    fig.savefig(buffer, format='png', dpi=150, bbox_inches='tight', facecolor='white')
+    plt.close(fig)
+    buffer.seek(0)
+    return buffer
+
 def create_progress_graph(records) -> str:
     """
-    Создает простой и понятный график прогресса на основе записей пользователя
+    Создает график прогресса веса на основе записей пользователя
     Возвращает путь к сохраненному файлу
     """
     if len(records) < 2:
         return None
-    
-    # Сортируем записи по дате (старые -> новые)
-    sorted_records = sorted(records, key=lambda x: x.date)
-    
-    # Подготавливаем данные
-    dates = [record.date for record in sorted_records]
-    weights = [record.weight for record in sorted_records]
-    
-    # Создаем график с увеличенным размером для мобильных устройств
-    plt.figure(figsize=(14, 8))
-    
-    # График веса
-    plt.plot(dates, weights, 'b-o', linewidth=4, markersize=12, markerfacecolor='white', markeredgewidth=3, markeredgecolor='blue')
-    plt.title('Ваш прогресс веса', fontsize=20, fontweight='bold', pad=25)
-    plt.ylabel('Вес (кг)', fontsize=16, fontweight='bold')
-    plt.xlabel('', fontsize=16, fontweight='bold')  # Убираем подпись оси X
-    plt.grid(True, alpha=0.3, linestyle='--')
-    
-    # Убираем все метки с оси X
-    plt.xticks([])
-    
-    # Добавляем точки с крупными подписями веса и маленькими датами
-    for i, (date, weight) in enumerate(zip(dates, weights)):
-        # Форматируем дату в стиле DD.MM.YY
-        date_str = date.strftime('%d.%m.%y')
-        
-        # Подпись веса (крупная)
-        plt.annotate(f'{weight:.1f} кг', (date, weight), 
-                    textcoords="offset points", 
-                    xytext=(0,20), 
-                    ha='center', 
-                    fontsize=14,
-                    fontweight='bold',
-                    bbox=dict(boxstyle="round,pad=0.5", facecolor="white", alpha=0.9, edgecolor="blue", linewidth=2))
-        
-        # Маленькая дата под значением веса
-        plt.annotate(date_str, (date, weight), 
-                    textcoords="offset points", 
-                    xytext=(0,-35), 
-                    ha='center', 
-                    fontsize=10,
-                    fontweight='normal',
-                    color='gray')
-    
-    # Настраиваем отступы для лучшего отображения на мобильных
-    plt.tight_layout(pad=2.0)
-    
+
+    buffer = create_multi_progress_graph(records, PROGRESS_METRICS['weight'])
+    if buffer is None:
+        return None
+
     # Создаем папку data, если её нет
     os.makedirs('data', exist_ok=True)
-    
-    # Сохраняем график с высоким разрешением для мобильных устройств
+
     filename = f'progress_graph_{datetime.now().strftime("%Y%m%d_%H%M%S")}.png'
     filepath = os.path.join('data', filename)
-    
-    plt.savefig(filepath, dpi=300, bbox_inches='tight', facecolor='white')
-    plt.close()
-    
+    with open(filepath, 'wb') as f:
+        f.write(buffer.getvalue())
+
     return filepath
 
 def calculate_progress_changes(records):
@@ -135,15 +220,18 @@ def calculate_progress_changes(records):
     last_record = sorted_records[-1]  # Самая новая запись
     
     weight_change = last_record.weight - first_record.weight
-    bodyfat_change = (last_record.bodyfat or 0) - (first_record.bodyfat or 0)
-    
-    measurements_change = {
-        'Талия': last_record.waist - first_record.waist,
-        'Шея': last_record.neck - first_record.neck
-    }
     
-    if last_record.hip and first_record.hip:
-        measurements_change['Бёдра'] = last_record.hip - first_record.hip
+    def change(column: str):
+        # Замеры одного веса хранят пустые обхваты: сравниваем первое и последнее значение, что есть
+        values = [getattr(record, column) for record in sorted_records if getattr(record, column) is not None]
+        return values[-1] - values[0] if len(values) >= 2 else None
+    
+    bodyfat_change = change('bodyfat') or 0
+    measurements_change = {}
+    for name, column in (('Талия', 'waist'), ('Шея', 'neck'), ('Бёдра', 'hip')):
+        value = change(column)
+        if value is not None:
+            measurements_change[name] = value
     
     return {
         'weight_change': weight_change,
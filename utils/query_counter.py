@@ -0,0 +1,98 @@
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from aiogram import types
+from aiogram.dispatcher.middlewares import BaseMiddleware
+from sqlalchemy import event
+
+from config import QUERY_BUDGET, QUERY_TIME_BUDGET_MS, QUERY_REPEAT_WARNING
+
+# Счетчик SQL-запросов на обновление: события SQLAlchemy пишут в статистику текущего
+# контекста (contextvar), middleware заводит ее на каждое обновление. Запросы из пула
+# задач (run_in_executor) и писателя group commit идут в других потоках и не считаются
+
+# Сколько текстов запросов держим для лога
+QUERY_LOG_LIMIT = 50
+
+class QueryStats:
+    """Запросы одного обновления (или блока count_queries)"""
+
+    def __init__(self):
+        self.count = 0
+        self.time_ms = 0.0
+        self.statements = Counter()
+
+    def add(self, statement: str, elapsed_ms: float):
+        self.count += 1
+        self.time_ms += elapsed_ms
+        if statement in self.statements or len(self.statements) < QUERY_LOG_LIMIT:
+            self.statements[statement] += 1
+
+    def repeated(self, threshold: int = QUERY_REPEAT_WARNING) -> list:
+        """Одинаковые запросы, выполненные threshold раз и больше, - похоже на N+1"""
+        return [(statement, count) for statement, count in self.statements.most_common() if count >= threshold]
+
+    def format_statements(self) -> str:
+        return '\n'.join(f"  {count}x {' '.join(statement.split())}" for statement, count in self.statements.most_common())
+
+_current_stats = ContextVar('query_stats', default=None)
+
+def install_query_counter(engine):
+    """Подписаться на выполнение запросов движка; вызывается один раз"""
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['query_started'].pop()
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.add(statement, (time.perf_counter() - started) * 1000)
+
+@contextmanager
+def count_queries():
+    """Считать запросы внутри блока: with count_queries() as stats: ..."""
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+@contextmanager
+def assert_max_queries(max_count: int):
+    """Для проверок в CI: блок должен уложиться в max_count запросов"""
+    with count_queries() as stats:
+        yield stats
+    if stats.count > max_count:
+        raise AssertionError(f"expected at most {max_count} queries, got {stats.count}:\n{stats.format_statements()}")
+
+class QueryCounterMiddleware(BaseMiddleware):
+    """Пишет в лог обновления, которые вышли за бюджет запросов или сделали одинаковые запросы"""
+
+    def __init__(self, budget: int = QUERY_BUDGET, time_budget_ms: int = QUERY_TIME_BUDGET_MS):
+        super().__init__()
+        self.budget = budget
+        self.time_budget_ms = time_budget_ms
+
+    async def on_pre_process_update(self, update: types.Update, data: dict):
+        stats = QueryStats()
+        data['query_stats'] = stats
+        data['query_stats_token'] = _current_stats.set(stats)
+
+    async def on_post_process_update(self, update: types.Update, results, data: dict):
+        stats = data.pop('query_stats', None)
+        if stats is None:
+            return
+        _current_stats.reset(data.pop('query_stats_token'))
+        if stats.count > self.budget or stats.time_ms > self.time_budget_ms:
+            logging.warning(
+                f"QueryCounterMiddleware: update {update.update_id} made {stats.count} queries "
+                f"in {stats.time_ms:.0f} ms (budget {self.budget} / {self.time_budget_ms} ms):\n{stats.format_statements()}"
+            )
+        for statement, count in stats.repeated():
+            logging.warning(f"QueryCounterMiddleware: update {update.update_id} repeated {count}x: {' '.join(statement.split())}")
@@ -0,0 +1,181 @@
+import asyncio
+import heapq
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+from aiogram.utils.exceptions import RetryAfter, BotBlocked, ChatNotFound, UserDeactivated, CantInitiateConversation
+
+from config import (
+    REMINDERS_UTC_OFFSET_HOURS, REMINDERS_POLL_SECONDS, REMINDERS_RATE,
+    REMINDERS_BATCH_SIZE, REMINDERS_CATCH_UP_HOURS
+)
+from models.database import SessionLocal
+from utils.texts import REMINDER_TEXTS
+from crud.reminder_crud import get_due_reminders, get_reminders_by_ids, reschedule_reminders
+
+# Напоминания о замерах. Расписания живут в таблице reminders, время следующей отправки -
+# в next_due (индекс). Один планировщик на весь бот раз в REMINDERS_POLL_SECONDS читает
+# из базы только то, что наступит до следующего чтения, и держит это в куче по времени:
+# память не зависит от числа пользователей. После простоя просроченные напоминания
+# попадают в первое же чтение (догоняем, но не дольше REMINDERS_CATCH_UP_HOURS).
+# Отправка - пачками не быстрее REMINDERS_RATE сообщений в секунду
+
+REMINDER_KINDS = ('weight', 'girths')
+CADENCES = ('daily', 'weekly', 'monthly')
+# Последнее число месяца, которое есть в каждом месяце
+MAX_MONTH_DAY = 28
+
+LOCAL_TZ = timezone(timedelta(hours=REMINDERS_UTC_OFFSET_HOURS))
+
+def next_due(cadence: str, minutes: int, after: float, weekday: int = None, day: int = None) -> float:
+    """Ближайшая отправка по расписанию строго позже after (unix time)"""
+    local = datetime.fromtimestamp(after, LOCAL_TZ)
+    candidate = local.replace(hour=minutes // 60, minute=minutes % 60, second=0, microsecond=0)
+    if cadence == 'daily':
+        if candidate <= local:
+            candidate += timedelta(days=1)
+    elif cadence == 'weekly':
+        candidate += timedelta(days=(weekday - candidate.weekday()) % 7)
+        if candidate <= local:
+            candidate += timedelta(days=7)
+    elif cadence == 'monthly':
+        candidate = candidate.replace(day=day)
+        if candidate <= local:
+            year, month = (candidate.year + 1, 1) if candidate.month == 12 else (candidate.year, candidate.month + 1)
+            candidate = candidate.replace(year=year, month=month)
+    else:
+        raise ValueError(f"unknown cadence: {cadence}")
+    return candidate.timestamp()
+
+class ReminderScheduler:
+    """Куча ближайших напоминаний, отправка пачками и перенос на следующий раз"""
+
+    def __init__(self, session_factory=SessionLocal, poll_seconds: float = REMINDERS_POLL_SECONDS,
+                 rate: int = REMINDERS_RATE, batch_size: int = REMINDERS_BATCH_SIZE,
+                 catch_up_hours: float = REMINDERS_CATCH_UP_HOURS):
+        self.session_factory = session_factory
+        self.poll_seconds = poll_seconds
+        self.rate = rate
+        self.batch_size = batch_size
+        self.catch_up = catch_up_hours * 3600
+        # Куча (next_due, id) и актуальное время каждого id в ней: запись в куче, время
+        # которой уже не совпадает (расписание изменили), при извлечении пропускается
+        self._heap = []
+        self._due = {}
+        self._next_send = 0.0
+        self.sent = 0
+        self.skipped = 0
+        self.blocked = 0
+
+    def _read(self, func, *args):
+        db = self.session_factory()
+        try:
+            return func(db, *args)
+        finally:
+            db.close()
+
+    def _refill(self, now: float) -> bool:
+        """Дочитать в кучу напоминания до следующего чтения; True - прочитан полный лимит"""
+        limit = self.batch_size * 10
+        rows = self._read(get_due_reminders, now + 2 * self.poll_seconds, limit)
+        for reminder_id, due in rows:
+            if self._due.get(reminder_id) != due:
+                self._due[reminder_id] = due
+                heapq.heappush(self._heap, (due, reminder_id))
+        return len(rows) == limit
+
+    def _pop_due(self, now: float) -> dict:
+        """До batch_size наступивших напоминаний: id -> next_due"""
+        due = {}
+        while self._heap and self._heap[0][0] <= now and len(due) < self.batch_size:
+            when, reminder_id = heapq.heappop(self._heap)
+            if self._due.get(reminder_id) == when:
+                del self._due[reminder_id]
+                due[reminder_id] = when
+        return due
+
+    async def run(self, bot):
+        """Основной цикл планировщика"""
+        logging.info(f"ReminderScheduler: started, poll every {self.poll_seconds}s, rate={self.rate}/s")
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                more = await loop.run_in_executor(None, self._refill, time.time())
+                next_poll = time.time() + (0 if more else self.poll_seconds)
+                while True:
+                    now = time.time()
+                    due = self._pop_due(now)
+                    if due:
+                        await self._fire(bot, due, now)
+                        continue
+                    if now >= next_poll:
+                        break
+                    wake = min(next_poll, self._heap[0][0]) if self._heap else next_poll
+                    await asyncio.sleep(max(0.0, wake - now))
+            except asyncio.CancelledError:
+                logging.info(f"ReminderScheduler: stopped, sent={self.sent}, skipped={self.skipped}, blocked={self.blocked}")
+                raise
+            except Exception as e:
+                logging.error(f"ReminderScheduler error: {e}")
+                await asyncio.sleep(self.poll_seconds)
+
+    async def _fire(self, bot, due: dict, now: float):
+        """Отправить пачку и перенести каждое напоминание на следующий раз"""
+        loop = asyncio.get_running_loop()
+        rows = await loop.run_in_executor(None, self._read, get_reminders_by_ids, list(due))
+        messages, updates = [], []
+        for row in rows:
+            # Расписание изменили или выключили после чтения в кучу
+            if not row.enabled or row.next_due != due[row.id]:
+                continue
+            last_sent = row.last_sent
+            if now - row.next_due <= self.catch_up:
+                messages.append((row.id, row.telegram_id, REMINDER_TEXTS[row.kind]))
+                last_sent = now
+            else:
+                self.skipped += 1
+            updates.append({
+                'id': row.id, 'last_sent': last_sent,
+                'next_due': next_due(row.cadence, row.minutes, now, row.weekday, row.day),
+            })
+        blocked = await self._send_batch(bot, messages)
+        await loop.run_in_executor(None, self._read, reschedule_reminders, updates, blocked)
+
+    async def _send_batch(self, bot, messages: list) -> list:
+        """
+        Не больше rate сообщений в секунду и между пачками: сообщения уходят порциями
+        по пятой части rate, каждая порция сдвигает время следующей на свою долю секунды.
+        Возвращает id напоминаний заблокировавших бота
+        """
+        blocked = []
+        loop = asyncio.get_running_loop()
+        size = max(1, self.rate // 5)
+        for start in range(0, len(messages), size):
+            await asyncio.sleep(max(0.0, self._next_send - loop.time()))
+            chunk = messages[start:start + size]
+            self._next_send = loop.time() + len(chunk) / self.rate
+            results = await asyncio.gather(*[self._send(bot, telegram_id, text) for _, telegram_id, text in chunk])
+            blocked += [reminder_id for (reminder_id, _, _), ok in zip(chunk, results) if ok is None]
+        return blocked
+
+    async def _send(self, bot, telegram_id: int, text: str, retry: bool = True):
+        """True - отправлено, False - ошибка, None - пользователь недоступен навсегда"""
+        try:
+            await bot.send_message(telegram_id, text)
+            self.sent += 1
+            return True
+        except RetryAfter as e:
+            if not retry:
+                return False
+            logging.warning(f"ReminderScheduler: flood control, retry after {e.timeout}s")
+            await asyncio.sleep(e.timeout)
+            return await self._send(bot, telegram_id, text, retry=False)
+        except (BotBlocked, ChatNotFound, UserDeactivated, CantInitiateConversation):
+            self.blocked += 1
+            return None
+        except Exception as e:
+            logging.error(f"ReminderScheduler: can't send to {telegram_id}: {e}")
+            return False
+
+reminder_scheduler = ReminderScheduler()
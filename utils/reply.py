@@ -0,0 +1,88 @@
+import logging
+
+# Ответ из нескольких частей одним-двумя вызовами Bot API вместо вызова на каждую часть.
+# Подряд идущие тексты с одинаковым parse_mode склеиваются в одно сообщение, пока влезают
+# в лимит Telegram; текст рядом с фото уходит в его подпись; клавиатура - на последнее
+# сообщение. Одна часть длиннее лимита не режется - уходит как есть отдельным сообщением
+
+MESSAGE_LIMIT = 4096
+CAPTION_LIMIT = 1024
+PART_SEPARATOR = "\n\n"
+
+def telegram_length(text: str) -> int:
+    """Длина в единицах UTF-16, как считает Telegram (эмодзи - две)"""
+    return len(text.encode('utf-16-le')) // 2
+
+def join_parts(first: str, second: str) -> str:
+    if not first:
+        return second
+    if not second:
+        return first
+    return first + PART_SEPARATOR + second
+
+class ReplyBuilder:
+    """Собирает части ответа и отправляет их минимальным числом сообщений"""
+
+    def __init__(self):
+        self.parts = []
+        self.markup = None
+
+    def text(self, text: str, parse_mode: str = None):
+        self.parts.append({'text': text, 'parse_mode': parse_mode})
+        return self
+
+    def photo(self, photo, caption: str = None, parse_mode: str = None):
+        self.parts.append({'photo': photo, 'text': caption, 'parse_mode': parse_mode})
+        return self
+
+    def keyboard(self, markup):
+        """Клавиатура последнего сообщения"""
+        self.markup = markup
+        return self
+
+    def build(self) -> list:
+        """Сообщения к отправке: тексты склеены, соседние с фото тексты - в подписи"""
+        messages = []
+        for part in self.parts:
+            last = messages[-1] if messages else None
+            if last and self._can_merge(last, part):
+                if 'photo' in part:
+                    # Текст перед фото становится началом его подписи
+                    messages[-1] = dict(part, text=join_parts(last['text'], part['text']),
+                                        parse_mode=last['parse_mode'] or part['parse_mode'])
+                else:
+                    last['text'] = join_parts(last['text'], part['text'])
+                    last['parse_mode'] = last['parse_mode'] or part['parse_mode']
+            else:
+                messages.append(dict(part))
+        return messages
+
+    @staticmethod
+    def _can_merge(last: dict, part: dict) -> bool:
+        if 'photo' in last and 'photo' in part:
+            return False
+        # Пустая подпись фото не задает разметку
+        if last['text'] and part['text'] and last['parse_mode'] != part['parse_mode']:
+            return False
+        limit = CAPTION_LIMIT if 'photo' in last or 'photo' in part else MESSAGE_LIMIT
+        return telegram_length(join_parts(last['text'], part['text'])) <= limit
+
+    async def send(self, bot, chat_id: int) -> list:
+        """Отправить ответ; возвращает отправленные сообщения по порядку"""
+        messages = self.build()
+        logging.info(f"ReplyBuilder: chat={chat_id}, parts={len(self.parts)}, messages={len(messages)}")
+        sent = []
+        for i, message in enumerate(messages):
+            markup = self.markup if i == len(messages) - 1 else None
+            if 'photo' in message:
+                sent.append(await bot.send_photo(
+                    chat_id, photo=message['photo'], caption=message['text'] or None,
+                    parse_mode=message['parse_mode'], reply_markup=markup
+                ))
+            else:
+                sent.append(await bot.send_message(
+                    chat_id, message['text'], parse_mode=message['parse_mode'], reply_markup=markup
+                ))
+        self.parts = []
+        self.markup = None
+        return sent
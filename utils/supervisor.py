@@ -0,0 +1,150 @@
+import asyncio
+import bisect
+import gc
+import hashlib
+import logging
+import multiprocessing
+import os
+
+import aiohttp
+from aiogram import Bot, Dispatcher, types
+from aiogram.contrib.fsm_storage.memory import MemoryStorage
+
+from utils.ordered_dispatcher import OrderedDispatcher, USER_UPDATE_FIELDS
+
+# Режим супервизора: родитель один забирает обновления у Telegram и раздает их
+# N рабочим процессам. Пользователь всегда попадает в один и тот же процесс
+# (консистентное хеширование по telegram_id), поэтому его FSM-состояние в MemoryStorage
+# живет в одном месте. Процессы форкаются до начала опроса, после gc.freeze(),
+# чтобы импортированные модули (matplotlib, обработчики) делились copy-on-write
+
+# Виртуальных узлов на процесс: сглаживает распределение пользователей по кольцу
+HASH_RING_REPLICAS = 64
+WORKER_QUEUE_SIZE = 1000
+POLLING_TIMEOUT = 20
+# Запас к long polling на сам HTTP-запрос
+POLLING_REQUEST_MARGIN = 10
+POLLING_ERROR_SLEEP = 5
+
+class HashRing:
+    """Кольцо консистентного хеширования: telegram_id -> номер рабочего процесса"""
+
+    def __init__(self, nodes: int, replicas: int = HASH_RING_REPLICAS):
+        points = sorted(
+            (self._hash(f"{node}:{replica}"), node)
+            for node in range(nodes)
+            for replica in range(replicas)
+        )
+        self._keys = [key for key, _ in points]
+        self._nodes = [node for _, node in points]
+
+    @staticmethod
+    def _hash(value) -> int:
+        # Встроенный hash() для строк свой в каждом процессе, нужен стабильный
+        return int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), 'big')
+
+    def get_node(self, key) -> int:
+        index = bisect.bisect(self._keys, self._hash(key)) % len(self._keys)
+        return self._nodes[index]
+
+def get_update_user_id(update: dict):
+    """telegram_id отправителя из сырого обновления; None, если отправителя нет"""
+    for field in USER_UPDATE_FIELDS:
+        if field in update:
+            return (update[field].get('from') or {}).get('id')
+    return None
+
+def run_worker(index: int, queue, setup):
+    """Рабочий процесс: свой бот, свой Dispatcher с обработчиками, обновления из очереди"""
+    gc.enable()
+    # Соединения с базой, открытые родителем до форка, не переиспользуем
+    from models.database import engine
+    engine.dispose(close=False)
+    asyncio.run(_worker_loop(index, queue, setup))
+
+async def _worker_loop(index: int, queue, setup):
+    from config import BOT_TOKEN
+    bot = Bot(token=BOT_TOKEN)
+    dp = OrderedDispatcher(bot, storage=MemoryStorage())
+    Dispatcher.set_current(dp)
+    Bot.set_current(bot)
+    await setup(dp)
+    logging.info(f"worker {index}: started, pid={os.getpid()}")
+
+    loop = asyncio.get_running_loop()
+    tasks = set()
+    try:
+        while True:
+            data = await loop.run_in_executor(None, queue.get)
+            if data is None:
+                break
+            task = loop.create_task(dp.process_updates([types.Update.to_object(data)]))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        from utils.events import event_log
+        await event_log.stop()
+        await dp.storage.close()
+        session = await bot.get_session()
+        await session.close()
+        logging.info(f"worker {index}: stopped, queueing delay ms: {dp.get_delay_stats()}")
+
+def start_workers(count: int, setup) -> list:
+    """
+    Форкает рабочие процессы. Вызывать до того, как родитель откроет
+    сетевые соединения и запустит event loop
+    """
+    # Все, что уже загружено, уходит в постоянное поколение: сборщик мусора в детях
+    # не будет трогать эти объекты и копировать их страницы
+    gc.collect()
+    gc.freeze()
+    context = multiprocessing.get_context('fork')
+    workers = []
+    for index in range(count):
+        queue = context.Queue(WORKER_QUEUE_SIZE)
+        process = context.Process(target=run_worker, args=(index, queue, setup), name=f"bot-worker-{index}", daemon=True)
+        process.start()
+        workers.append((process, queue))
+    gc.unfreeze()
+    logging.info(f"start_workers: started {count} workers")
+    return workers
+
+async def poll_and_route(bot: Bot, workers: list):
+    """Единственный опрос Telegram в родителе; каждое обновление - в процесс его пользователя"""
+    ring = HashRing(len(workers))
+    loop = asyncio.get_running_loop()
+    await bot.delete_webhook(drop_pending_updates=True)
+    offset = None
+    request_timeout = aiohttp.ClientTimeout(total=POLLING_TIMEOUT + POLLING_REQUEST_MARGIN)
+    while True:
+        dead = [process.name for process, _ in workers if not process.is_alive()]
+        if dead:
+            # FSM-состояния умершего процесса потеряны; пусть менеджер процессов перезапустит бота целиком
+            raise RuntimeError(f"workers died: {', '.join(dead)}")
+        try:
+            with bot.request_timeout(request_timeout):
+                updates = await bot.get_updates(offset=offset, timeout=POLLING_TIMEOUT)
+        except Exception as e:
+            logging.error(f"poll_and_route: get_updates error: {e}")
+            await asyncio.sleep(POLLING_ERROR_SLEEP)
+            continue
+        for update in updates:
+            data = update.to_python()
+            user_id = get_update_user_id(data)
+            node = ring.get_node(user_id if user_id is not None else data['update_id'])
+            await loop.run_in_executor(None, workers[node][1].put, data)
+        if updates:
+            offset = updates[-1].update_id + 1
+
+def stop_workers(workers: list, timeout: float = 10):
+    """Дать процессам доработать очередь и остановить их"""
+    for process, queue in workers:
+        if process.is_alive():
+            queue.put(None)
+    for process, _ in workers:
+        process.join(timeout)
+        if process.is_alive():
+            process.terminate()
+    logging.info("stop_workers: all workers stopped")
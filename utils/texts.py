@@ -1,3 +1,50 @@
+from datetime import datetime
+import logging
+
+# Общие справочники: собираются один раз при импорте, а не в каждом обработчике
+SPORT_NAMES = {
+    'none': '❌ Не занимаюсь',
+    'walking': '🚶 Ходьба/Прогулки',
+    'running': '🏃 Бег/Кардио',
+    'strength': '🏋️ Тренажерный зал',
+    'yoga': '🧘 Йога/Пилатес',
+    'swimming': '🏊 Плавание',
+    'cycling': '🚴 Велосипед',
+    'team': '⚽ Футбол/Баскетбол'
+}
+# Короткие подписи итогов анкеты - исторически свои
+RESULT_SPORT_NAMES = dict(SPORT_NAMES, none='❌ Нет спорта', walking='🚶 Ходьба', running='🏃 Бег',
+                          strength='🏋️‍♂️ Силовые тренировки', yoga='🧘 Йога')
+# Подписи в отметке "✅ Выбрано" - без эмодзи
+SPORT_ECHO_NAMES = {
+    'none': 'Не занимаюсь',
+    'walking': 'Ходьба/Прогулки',
+    'running': 'Бег/Кардио',
+    'strength': 'Тренажерный зал',
+    'yoga': 'Йога/Пилатес',
+    'swimming': 'Плавание',
+    'cycling': 'Велосипед',
+    'team': 'Футбол/Баскетбол'
+}
+
+GOAL_NAMES = {
+    'healthy': '🧘 Здоровое тело',
+    'athletic': '🏋 Спортивное тело',
+    'lean': '🔥 Сухое тело'
+}
+GOAL_ECHO_NAMES = {
+    'healthy': 'Здоровое тело',
+    'athletic': 'Спортивное тело',
+    'lean': 'Сухое тело'
+}
+
+FREQ_NAMES = {
+    '1_2': '1-2 раза',
+    '3_4': '3-4 раза',
+    '5_6': '5-6 раз',
+    'daily': 'Ежедневно'
+}
+
 def get_welcome_text() -> str:
     return (
         "Спасибо, что перешел, ты уже большой молодец! 🎉\n\n"
@@ -64,19 +111,20 @@ def get_goal_request() -> str:
 
 Выберите вашу цель:"""
 
-def get_goal_description(goal: str) -> str:
-    descriptions = {
-        'healthy': """🧘 Здоровое тело
+GOAL_DESCRIPTIONS = {
+    'healthy': """🧘 Здоровое тело
 Поддержание здоровья и хорошего самочувствия
 Рекомендуется для большинства людей""",
-        'athletic': """🏋 Спортивное тело
+    'athletic': """🏋 Спортивное тело
 Набор мышечной массы и силы
 Для тех, кто хочет стать сильнее""",
-        'lean': """🔥 Сухое тело
+    'lean': """🔥 Сухое тело
 Снижение процента жира
 Для тех, кто хочет стать стройнее"""
-    }
-    return descriptions.get(goal, "Неизвестная цель")
+}
+
+def get_goal_description(goal: str) -> str:
+    return GOAL_DESCRIPTIONS.get(goal, "Неизвестная цель")
 
 def get_main_menu_text() -> str:
     return """🏠 Главное меню
@@ -142,37 +190,75 @@ def get_progress_text(weight_change: float, bodyfat_change: float, measurements_
     
     return text
 
+def get_quick_measurements_help() -> str:
+    return """⚡ Быстрые замеры одной командой
+
+/m 82.5 — только вес
+/m 82.5 80 38 — вес, талия, шея
+/m 82.5 80 38 95 — вес, талия, шея, бёдра (для женщин)
+
+Рост, цель и активность берутся из последних замеров."""
+
+def get_import_help() -> str:
+    return """📥 Импорт истории замеров
+
+Пришлите CSV-файл документом. В первой строке - названия колонок:
+date,weight,waist,neck,hip,height
+
+• date и weight обязательны, остальные - по желанию
+• дата: 2024-03-15 или 15.03.2024
+• формат совпадает с выгрузкой /export
+
+Повторная дата обновит существующую запись.
+Чтобы отменить, отправьте любое сообщение."""
+
+def get_import_report_text(report: dict) -> str:
+    text = f"📥 **Импорт завершен**\n\n✅ Принято строк: {report['accepted']}\n❌ Отклонено строк: {report['rejected']}"
+    if report['errors']:
+        text += "\n\n" + "\n".join(f"• {error}" for error in report['errors'])
+    return text
+
 def get_validation_error(error: str) -> str:
     return f"❌ Ошибка: {error}\n\nПопробуйте ещё раз!"
 
 def get_success_message() -> str:
     return "✅ Данные успешно сохранены!"
 
+KBJU_TEMPLATE = """🍽 Ваши КБЖУ:
+
+🔥 Калории: {calories} ккал
+🥩 Белки: {protein} г
+🥑 Жиры: {fat} г
+🍞 Углеводы: {carbs} г"""
+
 def get_kbju_text(kbju: dict) -> str:
-    return f"""🍽 Ваши КБЖУ:
+    return KBJU_TEMPLATE.format(**kbju)
+
+FINAL_RESULTS_TEMPLATE = """🎉 **Твои результаты готовы!**
+
+📊 **Основные данные:**
+👤 Имя: {name}
+🎂 Дата рождения: {birthday}
+🗓 Возраст: {age}
+👥 Пол: {sex}
+📏 Рост: {height} см
+⚖️ Вес: {weight} кг
+
+🏃‍♂️ **Активность:**
+👟 Шаги в день: {steps}
+🏋️ Спорт: {sport}
+📅 Частота: {sport_freq} раз в неделю
+
+📐 **Обмеры:**
+📏 Талия: {waist} см
+📏 Шея: {neck} см{hip_line}
 
-🔥 Калории: {kbju['calories']} ккал
-🥩 Белки: {kbju['protein']} г
-🥑 Жиры: {kbju['fat']} г
-🍞 Углеводы: {kbju['carbs']} г"""
+🎯 **Цель:** {goal}
+
+📊 **Результаты расчётов:**
+🔥 Процент жира: {bodyfat}%"""
 
 def get_final_results_text(user_data: dict, bodyfat: float) -> str:
-    from datetime import datetime
-    goal_names = {
-        'healthy': '🧘 Здоровое тело',
-        'athletic': '🏋 Спортивное тело', 
-        'lean': '🔥 Сухое тело'
-    }
-    sport_names = {
-        'none': '❌ Нет спорта',
-        'walking': '🚶 Ходьба',
-        'running': '🏃 Бег',
-        'strength': '🏋️‍♂️ Силовые тренировки',
-        'yoga': '🧘 Йога',
-        'swimming': '🏊 Плавание',
-        'cycling': '🚴 Велосипед',
-        'team': '⚽ Футбол/Баскетбол'
-    }
     # Возраст
     birthday = user_data.get('birthday', '')
     age = ''
@@ -182,49 +268,96 @@ def get_final_results_text(user_data: dict, bodyfat: float) -> str:
             today = datetime.today()
             age = today.year - bdate.year - ((today.month, today.day) < (bdate.month, bdate.day))
         except Exception as e:
-            import logging
             logging.error(f"Error calculating age from birthday '{birthday}': {e}")
             age = ''
-    text = f"""🎉 **Твои результаты готовы!**
+    return FINAL_RESULTS_TEMPLATE.format(
+        name=user_data.get('name', 'Не указано'),
+        birthday=user_data.get('birthday', 'Не указано'),
+        age=age if age != '' else 'Не определён',
+        sex='Мужской' if user_data.get('sex') == 'male' else 'Женский',
+        height=user_data.get('height', 'Не указано'),
+        weight=user_data.get('weight', 'Не указано'),
+        steps=user_data.get('steps', 'Не указано'),
+        sport=RESULT_SPORT_NAMES.get(user_data.get('sport_type'), 'Не указано'),
+        sport_freq=user_data.get('sport_freq', 'Не указано'),
+        waist=user_data.get('waist', 'Не указано'),
+        neck=user_data.get('neck', 'Не указано'),
+        hip_line=f"\n📏 Бёдра: {user_data.get('hip')} см" if user_data.get('hip') else '',
+        goal=GOAL_NAMES.get(user_data.get('goal'), 'Не указана'),
+        bodyfat=bodyfat
+    )
 
-📊 **Основные данные:**
-👤 Имя: {user_data.get('name', 'Не указано')}
-🎂 Дата рождения: {user_data.get('birthday', 'Не указано')}
-🗓 Возраст: {age if age != '' else 'Не определён'}
-👥 Пол: {'Мужской' if user_data.get('sex') == 'male' else 'Женский'}
-📏 Рост: {user_data.get('height', 'Не указано')} см
-⚖️ Вес: {user_data.get('weight', 'Не указано')} кг
+MY_DATA_TEMPLATE = """📊 **Ваши данные**
 
-🏃‍♂️ **Активность:**
-👟 Шаги в день: {user_data.get('steps', 'Не указано')}
-🏋️ Спорт: {sport_names.get(user_data.get('sport_type'), 'Не указано')}
-📅 Частота: {user_data.get('sport_freq', 'Не указано')} раз в неделю
+👤 **Основная информация:**
+• Имя: {first_name}
+• Дата рождения: {date_of_birth}
+• Пол: {sex}
+• Рост: {height} см
 
-📐 **Обмеры:**
-📏 Талия: {user_data.get('waist', 'Не указано')} см
-📏 Шея: {user_data.get('neck', 'Не указано')} см"""
-    if user_data.get('hip'):
-        text += f"\n📏 Бёдра: {user_data.get('hip')} см"
-    text += f"""
-
-🎯 **Цель:** {goal_names.get(user_data.get('goal'), 'Не указана')}
+🏃‍♂️ **Активность:**
+• Шаги в день: {steps}
+• Спорт: {sport}
+• Частота: {sport_freq} раз в неделю
+
+📐 **Последние замеры:**
+• Вес: {weight} кг{girth_lines}
+
+🎯 **Цель:** {goal}
+🔥 **Процент жира:** {bodyfat:.1f}%"""
+
+def get_girth_lines(latest_record) -> str:
+    """Обхваты последней записи; у замера одного веса их нет - строк тоже нет"""
+    if not latest_record:
+        return "\n• Талия: Не указано\n• Шея: Не указано"
+    lines = ''
+    for title, value in (('Талия', latest_record.waist), ('Шея', latest_record.neck), ('Бёдра', latest_record.hip)):
+        if value:
+            lines += f"\n• {title}: {value} см"
+    return lines
+
+def get_my_data_text(user, latest_record, bodyfat: float) -> str:
+    """Карточка «Мои данные» по пользователю и его последней записи"""
+    missing = 'Не указано'
+    return MY_DATA_TEMPLATE.format(
+        first_name=user.first_name,
+        date_of_birth=user.date_of_birth,
+        sex='Мужской' if user.sex == 'male' else 'Женский',
+        height=latest_record.height if latest_record else missing,
+        steps=latest_record.steps if latest_record else missing,
+        sport=SPORT_NAMES.get(latest_record.sport_type, missing) if latest_record else missing,
+        sport_freq=latest_record.sport_freq if latest_record else missing,
+        weight=latest_record.weight if latest_record else missing,
+        girth_lines=get_girth_lines(latest_record),
+        goal=GOAL_NAMES.get(latest_record.goal, 'Не указана') if latest_record else 'Не указана',
+        bodyfat=bodyfat
+    )
 
-📊 **Результаты расчётов:**
-🔥 Процент жира: {bodyfat}%"""
+def get_goal_comparison_text(goals_kbju: dict, current_goal: str) -> str:
+    """Сравнение КБЖУ всех целей одним сообщением"""
+    text = "🎯 **КБЖУ для каждой цели**\n"
+    for goal, kbju in goals_kbju.items():
+        title = GOAL_NAMES.get(goal, goal)
+        if goal == current_goal:
+            title += " (текущая)"
+        if kbju:
+            text += (
+                f"\n**{title}**\n"
+                f"🔥 {kbju['calories']} ккал • 🥩 {kbju['protein']} г • 🥑 {kbju['fat']} г • 🍞 {kbju['carbs']} г\n"
+            )
+        else:
+            text += f"\n**{title}**\n⛔ Недоступно при текущем проценте жира\n"
+    text += "\nВыберите новую цель:"
     return text
 
-def get_kbju_explanation(goal: str, kbju: dict) -> str:
-    """
-    Дружелюбное объяснение КБЖУ и советы по каждой цели
-    """
-    explanations = {
-        'healthy': f"""
+KBJU_EXPLANATION_TEMPLATES = {
+    'healthy': """
 🧘 Мы рассчитали твой примерный КБЖУ для поддержания здоровья!
 
-🔥 Калории: {kbju['calories']} ккал
-🥩 Белки: {kbju['protein']} г
-🥑 Жиры: {kbju['fat']} г
-🍞 Углеводы: {kbju['carbs']} г
+🔥 Калории: {calories} ккал
+🥩 Белки: {protein} г
+🥑 Жиры: {fat} г
+🍞 Углеводы: {carbs} г
 
 🧘 **Совет:**
 Старайся питаться разнообразно и регулярно.
@@ -234,13 +367,13 @@ def get_kbju_explanation(goal: str, kbju: dict) -> str:
 
 Ты молодец! 🌟
 """,
-        'athletic': f"""
+    'athletic': """
 🏋️ Мы рассчитали твой примерный КБЖУ для набора мышечной массы!
 
-🔥 Калории: {kbju['calories']} ккал
-🥩 Белки: {kbju['protein']} г
-🥑 Жиры: {kbju['fat']} г
-🍞 Углеводы: {kbju['carbs']} г
+🔥 Калории: {calories} ккал
+🥩 Белки: {protein} г
+🥑 Жиры: {fat} г
+🍞 Углеводы: {carbs} г
 
 🏋️ **Совет:**
 Эти значения помогут тебе расти и становиться сильнее.
@@ -250,13 +383,13 @@ def get_kbju_explanation(goal: str, kbju: dict) -> str:
 
 Вперёд к результату! 🚀
 """,
-        'lean': f"""
+    'lean': """
 🔥 Мы рассчитали твой примерный КБЖУ для снижения процента жира!
 
-🔥 Калории: {kbju['calories']} ккал
-🥩 Белки: {kbju['protein']} г
-🥑 Жиры: {kbju['fat']} г
-🍞 Углеводы: {kbju['carbs']} г
+🔥 Калории: {calories} ккал
+🥩 Белки: {protein} г
+🥑 Жиры: {fat} г
+🍞 Углеводы: {carbs} г
 
 🔥 **Совет:**
 С таким КБЖУ ты сможешь снижать процент жира, сохраняя мышцы.
@@ -266,5 +399,117 @@ def get_kbju_explanation(goal: str, kbju: dict) -> str:
 
 Ты на правильном пути! 💪
 """
-    }
-    return explanations.get(goal, "Нет данных по цели") 
\ No newline at end of file
+}
+
+def get_kbju_explanation(goal: str, kbju: dict) -> str:
+    """
+    Дружелюбное объяснение КБЖУ и советы по каждой цели
+    """
+    template = KBJU_EXPLANATION_TEMPLATES.get(goal)
+    if template is None:
+        return "Нет данных по цели"
+    return template.format(**kbju)
+
+MEAL_NAMES = {
+    'breakfast': '🌅 Завтрак',
+    'lunch': '🍲 Обед',
+    'dinner': '🌙 Ужин',
+    'snack': '🍏 Перекус'
+}
+
+def get_meal_plan_text(plan: dict) -> str:
+    """Меню на день: приемы пищи с граммовками и итог против КБЖУ"""
+    text = "🍽 **Меню на день**\n"
+    for meal, items in plan['meals']:
+        text += f"\n**{MEAL_NAMES.get(meal, meal)}** (~{sum(kcal for _, _, kcal in items)} ккал)\n"
+        for name, grams, _ in items:
+            text += f"• {name} — {grams} г\n"
+    totals, targets = plan['totals'], plan['targets']
+    text += (
+        f"\n**Итого:**\n"
+        f"🔥 {totals['calories']} / {targets['calories']} ккал\n"
+        f"🥩 {totals['protein']} / {targets['protein']} г • "
+        f"🥑 {totals['fat']} / {targets['fat']} г • "
+        f"🍞 {totals['carbs']} / {targets['carbs']} г\n"
+    )
+    if not plan['within_tolerance']:
+        text += "\n⚠️ Точно попасть в КБЖУ из этих продуктов не вышло - это ближайший вариант"
+    text += "\nВес круп и макарон - в сухом виде."
+    return text
+
+DIARY_MACROS = (
+    ('protein', '🥩 Белки'),
+    ('fat', '🥑 Жиры'),
+    ('carbs', '🍞 Углеводы')
+)
+
+def get_diary_text(totals, targets: dict, items: list = ()) -> str:
+    """Дневник за сегодня: съедено против КБЖУ и сколько осталось"""
+    eaten = {column: getattr(totals, column) if totals else 0 for column in ('calories', 'protein', 'fat', 'carbs')}
+    text = "🍽 **Дневник за сегодня**\n"
+    if items:
+        text += "\n" + "".join(f"• {item.name}, {item.grams:.0f} г — {item.calories:.0f} ккал\n" for item in items)
+    if not targets or not targets.get('calories'):
+        text += (
+            f"\n🔥 Съедено: {eaten['calories']:.0f} ккал • "
+            f"Б {eaten['protein']:.0f} • Ж {eaten['fat']:.0f} • У {eaten['carbs']:.0f} г\n"
+            "\n📝 Сделайте замеры, чтобы видеть, сколько осталось до нормы КБЖУ"
+        )
+        return text
+    left = targets['calories'] - eaten['calories']
+    text += f"\n🔥 Калории: {eaten['calories']:.0f} / {targets['calories']} ккал"
+    text += f" (осталось {left:.0f})\n" if left >= 0 else f" (перебор {-left:.0f})\n"
+    for column, title in DIARY_MACROS:
+        text += f"{title}: {eaten[column]:.0f} / {targets[column]} г\n"
+    return text
+
+def get_diary_added_text(foods: list, not_found: list, totals, targets: dict) -> str:
+    """Ответ на /eat: что записано, что не нашлось, и итог дня"""
+    text = ""
+    if foods:
+        text += "✅ Записано:\n" + "".join(
+            f"• {food['name']}, {food['grams']} г — {food['calories']:.0f} ккал\n" for food in foods
+        ) + "\n"
+    if not_found:
+        text += "❓ Не нашел в базе продуктов: " + ", ".join(not_found) + "\n\n"
+    return text + get_diary_text(totals, targets)
+
+REMINDER_TEXTS = {
+    'weight': "⚖️ Пора взвеситься! Отправьте вес командой /m 75.5 - тренд и прогноз обновятся сразу",
+    'girths': "📏 Пора измерить обхваты: «📝 Новые замеры» в /menu или /m вес талия шея [бёдра]"
+}
+
+REMINDER_NAMES = {
+    'weight': '⚖️ Взвешивание',
+    'girths': '📏 Обхваты'
+}
+
+WEEKDAY_NAMES = ('понедельник', 'вторник', 'среду', 'четверг', 'пятницу', 'субботу', 'воскресенье')
+
+def get_reminder_schedule_text(reminder) -> str:
+    """Расписание напоминания словами, например «каждый день в 09:00»"""
+    at = f"в {reminder.minutes // 60:02d}:{reminder.minutes % 60:02d}"
+    if reminder.cadence == 'daily':
+        return f"каждый день {at}"
+    if reminder.cadence == 'weekly':
+        return f"каждую неделю в {WEEKDAY_NAMES[reminder.weekday]} {at}"
+    return f"каждый месяц {reminder.day}-го числа {at}"
+
+def get_reminders_text(reminders: list) -> str:
+    """Список напоминаний пользователя и подсказка по /remind"""
+    text = "⏰ **Напоминания о замерах**\n\n"
+    active = [reminder for reminder in reminders if reminder.enabled]
+    if active:
+        text += "".join(
+            f"{REMINDER_NAMES[reminder.kind]}: {get_reminder_schedule_text(reminder)}\n" for reminder in active
+        )
+    else:
+        text += "Напоминаний пока нет.\n"
+    text += (
+        "\nНастроить:\n"
+        "/remind вес пн 08:00 - взвешивание по понедельникам\n"
+        "/remind вес ежедневно 07:30 - каждый день\n"
+        "/remind обхваты 1 09:00 - обхваты 1-го числа месяца\n"
+        "/remind выкл [вес|обхваты] - выключить"
+    )
+    return text
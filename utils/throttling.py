@@ -0,0 +1,85 @@
+import logging
+import time
+
+from aiogram import types
+from aiogram.dispatcher.handler import CancelHandler, current_handler
+from aiogram.dispatcher.middlewares import BaseMiddleware
+
+from config import THROTTLE_RATE, THROTTLE_BURST
+
+# Антифлуд по алгоритму GCRA: на пользователя хранится одно число - теоретическое время
+# прихода следующего запроса (TAT). Это то же ведро токенов на THROTTLE_BURST токенов,
+# пополняемое со скоростью THROTTLE_RATE в секунду, только без отдельных счетчиков
+
+DEFAULT_COST = 1
+# График прогресса, выгрузка, импорт: запросы к полной истории и matplotlib
+EXPENSIVE_COST = 5
+THROTTLE_MESSAGE = "⏳ Слишком много запросов. Подождите несколько секунд."
+# Раз во столько проверок удаляем пользователей с полным ведром
+THROTTLE_CLEANUP_EVERY = 10000
+
+def throttle_cost(cost):
+    """
+    Стоимость обработчика в токенах: число или функция от события (сообщения/callback),
+    если стоимость зависит от данных. Без декоратора обработчик стоит DEFAULT_COST
+    """
+    def decorator(handler):
+        handler.throttle_cost = cost
+        return handler
+    return decorator
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Отбрасывает обновления пользователя, у которого кончились токены"""
+
+    def __init__(self, rate: float = THROTTLE_RATE, burst: float = THROTTLE_BURST):
+        super().__init__()
+        self.interval = 1 / rate
+        self.tolerance = burst * self.interval
+        # telegram_id -> TAT
+        self._tat = {}
+        # Кому уже ответили "подождите": до следующего пропущенного запроса молчим
+        self._warned = set()
+        self._checks = 0
+
+    def allow(self, user_id: int, cost: float) -> bool:
+        """Списать cost токенов, если они есть"""
+        now = time.monotonic()
+        tat = max(self._tat.get(user_id, now), now) + cost * self.interval
+        self._checks += 1
+        if self._checks % THROTTLE_CLEANUP_EVERY == 0:
+            self._cleanup(now)
+        if tat - now > self.tolerance:
+            return False
+        self._tat[user_id] = tat
+        self._warned.discard(user_id)
+        return True
+
+    def _cleanup(self, now: float):
+        self._tat = {user_id: tat for user_id, tat in self._tat.items() if tat > now}
+        self._warned = {user_id for user_id in self._warned if user_id in self._tat}
+
+    def _get_cost(self, event) -> float:
+        handler = current_handler.get()
+        cost = getattr(handler, 'throttle_cost', DEFAULT_COST)
+        return cost(event) if callable(cost) else cost
+
+    async def on_process_message(self, message: types.Message, data: dict):
+        if self.allow(message.from_user.id, self._get_cost(message)):
+            return
+        logging.warning(f"ThrottlingMiddleware: user={message.from_user.id} throttled, text={message.text}")
+        if message.from_user.id not in self._warned:
+            self._warned.add(message.from_user.id)
+            await message.answer(THROTTLE_MESSAGE)
+        raise CancelHandler()
+
+    async def on_process_callback_query(self, callback: types.CallbackQuery, data: dict):
+        if self.allow(callback.from_user.id, self._get_cost(callback)):
+            return
+        logging.warning(f"ThrottlingMiddleware: user={callback.from_user.id} throttled, data={callback.data}")
+        # Ответ на callback нужен в любом случае, иначе у кнопки крутятся часики
+        if callback.from_user.id not in self._warned:
+            self._warned.add(callback.from_user.id)
+            await callback.answer(THROTTLE_MESSAGE)
+        else:
+            await callback.answer()
+        raise CancelHandler()
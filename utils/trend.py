@@ -0,0 +1,102 @@
+import math
+from datetime import date, timedelta
+
+# Тренд веса пользователя без пересчета всей истории: каждый замер меняет несколько чисел.
+# Сглаженный вес - экспоненциальное среднее (EMA), скорость - наклон взвешенного МНК,
+# где старые точки затухают с полупериодом TREND_HALF_LIFE_DAYS. Начало координат
+# МНК всегда в дате последнего замера (x - дни до нее), поэтому суммы не растут со временем
+
+# Доля нового замера в EMA при ежедневных замерах
+TREND_EMA_ALPHA = 0.1
+TREND_HALF_LIFE_DAYS = 30
+# Дальше прогноз не показываем: при почти нулевой скорости он бессмысленен
+TREND_ETA_MAX_DAYS = 730
+# Цель считается достигнутой, если сглаженный вес ближе, кг
+TREND_TARGET_TOLERANCE = 0.2
+
+TREND_SUMS = ('sum_w', 'sum_x', 'sum_y', 'sum_xx', 'sum_xy')
+
+def reset_trend(trend):
+    """Пустой тренд: trend - любой объект с полями тренда (строка UserWeightTrend)"""
+    trend.last_date = None
+    trend.last_weight = None
+    trend.prev_date = None
+    trend.prev_ema = None
+    trend.ema = None
+    trend.points = 0
+    for name in TREND_SUMS:
+        setattr(trend, name, 0.0)
+
+def _ema_alpha(days: int) -> float:
+    # Пропущенные дни: как если бы все это время вес был прежним
+    return 1 - (1 - TREND_EMA_ALPHA) ** max(days, 1)
+
+def add_trend_point(trend, day: date, weight: float):
+    """
+    Учесть замер за day, который не раньше последнего учтенного.
+    Замер за тот же день заменяет предыдущий (запись за день перезаписывается)
+    """
+    if trend.last_date is None:
+        trend.ema = weight
+    elif day == trend.last_date:
+        # Точка с x = 0 входит только в sum_w и sum_y; EMA пересчитываем от предыдущего дня
+        trend.sum_y += weight - trend.last_weight
+        if trend.prev_date is None:
+            trend.ema = weight
+        else:
+            days = (day - trend.prev_date).days
+            trend.ema = trend.prev_ema + _ema_alpha(days) * (weight - trend.prev_ema)
+        trend.last_weight = weight
+        return
+    else:
+        days = (day - trend.last_date).days
+        # Перенос начала координат на day: x -> x - days, затем затухание старых точек
+        decay = 0.5 ** (days / TREND_HALF_LIFE_DAYS)
+        sum_w, sum_x, sum_y, sum_xx, sum_xy = (getattr(trend, name) for name in TREND_SUMS)
+        trend.sum_xx = (sum_xx - 2 * days * sum_x + days * days * sum_w) * decay
+        trend.sum_xy = (sum_xy - days * sum_y) * decay
+        trend.sum_x = (sum_x - days * sum_w) * decay
+        trend.sum_y = sum_y * decay
+        trend.sum_w = sum_w * decay
+        trend.prev_date = trend.last_date
+        trend.prev_ema = trend.ema
+        trend.ema = trend.ema + _ema_alpha(days) * (weight - trend.ema)
+
+    trend.sum_w += 1
+    trend.sum_y += weight
+    trend.last_date = day
+    trend.last_weight = weight
+    trend.points += 1
+
+def get_trend_slope(trend):
+    """Наклон МНК, кг в день; None, пока точек меньше двух"""
+    if trend.points < 2:
+        return None
+    denominator = trend.sum_w * trend.sum_xx - trend.sum_x ** 2
+    if abs(denominator) < 1e-9:
+        return None
+    return (trend.sum_w * trend.sum_xy - trend.sum_x * trend.sum_y) / denominator
+
+def forecast_trend(trend, target_weight: float = None) -> dict:
+    """
+    Сглаженный вес, скорость в неделю и дата достижения целевого веса.
+    eta - None, если цели нет, вес идет не в ту сторону или до цели дальше TREND_ETA_MAX_DAYS
+    """
+    slope = get_trend_slope(trend)
+    forecast = {
+        'trend_weight': round(trend.ema, 1),
+        'weekly_rate': round(slope * 7, 2) if slope is not None else None,
+        'target_weight': target_weight,
+        'reached': False,
+        'eta': None,
+    }
+    if target_weight is None:
+        return forecast
+    remaining = target_weight - trend.ema
+    if abs(remaining) <= TREND_TARGET_TOLERANCE:
+        forecast['reached'] = True
+    elif slope and remaining * slope > 0:
+        days = remaining / slope
+        if days <= TREND_ETA_MAX_DAYS:
+            forecast['eta'] = trend.last_date + timedelta(days=math.ceil(days))
+    return forecast
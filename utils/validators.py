@@ -155,4 +155,36 @@ def validate_hip_measurement(measurement: str) -> bool:
         measurement_val = float(measurement.strip())
         return 50 <= measurement_val <= 200
     except ValueError:
-        return False 
\ No newline at end of file
+        return False
+
+def parse_quick_measurements(text: str, sex: str) -> tuple[bool, dict]:
+    """
+    Разбор замеров одной строкой: «вес» или «вес талия шея [бёдра]».
+    Бёдра обязательны для женщин и не нужны мужчинам.
+    Возвращает (True, данные) или (False, текст ошибки)
+    """
+    values = [value.replace(',', '.') for value in (text or '').split()]
+    girths_count = 3 if sex == 'female' else 2
+
+    if len(values) not in (1, 1 + girths_count):
+        if sex == 'female':
+            return False, "Укажите только вес или вес, талию, шею и бёдра"
+        return False, "Укажите только вес или вес, талию и шею"
+
+    if not validate_weight(values[0]):
+        return False, "Вес должен быть числом от 30 до 300 кг"
+    data = {'weight': float(values[0])}
+    if len(values) == 1:
+        return True, data
+
+    if not validate_waist_measurement(values[1]):
+        return False, "Обхват талии должен быть числом от 50 до 200 см"
+    if not validate_neck_measurement(values[2]):
+        return False, "Обхват шеи должен быть числом от 20 до 100 см"
+    data['waist'] = float(values[1])
+    data['neck'] = float(values[2])
+    if sex == 'female':
+        if not validate_hip_measurement(values[3]):
+            return False, "Обхват бедер должен быть числом от 50 до 200 см"
+        data['hip'] = float(values[3])
+    return True, data